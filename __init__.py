@@ -1,147 +1,127 @@
-from aqt import mw
-from aqt.qt import QAction, QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, QLabel, QSlider, Qt
-from aqt.utils import tooltip, showInfo
-from aqt import gui_hooks
-from .mikan_session import MikanSession
-from .mikan_dialog import MikanDialog
+import time
+_import_start = time.perf_counter()
 
-def on_profile_loaded():
-    action = QAction("Mikan Mode", mw)
-    action.triggered.connect(show_mikan_dialog)
-    mw.form.menuTools.addAction(action)
-
-def get_config():
-    """アドオン設定を取得"""
-    return mw.addonManager.getConfig(__name__) or {
-        "set_size": 5,
-        "num_sets": 6,
-        "font_size": 16
-    }
-
-def save_config(config):
-    """アドオン設定を保存"""
-    mw.addonManager.writeConfig(__name__, config)
-
-def show_mikan_dialog():
-    """Mikan Mode開始ダイアログを表示"""
-    dialog = QDialog(mw)
-    dialog.setWindowTitle("Mikan Mode Settings")
-    dialog.setModal(True)
-
-    layout = QVBoxLayout()
-
-    # 設定を読み込み
-    config = get_config()
-
-    # Set size setting
-    set_size_layout = QHBoxLayout()
-    set_size_layout.addWidget(QLabel("Cards per set:"))
-
-    set_size_spinbox = QSpinBox()
-    set_size_spinbox.setMinimum(3)
-    set_size_spinbox.setMaximum(10)
-    set_size_spinbox.setValue(config["set_size"])
-    set_size_spinbox.setSuffix(" cards")
-    set_size_layout.addWidget(set_size_spinbox)
-
-    layout.addLayout(set_size_layout)
-
-    # Number of sets setting
-    num_sets_layout = QHBoxLayout()
-    num_sets_layout.addWidget(QLabel("Number of sets:"))
-
-    num_sets_spinbox = QSpinBox()
-    num_sets_spinbox.setMinimum(1)
-    num_sets_spinbox.setMaximum(100)
-    num_sets_spinbox.setValue(config["num_sets"])
-    num_sets_spinbox.setSuffix(" sets")
-    num_sets_layout.addWidget(num_sets_spinbox)
-
-    layout.addLayout(num_sets_layout)
+import sys
+from aqt import mw, gui_hooks
+from aqt.qt import QAction, QTimer
+from . import mikan_startup
 
-    # Font size setting
-    font_size_layout = QHBoxLayout()
-    font_size_layout.addWidget(QLabel("Font size:"))
+# セッション・ダイアログ・設定画面は mikan_main にまとめ、メニューが初めて使われたときに読み込む
+_MAIN = __name__ + ".mikan_main"
+_CANDIDATES = __name__ + ".mikan_candidates"
+_SETTINGS = __name__ + ".mikan_settings"
 
-    font_size_slider = QSlider(Qt.Orientation.Horizontal)
-    font_size_slider.setMinimum(12)
-    font_size_slider.setMaximum(32)
-    font_size_slider.setValue(config["font_size"])
-    font_size_slider.setTickPosition(QSlider.TickPosition.TicksBelow)
-    font_size_slider.setTickInterval(4)
 
-    font_size_label = QLabel(f"{config['font_size']}px")
-    font_size_label.setMinimumWidth(40)
+def _main():
+    """mikan_main を読み込んで返す（初回だけ読み込み時間を記録）"""
+    module = sys.modules.get(_MAIN)
+    if module is None:
+        start = time.perf_counter()
+        from . import mikan_main as module
+        mikan_startup.record('first_use_ms', start)
+    return module
 
-    def update_font_size_label():
-        font_size_label.setText(f"{font_size_slider.value()}px")
 
-    font_size_slider.valueChanged.connect(update_font_size_label)
-
-    font_size_layout.addWidget(font_size_slider)
-    font_size_layout.addWidget(font_size_label)
-
-    layout.addLayout(font_size_layout)
-
-    # Total cards display
-    total_layout = QHBoxLayout()
-    total_label = QLabel("Total cards: 30")
-    total_label.setStyleSheet("color: gray; font-style: italic;")
-    total_layout.addWidget(total_label)
-    layout.addLayout(total_layout)
-
-    # Update total when values change
-    def update_total():
-        total = set_size_spinbox.value() * num_sets_spinbox.value()
-        total_label.setText(f"Total cards: {total}")
-
-    set_size_spinbox.valueChanged.connect(update_total)
-    num_sets_spinbox.valueChanged.connect(update_total)
-
-    # Buttons
-    button_layout = QHBoxLayout()
-
-    start_button = QPushButton("Start")
-    start_button.clicked.connect(lambda: start_mikan_mode(
-        set_size_spinbox.value(), num_sets_spinbox.value(), font_size_slider.value(), dialog))
-    button_layout.addWidget(start_button)
-
-    cancel_button = QPushButton("Cancel")
-    cancel_button.clicked.connect(dialog.reject)
-    button_layout.addWidget(cancel_button)
+def show_mikan_dialog():
+    _main().show_mikan_dialog()
 
-    layout.addLayout(button_layout)
 
-    dialog.setLayout(layout)
-    dialog.exec()
+def resume_last_session():
+    _main().resume_last_session()
 
-def start_mikan_mode(set_size: int, num_sets: int, font_size: int, dialog: QDialog):
-    """Mikan Modeを開始"""
-    # 設定を保存
-    config = {
-        "set_size": set_size,
-        "num_sets": num_sets,
-        "font_size": font_size
-    }
-    save_config(config)
 
-    dialog.accept()
+def show_history():
+    _main().show_history()
 
-    try:
-        # 現在のデッキIDを取得
-        deck_id = mw.col.decks.selected()
 
-        # セッションを作成（総カード数とセットサイズを渡す）
-        session_size = set_size * num_sets
-        session = MikanSession(deck_id, session_size, set_size)
+# メニューを登録済みかどうか（プロフィールを開き直すたびに増えないように1回だけ登録する）
+_menu_added = False
 
-        # Mikan Modeダイアログを表示（文字サイズも渡す）
-        mikan_dialog = MikanDialog(session, font_size)
-        mikan_dialog.exec()
 
-    except Exception as e:
-        showInfo(f"An error occurred: {str(e)}")
+def on_profile_loaded():
+    global _menu_added
+    start = time.perf_counter()
+    if not _menu_added:
+        action = QAction("Mikan Mode", mw)
+        action.triggered.connect(show_mikan_dialog)
+        mw.form.menuTools.addAction(action)
+
+        resume_action = QAction("Resume last Mikan session", mw)
+        resume_action.triggered.connect(resume_last_session)
+        mw.form.menuTools.addAction(resume_action)
+
+        history_action = QAction("Mikan Mode history", mw)
+        history_action.triggered.connect(show_history)
+        mw.form.menuTools.addAction(history_action)
+        _menu_added = True
+    mikan_startup.record('profile_open_ms', start)
+
+    # ジャーナルの復元と候補の先読みはプロフィールが開き終わってから行う
+    QTimer.singleShot(0, on_startup_deferred)
+
+def on_startup_deferred():
+    """ジャーナルの読み込みと候補の先読みをバックグラウンドで行い、見つかった回答を反映"""
+    if mw.col is None:
+        return
+    start = time.perf_counter()
+    from aqt.operations import QueryOp
+    from .mikan_candidates import candidate_cache
+    from .mikan_journal import read_pending_journals, replay_journals
+
+    deck_ids = _warm_deck_ids()
+
+    def op(col):
+        started = time.perf_counter()
+        # 前回クラッシュしたセッションのジャーナルを読み込む（反映はメインスレッドから）
+        states = read_pending_journals()
+        # 次のセッションの候補カードを先読み（失敗しても開始時に取得し直すだけ）
+        try:
+            candidate_cache.warm(deck_ids)
+        except Exception as e:
+            print(f"Mikan Modeの候補を先読みできません: {e}")
+        mikan_startup.record('deferred_background_ms', started)
+        return states
+
+    QueryOp(parent=mw, op=op, success=replay_journals).run_in_background()
+    mikan_startup.record('deferred_ms', start)
+
+def warm_candidate_cache():
+    """前回のデッキの候補カードをバックグラウンドでキャッシュに読み込む"""
+    if mw.col is None:
+        return
+    from aqt.operations import QueryOp
+    from .mikan_candidates import candidate_cache
+
+    deck_ids = _warm_deck_ids()
+    # 先読みは失敗しても開始時に取得し直すだけなのでエラーは表示しない
+    QueryOp(
+        parent=mw,
+        op=lambda col: candidate_cache.warm(deck_ids),
+        success=lambda _: None
+    ).failure(lambda e: None).run_in_background()
+
+def _warm_deck_ids():
+    """先読みするデッキ（前回のデッキ。なければ現在のデッキ）と抽出の重みを設定から取得"""
+    from .mikan_candidates import candidate_cache
+    from .mikan_settings import settings
+
+    all_deck_ids = {deck.id for deck in mw.col.decks.all_names_and_ids()}
+    deck_ids = [deck_id for deck_id in settings.get("deck_ids", []) if deck_id in all_deck_ids]
+    candidate_cache.fallback_weight = settings.get("fallback_weight", "uniform")
+    return deck_ids or [mw.col.decks.selected()]
+
+def on_profile_will_close():
+    """プロファイルを閉じるときに未保存の設定を書き込み、キャッシュを破棄（読み込んでいなければ何もしない）"""
+    settings = sys.modules.get(_SETTINGS)
+    if settings is not None:
+        settings.settings.flush()
+    candidates = sys.modules.get(_CANDIDATES)
+    if candidates is not None:
+        candidates.candidate_cache.clear()
 
 # Ankiのプロフィールがロードされたときに実行
 gui_hooks.profile_did_open.append(on_profile_loaded)
+gui_hooks.sync_did_finish.append(warm_candidate_cache)
+gui_hooks.profile_will_close.append(on_profile_will_close)
 
+mikan_startup.record('import_ms', _import_start)
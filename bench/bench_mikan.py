@@ -0,0 +1,348 @@
+"""Mikan Modeのヘッドレスベンチマーク
+
+代替コレクション（fake_anki）上でセッション準備・セット作成・キュー操作・
+統計・回答反映の時間を計測し、結果をJSONで書き出す。
+
+    python bench/bench_mikan.py --sizes 1000,10000,100000,500000
+    python bench/bench_mikan.py --baseline bench_baseline.json --threshold 1.25
+"""
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_anki  # noqa: E402
+
+DEFAULT_SIZES = [1_000, 10_000, 100_000, 500_000]
+DEFAULT_QUEUE_SIZES = [5, 50, 500, 5_000]
+DEFAULT_DECK_COUNTS = [1, 10, 100]
+DEFAULT_FALLBACK_SIZES = [10_000, 100_000, 300_000]
+DEFAULT_HISTORY_YEARS = [1, 5, 20]
+
+
+def measure(fn: Callable[[], object], repeat: int, setup: Optional[Callable[[], object]] = None) -> Dict:
+    """fnをrepeat回実行して最小値と中央値（ミリ秒）を返す"""
+    timings = []
+    for _ in range(repeat):
+        if setup:
+            setup()
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return {
+        'best_ms': round(min(timings), 4),
+        'median_ms': round(statistics.median(timings), 4),
+        'repeat': repeat,
+    }
+
+
+def answer_all(session, ease_for: Callable[[int], int]):
+    """セッションのカードをすべて回答する（Againは1回だけ）"""
+    session.current_set_index = 0
+    session.current_queue = None
+    failed = set()
+    while not session.is_complete():
+        queue = session.get_current_queue()
+        if queue is None:
+            break
+        card_id = queue.get_current_card()
+        ease = ease_for(card_id) if card_id not in failed else 3
+        session.answer_card(card_id, ease)
+        if ease == 1:
+            failed.add(card_id)
+
+
+def run_deck_size(size: int, args) -> List[Dict]:
+    """1つのデッキサイズについて全ベンチマークを実行"""
+    latency = {
+        'get_card': args.get_card_latency,
+        'answer_card': args.answer_latency,
+        'find_cards': args.search_latency,
+    }
+    col = fake_anki.setup(size, latency=latency, seed=args.seed)
+    from mikan_mode.mikan_session import MikanSession
+    from mikan_mode.mikan_queue import MikanQueue
+    from mikan_mode.mikan_candidates import candidate_cache
+
+    session_size = args.set_size * args.num_sets
+    results = []
+
+    def record(name: str, timing: Dict, **extra):
+        row = {'benchmark': name, 'deck_size': size, **timing, **extra}
+        results.append(row)
+        print(f"{name:<22} {size:>8} cards  best {timing['best_ms']:>10.3f} ms  "
+              f"median {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+
+    # セッション準備（検索・メタデータ取得・上位選出・シャッフル）
+    col.get_card_calls = 0
+    record('prepare_cards', measure(
+        lambda: MikanSession(None, session_size, args.set_size), args.repeat,
+        setup=candidate_cache.clear),
+        session_size=session_size, get_card_calls=col.get_card_calls // args.repeat)
+
+    # キャッシュ済みの状態からのセッション準備（コレクションの検索なし）
+    candidate_cache.warm([col.decks.selected()])
+    col.db.queries = 0
+    record('prepare_cards_warm', measure(
+        lambda: MikanSession(None, session_size, args.set_size), args.repeat),
+        session_size=session_size, db_queries=col.db.queries // args.repeat)
+
+    session = MikanSession(None, session_size, args.set_size)
+
+    # セット作成（セッション全体を順に切り出す）
+    def build_all_sets():
+        session.current_set_index = 0
+        while session.next_set() is not None:
+            pass
+    record('next_set', measure(build_all_sets, args.repeat), sets=args.num_sets)
+
+    # キュー操作（known / unknown / push_front）
+    def queue_ops():
+        queue = MikanQueue(list(range(args.set_size)), args.set_size)
+        for _ in range(args.queue_ops):
+            queue.mark_as_unknown()
+            card = queue.mark_as_known()
+            queue.push_front(card)
+    record('queue_ops', measure(queue_ops, args.repeat), ops=args.queue_ops * 3)
+
+    # 統計（全カード回答済みの状態で）
+    answer_all(session, lambda card_id: 1 if card_id % 5 == 0 else 3)
+    record('get_statistics', measure(
+        lambda: [session.get_statistics() for _ in range(100)], args.repeat), calls=100)
+
+    # 回答の反映（毎回新しいセッションを回答済みにしてから）
+    state = {}
+
+    def prepare_answers():
+        state['session'] = MikanSession(None, session_size, args.set_size)
+        answer_all(state['session'], lambda card_id: 1 if card_id % 5 == 0 else 3)
+    record('apply_final_answers', measure(
+        lambda: state['session'].apply_final_answers(), args.apply_repeat, setup=prepare_answers),
+        answers=session_size)
+
+    return results
+
+
+def run_queue_scaling(args) -> List[Dict]:
+    """セットサイズを変えてキュー操作1回あたりのコストを計測（一定なら O(1)）"""
+    fake_anki.setup(0)
+    from mikan_mode.mikan_requeue import make_queue, make_strategy
+
+    results = []
+    for strategy_name in (value for value in args.queue_strategies.split(',') if value):
+        for set_size in (int(value) for value in args.queue_sizes.split(',') if value):
+            state = {}
+
+            def setup():
+                # 半分を完了済みにしてから計測（push_front が completed を探す状態）
+                strategy = make_strategy({'requeue_strategy': strategy_name})
+                queue = make_queue(list(range(set_size)), set_size, strategy)
+                for _ in range(set_size // 2):
+                    queue.mark_as_known()
+                state['queue'] = queue
+
+            def cycle():
+                queue = state['queue']
+                for _ in range(args.queue_ops):
+                    queue.mark_as_unknown()
+                    card = queue.mark_as_known()
+                    queue.push_front(card)  # 戻る操作
+
+            timing = measure(cycle, args.repeat, setup=setup)
+            ops = args.queue_ops * 3
+            row = {'benchmark': 'queue_op_scaling', 'deck_size': None, 'set_size': set_size,
+                   'strategy': strategy_name, **timing, 'ops': ops,
+                   'ns_per_op': round(timing['best_ms'] * 1e6 / ops, 1)}
+            results.append(row)
+            print(f"{'queue_op_scaling':<22} set {set_size:>6}  {strategy_name:<14}"
+                  f"{row['ns_per_op']:>10.1f} ns/op", file=sys.stderr)
+    return results
+
+
+def run_deck_counts(args) -> List[Dict]:
+    """デッキ数を変えてセッション準備の時間を計測（全サブデッキを個別に選択）"""
+    size = int(args.deck_count_size)
+    session_size = args.set_size * args.num_sets
+    results = []
+    for num_decks in (int(value) for value in args.deck_counts.split(',') if value):
+        col = fake_anki.setup(size, num_decks=num_decks, seed=args.seed)
+        from mikan_mode.mikan_session import MikanSession
+        from mikan_mode.mikan_candidates import candidate_cache
+
+        deck_ids = sorted(col.decks.names)
+        timing = measure(lambda: MikanSession(session_size=session_size, set_size=args.set_size,
+                                              deck_ids=deck_ids), args.repeat,
+                         setup=candidate_cache.clear)
+        row = {'benchmark': 'prepare_cards_by_decks', 'deck_size': size, 'num_decks': num_decks,
+               **timing, 'session_size': session_size}
+        results.append(row)
+        print(f"{'prepare_cards_by_decks':<22} {num_decks:>5} decks  best {timing['best_ms']:>10.3f} ms  "
+              f"median {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+    return results
+
+
+def run_fallback(args) -> List[Dict]:
+    """期日のカードがないデッキでのセッション準備（デッキ全体からの抽出）を重みごとに計測"""
+    session_size = args.set_size * args.num_sets
+    results = []
+    for size in (int(value) for value in args.fallback_sizes.split(',') if value):
+        col = fake_anki.setup(size, seed=args.seed)
+        # すべて期日前の復習カードにする
+        col.db.conn.execute("update cards set type = 2, queue = 2, due = ?", (fake_anki.TODAY + 100,))
+        from mikan_mode.mikan_session import MikanSession
+        from mikan_mode.mikan_candidates import candidate_cache
+
+        for weight in ('uniform', 'lapses', 'age'):
+            candidate_cache.fallback_weight = weight
+            timing = measure(lambda: MikanSession(session_size=session_size, set_size=args.set_size),
+                             args.repeat, setup=candidate_cache.clear)
+            row = {'benchmark': 'prepare_cards_fallback', 'deck_size': size, 'strategy': weight,
+                   **timing, 'session_size': session_size}
+            results.append(row)
+            print(f"{'prepare_cards_fallback':<22} {size:>8}  {weight:<8}  best {timing['best_ms']:>10.3f} ms  "
+                  f"median {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+        candidate_cache.fallback_weight = 'uniform'
+    return results
+
+
+def run_history(args) -> List[Dict]:
+    """何年分もの履歴（1日3セッション）でのレポートの集計時間を計測"""
+    from mikan_mode.mikan_history import HistoryStore, PERIODS
+
+    rng = random.Random(args.seed)
+    results = []
+    for years in (int(value) for value in args.history_years.split(',') if value):
+        with tempfile.TemporaryDirectory() as directory:
+            store = HistoryStore(os.path.join(directory, "history.sqlite3"))
+            start_ms = int((time.time() - years * 365 * 86400) * 1000)
+            sessions = []
+            set_stats = []
+            for index in range(years * 365 * 3):
+                history_id = start_ms + index * 8 * 3600 * 1000
+                answered = args.set_size * rng.randint(1, args.num_sets // 5 or 1)
+                correct = rng.randint(answered // 2, answered)
+                sessions.append((history_id, history_id // 1000 + 600, answered * rng.uniform(4, 12),
+                                 args.set_size, answered, answered, correct, answered // 4, correct // 4,
+                                 answered + answered - correct, 1, "[1]", "{}"))
+                set_stats.extend((history_id, set_no, args.set_size, args.set_size + rng.randint(0, 3))
+                                 for set_no in range(answered // args.set_size))
+            with store._conn:
+                store._conn.executemany(f"insert into sessions values ({', '.join('?' * 13)})", sessions)
+                store._conn.executemany("insert into set_stats values (?, ?, ?, ?)", set_stats)
+            for period in PERIODS:
+                timing = measure(lambda: store.trends(period), args.repeat)
+                row = {'benchmark': 'history_trends', 'deck_size': None, 'strategy': period,
+                       'history_years': years, 'sessions': len(sessions), **timing}
+                results.append(row)
+                print(f"{'history_trends':<22} {years:>6}y  {period:<8}  best {timing['best_ms']:>10.3f} ms  "
+                      f"median {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+            timing = measure(store.set_repetitions, args.repeat)
+            results.append({'benchmark': 'history_set_repetitions', 'deck_size': None, 'history_years': years,
+                            'sessions': len(sessions), **timing})
+            print(f"{'history_set_reps':<22} {years:>6}y  {'':<8}  best {timing['best_ms']:>10.3f} ms  "
+                  f"median {timing['median_ms']:>10.3f} ms", file=sys.stderr)
+            store.close()
+    return results
+
+
+def compare(results: List[Dict], baseline_path: str, threshold: float) -> List[str]:
+    """基準結果と比較して、threshold倍より遅くなったものを返す"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = json.load(f)
+    reference = {_result_key(row): row for row in baseline['results']}
+    regressions = []
+    for row in results:
+        base = reference.get(_result_key(row))
+        if not base or base['best_ms'] <= 0:
+            continue
+        ratio = row['best_ms'] / base['best_ms']
+        row['baseline_ratio'] = round(ratio, 3)
+        if ratio > threshold:
+            regressions.append(f"{row['benchmark']} @ {row['deck_size'] or row.get('set_size')}"
+                               f"{' x%d decks' % row['num_decks'] if 'num_decks' in row else ''}"
+                               f"{' %dy' % row['history_years'] if 'history_years' in row else ''}: "
+                               f"{base['best_ms']:.3f} -> {row['best_ms']:.3f} ms (x{ratio:.2f})")
+    return regressions
+
+
+def _result_key(row: Dict) -> tuple:
+    """比較用のキー"""
+    return (row['benchmark'], row['deck_size'], row.get('set_size'), row.get('num_decks'),
+            row.get('strategy'), row.get('history_years'))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sizes', default=','.join(map(str, DEFAULT_SIZES)),
+                        help='デッキのカード数（カンマ区切り）')
+    parser.add_argument('--set-size', type=int, default=10)
+    parser.add_argument('--num-sets', type=int, default=100)
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--apply-repeat', type=int, default=1)
+    parser.add_argument('--queue-ops', type=int, default=10_000)
+    parser.add_argument('--queue-sizes', default=','.join(map(str, DEFAULT_QUEUE_SIZES)),
+                        help='キュー操作のスケーリングを測るセットサイズ（カンマ区切り）')
+    parser.add_argument('--queue-strategies', default='fifo,k_later,min_elapsed,weakest_first',
+                        help='キュー操作を測る並べ方（カンマ区切り）')
+    parser.add_argument('--deck-counts', default=','.join(map(str, DEFAULT_DECK_COUNTS)),
+                        help='セッション準備を測るデッキ数（カンマ区切り、空なら省略）')
+    parser.add_argument('--deck-count-size', type=int, default=100_000,
+                        help='デッキ数の計測に使うカード数')
+    parser.add_argument('--fallback-sizes', default=','.join(map(str, DEFAULT_FALLBACK_SIZES)),
+                        help='期日のカードがないデッキの準備を計測するカード数（カンマ区切り、空で省略）')
+    parser.add_argument('--history-years', default=','.join(map(str, DEFAULT_HISTORY_YEARS)),
+                        help='レポートの集計を計測する履歴の年数（カンマ区切り、空で省略）')
+    parser.add_argument('--get-card-latency', type=float, default=0.0, help='get_card 1回の遅延（秒）')
+    parser.add_argument('--answer-latency', type=float, default=0.0, help='answerCard 1回の遅延（秒）')
+    parser.add_argument('--search-latency', type=float, default=0.0, help='find_cards 1回の遅延（秒）')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', default='bench_output.json')
+    parser.add_argument('--baseline', help='比較する過去の結果JSON')
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help='基準よりこの倍率を超えて遅ければ失敗扱い')
+    args = parser.parse_args(argv)
+
+    results = []
+    for size in (int(value) for value in args.sizes.split(',') if value):
+        results.extend(run_deck_size(size, args))
+    results.extend(run_queue_scaling(args))
+    results.extend(run_deck_counts(args))
+    results.extend(run_fallback(args))
+    results.extend(run_history(args))
+
+    regressions = compare(results, args.baseline, args.threshold) if args.baseline else []
+
+    report = {
+        'meta': {
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'timestamp': int(time.time()),
+            'set_size': args.set_size,
+            'num_sets': args.num_sets,
+            'latency': {
+                'get_card': args.get_card_latency,
+                'answer_card': args.answer_latency,
+                'find_cards': args.search_latency,
+            },
+        },
+        'results': results,
+        'regressions': regressions,
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {args.output}", file=sys.stderr)
+
+    for line in regressions:
+        print(f"REGRESSION {line}", file=sys.stderr)
+    return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,361 @@
+"""Ankiなしでアドオンのモジュールを読み込むための代替 aqt/anki 環境
+
+SQLiteのメモリDB上にAnki互換の cards/notes/revlog テーブルを作り、
+アドオンが使う範囲の Collection API（find_cards, get_card, decks, db,
+sched.answerCard など）を実装する。各APIには遅延を設定できる。
+"""
+import os
+import random
+import re
+import sqlite3
+import sys
+import time
+import types
+from typing import Dict, List, Optional, Set
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+PACKAGE_NAME = "mikan_mode"
+
+# 経過日数（sched.today）の固定値
+TODAY = 1000
+
+
+class FakeDB:
+    """Ankiの DBProxy 相当（? プレースホルダ）"""
+
+    def __init__(self, latency: Dict[str, float]):
+        self.conn = sqlite3.connect(":memory:", check_same_thread=False)
+        self.latency = latency
+        self.queries = 0
+
+    def all(self, sql: str, *args) -> List[tuple]:
+        self._tick()
+        return self.conn.execute(sql, args).fetchall()
+
+    def list(self, sql: str, *args) -> List:
+        self._tick()
+        return [row[0] for row in self.conn.execute(sql, args)]
+
+    def scalar(self, sql: str, *args):
+        self._tick()
+        row = self.conn.execute(sql, args).fetchone()
+        return row[0] if row else None
+
+    def first(self, sql: str, *args) -> Optional[tuple]:
+        self._tick()
+        return self.conn.execute(sql, args).fetchone()
+
+    def execute(self, sql: str, *args) -> List[tuple]:
+        self._tick()
+        return self.conn.execute(sql, args).fetchall()
+
+    def _tick(self):
+        self.queries += 1
+        _sleep(self.latency.get("db", 0))
+
+
+class FakeNote:
+    """ノートの代替"""
+
+    def __init__(self, note_id: int, mod: int):
+        self.id = note_id
+        self.mod = mod
+
+
+class FakeCard:
+    """Cardの代替"""
+
+    COLUMNS = ("id", "nid", "did", "ord", "mod", "type", "queue", "due", "ivl",
+               "factor", "reps", "lapses", "left", "odue", "odid")
+
+    def __init__(self, col: "FakeCollection", row: tuple):
+        self.col = col
+        for name, value in zip(self.COLUMNS, row):
+            setattr(self, name, value)
+        self.timer_started: Optional[float] = None
+
+    def start_timer(self):
+        self.timer_started = time.time()
+
+    def question(self, reload: bool = False) -> str:
+        _sleep(self.col.latency.get("render", 0))
+        return f"<div class=front>card {self.id}</div>"
+
+    def answer(self) -> str:
+        _sleep(self.col.latency.get("render", 0))
+        return f"<div class=back>card {self.id} answer</div>"
+
+    def note(self) -> FakeNote:
+        return FakeNote(self.nid, self.col.db.scalar("select mod from notes where id = ?", self.nid))
+
+
+class FakeDecks:
+    """DeckManagerの代替（デッキ名は :: で階層化）"""
+
+    def __init__(self, names: Dict[int, str]):
+        self.names = names
+        self.filtered: Set[int] = set()  # フィルターデッキのID
+        self.current = min(names)
+
+    def selected(self) -> int:
+        return self.current
+
+    def name(self, deck_id: int) -> str:
+        return self.names[deck_id]
+
+    def id_for_name(self, name: str) -> Optional[int]:
+        for deck_id, deck_name in self.names.items():
+            if deck_name == name:
+                return deck_id
+        return None
+
+    def all_names_and_ids(self):
+        return [types.SimpleNamespace(id=deck_id, name=name) for deck_id, name in self.names.items()]
+
+    def is_filtered(self, deck_id: int) -> bool:
+        return deck_id in self.filtered
+
+    def deck_and_child_ids(self, deck_id: int) -> List[int]:
+        name = self.names[deck_id]
+        return [did for did, child in self.names.items()
+                if child == name or child.startswith(name + "::")]
+
+
+class FakeScheduler:
+    """スケジューラの代替（answerCardで cards/revlog を更新）"""
+
+    def __init__(self, col: "FakeCollection"):
+        self.col = col
+        self.today = TODAY
+        self.day_cutoff = int(time.time()) + 3600
+        self._last_revlog_id = 0
+
+    def answerCard(self, card: FakeCard, ease: int):
+        _sleep(self.col.latency.get("answer_card", 0))
+        ivl = 0 if ease == 1 else max(1, card.ivl) * (ease - 1)
+        queue = 1 if ease == 1 else 2
+        due = int(time.time()) + 600 if ease == 1 else self.today + ivl
+        taken = int((time.time() - (card.timer_started or time.time())) * 1000)
+        self.col.db.conn.execute(
+            "update cards set type = ?, queue = ?, due = ?, ivl = ?, reps = reps + 1, "
+            "lapses = lapses + ? where id = ?",
+            (queue if ease == 1 else 2, queue, due, ivl, 1 if ease == 1 else 0, card.id))
+        revlog_id = max(int(time.time() * 1000), self._last_revlog_id + 1)
+        self._last_revlog_id = revlog_id
+        self.col.db.conn.execute(
+            "insert into revlog (id, cid, ease, ivl, time, type) values (?, ?, ?, ?, ?, ?)",
+            (revlog_id, card.id, ease, ivl, taken, card.type))
+        self.col.touch()
+
+
+class FakeCollection:
+    """Collectionの代替
+
+    Args:
+        num_cards: 生成するカード数
+        num_decks: 親デッキ配下に作るサブデッキ数
+        latency: API別の遅延（秒）。キーは find_cards, get_card, db, render, answer_card
+        seed: カード生成用の乱数シード
+    """
+
+    def __init__(self, num_cards: int, num_decks: int = 1,
+                 latency: Optional[Dict[str, float]] = None, seed: int = 0):
+        self.latency = dict(latency or {})
+        self.db = FakeDB(self.latency)
+        names = {1: "Default"}
+        for index in range(1, num_decks):
+            names[index + 1] = f"Default::Sub{index}"
+        self.decks = FakeDecks(names)
+        self.sched = FakeScheduler(self)
+        self.mod = int(time.time() * 1000)
+        self.get_card_calls = 0
+        self.find_cards_calls = 0
+        self._undo_entries = 0
+        self._create_tables()
+        self._populate(num_cards, list(names), random.Random(seed))
+
+    def find_cards(self, query: str, order=False) -> List[int]:
+        """Ankiの検索のうちアドオンが使う範囲（deck:"..." と is:due/new/learn の OR）"""
+        self.find_cards_calls += 1
+        _sleep(self.latency.get("find_cards", 0))
+        clauses = []
+        deck = re.search(r'deck:"([^"]*)"', query)
+        if deck:
+            dids = self._deck_ids_for_name(deck.group(1))
+            clauses.append(f"did in ({','.join(map(str, dids)) or '0'})")
+        states = re.findall(r"is:(\w+)", query)
+        if states:
+            clauses.append("(" + " or ".join(self._state_clause(state) for state in states) + ")")
+        where = " and ".join(clauses) or "1"
+        return [row[0] for row in self.db.conn.execute(f"select id from cards where {where}")]
+
+    def get_card(self, card_id: int) -> FakeCard:
+        self.get_card_calls += 1
+        _sleep(self.latency.get("get_card", 0))
+        row = self.db.conn.execute(
+            f"select {', '.join(FakeCard.COLUMNS)} from cards where id = ?", (card_id,)).fetchone()
+        if row is None:
+            raise KeyError(f"card {card_id} not found")
+        return FakeCard(self, row)
+
+    def add_custom_undo_entry(self, name: str) -> int:
+        self._undo_entries += 1
+        return self._undo_entries
+
+    def merge_undo_entries(self, target: int):
+        self._undo_entries = target
+        return types.SimpleNamespace(changes=None)
+
+    def touch(self):
+        self.mod = int(time.time() * 1000)
+
+    def _deck_ids_for_name(self, name: str) -> List[int]:
+        deck_id = self.decks.id_for_name(name)
+        return self.decks.deck_and_child_ids(deck_id) if deck_id else []
+
+    def _state_clause(self, state: str) -> str:
+        if state == "due":
+            return (f"((queue in (2, 3) and due <= {self.sched.today}) "
+                    f"or (queue = 1 and due <= {self.sched.day_cutoff}))")
+        if state == "new":
+            return "type = 0"
+        if state == "learn":
+            return "queue in (1, 3)"
+        raise ValueError(f"unsupported search: is:{state}")
+
+    def _create_tables(self):
+        self.db.conn.executescript("""
+            create table cards (
+                id integer primary key, nid integer not null, did integer not null,
+                ord integer not null, mod integer not null, type integer not null,
+                queue integer not null, due integer not null, ivl integer not null,
+                factor integer not null, reps integer not null, lapses integer not null,
+                left integer not null, odue integer not null, odid integer not null);
+            create table notes (id integer primary key, mod integer not null);
+            create table revlog (
+                id integer primary key, cid integer not null, ease integer not null,
+                ivl integer not null, time integer not null, type integer not null);
+            create index ix_cards_nid on cards (nid);
+            create index ix_cards_sched on cards (did, queue, due);
+            create index ix_revlog_cid on revlog (cid);
+        """)
+
+    def _populate(self, num_cards: int, deck_ids: List[int], rng: random.Random):
+        now = int(time.time())
+        base_id = 1_500_000_000_000
+        cards = []
+        for index in range(num_cards):
+            card_id = base_id + index
+            roll = rng.random()
+            if roll < 0.2:    # 新規
+                card_type, queue, due, ivl = 0, 0, index, 0
+            elif roll < 0.9:  # 復習
+                card_type, queue, ivl = 2, 2, rng.randint(1, 365)
+                due = TODAY + rng.randint(-60, 120)
+            elif roll < 0.95:  # 学習中（当日）
+                card_type, queue, due, ivl = 1, 1, now + rng.randint(-7200, 7200), 0
+            else:              # 再学習（日単位）
+                card_type, queue, ivl = 3, 3, rng.randint(1, 30)
+                due = TODAY + rng.randint(-5, 5)
+            cards.append((card_id, card_id, deck_ids[index % len(deck_ids)], 0, now,
+                          card_type, queue, due, ivl, 2500, rng.randint(0, 50),
+                          rng.randint(0, 8), 0, 0, 0))
+        self.db.conn.executemany(f"insert into cards values ({', '.join('?' * 15)})", cards)
+        self.db.conn.executemany("insert into notes values (?, ?)",
+                                 ((card[0], now) for card in cards))
+
+
+def _sleep(seconds: float):
+    """遅延を再現（0なら何もしない）"""
+    if seconds > 0:
+        time.sleep(seconds)
+
+
+def install(col: FakeCollection, profile: str = "bench") -> types.SimpleNamespace:
+    """代替の aqt/anki モジュールを sys.modules に登録し、mw を返す
+
+    2回目以降は同じ mw の col だけを差し替える（読み込み済みのモジュールが
+    参照している mw をそのまま使えるようにするため）。
+    """
+    aqt = sys.modules.get("aqt")
+    if aqt is not None and getattr(aqt, "__fake__", False):
+        aqt.mw.col = col
+        return aqt.mw
+
+    mw = types.SimpleNamespace(
+        col=col,
+        pm=types.SimpleNamespace(name=profile),
+        taskman=types.SimpleNamespace(run_on_main=lambda fn: fn()),
+        progress=types.SimpleNamespace(update=lambda **kwargs: None),
+        prepare_card_text_for_display=lambda text: text,
+        addonManager=types.SimpleNamespace(getConfig=lambda name: None,
+                                           writeConfig=lambda name, config: None),
+    )
+
+    def module(name: str, **attrs) -> types.ModuleType:
+        mod = types.ModuleType(name)
+        mod.__fake__ = True
+        mod.__path__ = []
+        for key, value in attrs.items():
+            setattr(mod, key, value)
+        sys.modules[name] = mod
+        return mod
+
+    module("aqt", mw=mw, gui_hooks=types.SimpleNamespace())
+    module("aqt.utils", tooltip=lambda *a, **k: None, showInfo=lambda *a, **k: None)
+    module("aqt.operations", CollectionOp=_ImmediateOp, QueryOp=_ImmediateOp)
+    module("anki")
+    module("anki.utils", ids2str=lambda ids: "(%s)" % ",".join(str(i) for i in ids))
+    module("anki.cards", Card=FakeCard)
+    module("anki.collection", Collection=FakeCollection)
+    return mw
+
+
+class _ImmediateOp:
+    """CollectionOp/QueryOp の代替（その場で同期実行）"""
+
+    def __init__(self, parent=None, op=None, success=None):
+        self._op = op
+        self._success = success
+        self._failure = None
+
+    def success(self, callback):
+        self._success = callback
+        return self
+
+    def failure(self, callback):
+        self._failure = callback
+        return self
+
+    def with_progress(self, label=None):
+        return self
+
+    def run_in_background(self, initiator=None):
+        try:
+            result = self._op(sys.modules["aqt"].mw.col)
+        except Exception as e:
+            if self._failure:
+                self._failure(e)
+                return
+            raise
+        if self._success:
+            self._success(result)
+
+
+def load_addon() -> types.ModuleType:
+    """アドオンをパッケージとして登録（__init__.py のGUI登録は実行しない）"""
+    package = sys.modules.get(PACKAGE_NAME)
+    if package is None:
+        package = types.ModuleType(PACKAGE_NAME)
+        package.__path__ = [REPO_ROOT]
+        sys.modules[PACKAGE_NAME] = package
+    return package
+
+
+def setup(num_cards: int, num_decks: int = 1, latency: Optional[Dict[str, float]] = None,
+          seed: int = 0) -> FakeCollection:
+    """代替コレクションを作成して aqt/anki を差し替え、アドオンを読み込める状態にする"""
+    col = FakeCollection(num_cards, num_decks=num_decks, latency=latency, seed=seed)
+    install(col)
+    load_addon()
+    return col
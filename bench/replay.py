@@ -0,0 +1,246 @@
+"""Mikan Modeのセッショントレースの再生（プロファイリング用）
+
+trace_sessions を有効にして記録したトレース（user_files/traces/*.mktr）を
+代替コレクション（fake_anki）上の MikanSession / MikanQueue に流し直す。
+シャッフルのシードと回答・戻る・やり直しの順番が記録どおりなので、
+何度実行しても同じ処理になり、遅かったセッションをそのままプロファイルできる。
+
+    python bench/replay.py user_files/traces/1700000000000.mktr
+    python bench/replay.py trace.mktr --repeat 20 --profile replay.prof
+    python bench/replay.py trace.mktr --render --get-card-latency 0.002
+    python bench/replay.py --record trace.mktr --set-size 5 --num-sets 20   # 合成セッションを記録
+"""
+import argparse
+import cProfile
+import json
+import os
+import pstats
+import random
+import sys
+import time
+from array import array
+from typing import Dict, List
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_anki  # noqa: E402
+
+# 再生用のカードを入れるデッキ（fake_anki の Default）
+DECK_ID = 1
+
+
+def invert_shuffle(order: List[int], seed: int) -> List[int]:
+    """MikanSession と同じシードでシャッフルする前の並びを復元"""
+    permutation = list(range(len(order)))
+    random.Random(seed).shuffle(permutation)
+    original = [0] * len(order)
+    for position, index in enumerate(permutation):
+        original[index] = order[position]
+    return original
+
+
+def load_cards(col, trace):
+    """トレースのカードを代替コレクションに追加"""
+    now = int(time.time())
+    col.db.conn.executemany(
+        f"insert into cards values ({', '.join('?' * 15)})",
+        ((card_id, card_id, DECK_ID, 0, now, card_type, 0 if card_type == 0 else 2,
+          fake_anki.TODAY, 0 if card_type == 0 else 1, 2500, 0, 0, 0, 0, 0)
+         for card_id, card_type in zip(trace.card_ids, trace.card_types)))
+    col.db.conn.executemany("insert into notes values (?, ?)", ((card_id, now) for card_id in trace.card_ids))
+
+
+def pin_candidates(trace):
+    """シャッフル前の選出結果をキャッシュに入れ、セッションが同じカードを選ぶようにする"""
+    from mikan_mode.mikan_candidates import CandidateList, candidate_cache
+
+    types = dict(zip(trace.card_ids, trace.card_types))
+    original = invert_shuffle(trace.card_ids.tolist(), trace.seed)
+    candidate_cache.put([DECK_ID], CandidateList(array('q', original),
+                                                 bytes(types[card_id] for card_id in original)))
+
+
+def replay(trace, col, args, perf) -> Dict:
+    """トレースを1回再生し、記録との食い違いの数などを返す"""
+    from mikan_mode import mikan_trace as mt
+    from mikan_mode.mikan_answers import apply_answers
+    from mikan_mode.mikan_render_cache import RenderCache
+    from mikan_mode.mikan_requeue import make_strategy
+    from mikan_mode.mikan_session import MikanSession
+
+    pin_candidates(trace)
+    with perf.probe("replay_prepare"):
+        session = MikanSession(session_size=trace.session_size, set_size=trace.set_size,
+                               deck_ids=[DECK_ID], requeue=make_strategy(trace.requeue), seed=trace.seed)
+    render_cache = RenderCache() if args.render else None
+    mismatches = 0
+
+    for event in trace.events:
+        if event.kind == mt.SET:
+            with perf.probe("replay_set"):
+                # MikanDialog と同じく、終わったセットの回答を反映してから次のセットを作る
+                answers = session.unapplied_answers(completed_only=True, before_set=session.current_set_index)
+                if answers:
+                    session.mark_applied(answers)
+                    session.confirm_applied(answers, apply_answers(col, answers,
+                                                                   session.average_time_per_card()))
+                session.get_current_queue()
+            mismatches += session.current_set_index != event.value
+        elif event.kind == mt.ANSWER:
+            with perf.probe("replay_answer"):
+                queue = session.get_current_queue()
+                if queue is None:
+                    mismatches += 1
+                    continue
+                card_id = queue.get_current_card()
+                session.answer_card(card_id, event.value)
+            mismatches += card_id != event.card_id
+        elif event.kind == mt.BACK:
+            with perf.probe("replay_back"):
+                card_id = session.undo()
+            mismatches += card_id != event.card_id
+        elif event.kind == mt.REDO:
+            with perf.probe("replay_redo"):
+                card_id = session.redo()
+            mismatches += card_id != event.card_id
+        elif event.kind == mt.RENDER and render_cache is not None:
+            with perf.probe("replay_render"):
+                render_cache.get(event.card_id)
+        elif event.kind == mt.END:
+            with perf.probe("replay_apply_final"):
+                session.apply_final_answers()
+
+    return {
+        'order_matches': session.planned_cards() == trace.card_ids.tolist(),
+        'mismatches': mismatches,
+        'answered': len(session.first_answers),
+        'completed': session.is_complete(),
+        'session_perf': session.perf.summary(),
+        'session_events': session.perf.events(),
+    }
+
+
+def record_synthetic(path: str, args) -> int:
+    """合成セッションを実際の TraceRecorder で記録（ツールの動作確認用）"""
+    fake_anki.setup(max(args.cards, args.set_size * args.num_sets), seed=args.seed)
+    from mikan_mode.mikan_requeue import make_strategy
+    from mikan_mode.mikan_session import MikanSession
+    from mikan_mode.mikan_trace import TraceRecorder
+
+    rng = random.Random(args.seed)
+    session = MikanSession(session_size=args.set_size * args.num_sets, set_size=args.set_size,
+                           deck_ids=[DECK_ID], seed=args.seed,
+                           requeue=make_strategy({"requeue_strategy": args.requeue_strategy}))
+    session.trace = TraceRecorder(path, session)
+    failed = set()
+    while not session.is_complete():
+        queue = session.get_current_queue()
+        if queue is None:
+            break
+        card_id = queue.get_current_card()
+        session.trace.record_render(card_id, False, rng.uniform(0.002, 0.02))
+        session.trace.record_render(card_id, True, rng.uniform(0.002, 0.02))
+        ease = 1 if card_id not in failed and rng.random() < args.p_again else 3
+        session.answer_card(card_id, ease)
+        if ease == 1:
+            failed.add(card_id)
+        if rng.random() < args.p_back and session.can_undo():
+            session.undo()
+            session.redo()
+    session.apply_final_answers()
+    session.close_trace()
+    print(f"recorded {len(session.first_answers)} answers to {path} ({os.path.getsize(path)} bytes)",
+          file=sys.stderr)
+    return 0
+
+
+def print_summary(summary: Dict[str, dict]):
+    """フェーズごとの p50 / p95 / max を表示"""
+    print(f"{'phase':<28}{'count':>8}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}{'total ms':>11}")
+    for phase, row in sorted(summary.items()):
+        print(f"{phase:<28}{row['count']:>8}{row['p50_ms']:>10.3f}{row['p95_ms']:>10.3f}"
+              f"{row['max_ms']:>10.3f}{row['total_ms']:>11.3f}")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('trace', nargs='?', help='再生するトレースファイル')
+    parser.add_argument('--repeat', type=int, default=1, help='再生する回数')
+    parser.add_argument('--render', action='store_true', help='描画イベントでカードのレンダリングも再生')
+    parser.add_argument('--profile', help='cProfileの結果を書き出すファイル')
+    parser.add_argument('--get-card-latency', type=float, default=0.0, help='get_card 1回の遅延（秒）')
+    parser.add_argument('--answer-latency', type=float, default=0.0, help='answerCard 1回の遅延（秒）')
+    parser.add_argument('--render-latency', type=float, default=0.0, help='question/answer 1回の遅延（秒）')
+    parser.add_argument('--output', default='replay_output.json')
+    parser.add_argument('--record', metavar='PATH', help='再生せず、合成セッションのトレースを PATH に記録')
+    parser.add_argument('--cards', type=int, default=10_000, help='--record: コレクションのカード数')
+    parser.add_argument('--set-size', type=int, default=5, help='--record: セットサイズ')
+    parser.add_argument('--num-sets', type=int, default=20, help='--record: セット数')
+    parser.add_argument('--p-again', type=float, default=0.3, help='--record: Againを押す確率')
+    parser.add_argument('--p-back', type=float, default=0.05, help='--record: 戻る→やり直しの確率')
+    parser.add_argument('--requeue-strategy', default='fifo', help='--record: わからなかったカードの戻し方')
+    parser.add_argument('--seed', type=int, default=0, help='--record: 乱数シード')
+    args = parser.parse_args(argv)
+
+    if args.record:
+        return record_synthetic(args.record, args)
+    if not args.trace:
+        parser.error("trace file is required (or use --record)")
+
+    fake_anki.load_addon()
+    from mikan_mode.mikan_perf import PerfRecorder
+    from mikan_mode.mikan_trace import read_trace
+
+    trace = read_trace(args.trace)
+    latency = {'get_card': args.get_card_latency, 'answer_card': args.answer_latency,
+               'render': args.render_latency}
+    col = fake_anki.setup(0, latency=latency)
+    load_cards(col, trace)
+
+    # 記録された実機での描画時間（再生の結果と比べる用）
+    recorded = PerfRecorder()
+    for show_answer, phase in ((False, 'recorded_render_question'), (True, 'recorded_render_answer')):
+        for ms in trace.render_times(show_answer):
+            recorded.record(phase, ms / 1000)
+
+    perf = PerfRecorder()
+    profiler = cProfile.Profile() if args.profile else None
+    results = []
+    started = time.perf_counter()
+    for _ in range(args.repeat):
+        if profiler:
+            profiler.enable()
+        with perf.probe("replay_total"):
+            results.append(replay(trace, col, args, perf))
+        if profiler:
+            profiler.disable()
+    elapsed = time.perf_counter() - started
+
+    summary = {**recorded.summary(), **perf.summary(), **results[-1]['session_perf']}
+    print_summary(summary)
+    last = results[-1]
+    print(f"replayed {len(trace.events)} events x {args.repeat} in {elapsed:.3f}s  "
+          f"order_matches={last['order_matches']} mismatches={last['mismatches']}", file=sys.stderr)
+
+    if profiler:
+        profiler.dump_stats(args.profile)
+        pstats.Stats(profiler, stream=sys.stderr).sort_stats('cumulative').print_stats(15)
+
+    report = {
+        'meta': {'trace': os.path.abspath(args.trace), 'seed': trace.seed, 'session_size': trace.session_size,
+                 'set_size': trace.set_size, 'requeue': trace.requeue, 'events': len(trace.events),
+                 'repeat': args.repeat, 'latency': latency, 'timestamp': int(time.time())},
+        'order_matches': last['order_matches'],
+        'mismatches': last['mismatches'],
+        'answered': last['answered'],
+        'completed': last['completed'],
+        'summary': summary,
+        'events': last['session_events'],
+    }
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {args.output}", file=sys.stderr)
+    return 0 if last['order_matches'] and not last['mismatches'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
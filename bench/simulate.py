@@ -0,0 +1,216 @@
+"""Mikan Modeの学習シミュレーター（セットサイズ・セット数の検討用）
+
+合成した想起モデルに対して MikanQueue と同じ FIFO の出題（わからなかった
+カードはキューの最後へ）を NumPy でまとめて実行し、設定ごとの
+1枚あたりの出題回数・所要時間・初回正答率の期待値を出す。
+
+    python bench/simulate.py                       # set_size 3-10 x num_sets 1-100 を一括計算
+    python bench/simulate.py --sessions 5000 --show 1,6,20,50,100
+    python bench/simulate.py --validate 200        # MikanQueue を使う1件ずつの実行と比較
+
+想起モデル（セッション内）:
+    初回の正答率 p0 は新規/復習で異なり、セッション後半ほど疲労で下がる。
+    e 回目の再出題（間に g 枚挟む）の正答率は
+        p = 1 - (1 - p0) * exp(-learn_rate * e) * (1 + interference * g)
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from typing import Dict, List
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+import fake_anki  # noqa: E402
+
+SET_SIZES = range(3, 11)      # 設定画面の範囲（3-10枚）
+MAX_SETS = 100                # 設定画面の範囲（1-100セット）
+MAX_ROUNDS = 60               # 1セット内で同じカードを出す最大回数（打ち切り）
+
+
+def recall_probability(p0, exposures, gap, args):
+    """想起モデル: 初回正答率・それまでの出題回数・間に挟んだ枚数から正答率を計算"""
+    p = 1 - (1 - p0) * np.exp(-args.learn_rate * exposures) * (1 + args.interference * gap)
+    return np.clip(p, 0.01, 0.99)
+
+
+def first_try_probability(rng, shape, position, args):
+    """カードごとの初回正答率（新規/復習の割合と疲労を反映）"""
+    is_new = rng.random(shape) < args.new_ratio
+    p0 = np.where(is_new, args.p_new, args.p_review)
+    return np.clip(p0 * (1 - args.fatigue * position), 0.01, 0.99)
+
+
+def simulate_set_size(set_size: int, args, rng) -> Dict[str, np.ndarray]:
+    """1つのセットサイズについて sessions x MAX_SETS セットをまとめてシミュレーション
+
+    セット数 n の結果は先頭 n セットの累計なので、MAX_SETS セットを1回流せば
+    1〜MAX_SETS のすべてのセット数を計算できる。
+
+    Returns:
+        セットごとの出題回数・所要秒数・初回正答数（いずれも shape = (sessions, MAX_SETS)）
+    """
+    shape = (args.sessions, MAX_SETS, set_size)
+    # セッション内での通し位置（疲労の計算用）
+    position = np.arange(MAX_SETS * set_size).reshape(1, MAX_SETS, set_size)
+    p0 = first_try_probability(rng, shape, position, args)
+
+    # 1巡目: 全カードを1回ずつ出題
+    correct = rng.random(shape) < p0
+    first_correct = correct.sum(axis=2)
+    shows = np.full((args.sessions, MAX_SETS), set_size, dtype=np.int64)
+    remaining = ~correct
+    exposures = 1
+
+    # 2巡目以降: 残ったカードをFIFOで出し直す（間に挟まるのは残りの枚数 - 1 枚）
+    while exposures < MAX_ROUNDS:
+        left = remaining.sum(axis=2)
+        if not left.any():
+            break
+        gap = np.maximum(left - 1, 0)[..., None]
+        p = recall_probability(p0, exposures, gap, args)
+        correct = rng.random(shape) < p
+        shows += left
+        remaining &= ~correct
+        exposures += 1
+
+    first_shows = set_size
+    seconds = first_shows * args.sec_first + (shows - first_shows) * args.sec_repeat + args.sec_set
+    return {'shows': shows, 'seconds': seconds, 'first_correct': first_correct}
+
+
+def sweep(args) -> List[Dict]:
+    """set_size x num_sets の全組み合わせの期待値を計算"""
+    rng = np.random.default_rng(args.seed)
+    grid = []
+    for set_size in SET_SIZES:
+        result = simulate_set_size(set_size, args, rng)
+        # セット数ごとの累計（セッション平均）
+        shows = result['shows'].cumsum(axis=1).mean(axis=0)
+        seconds = result['seconds'].cumsum(axis=1).mean(axis=0)
+        first_correct = result['first_correct'].cumsum(axis=1).mean(axis=0)
+        for num_sets in range(1, MAX_SETS + 1):
+            cards = set_size * num_sets
+            index = num_sets - 1
+            grid.append({
+                'set_size': set_size,
+                'num_sets': num_sets,
+                'cards': cards,
+                'reps_per_card': round(float(shows[index]) / cards, 4),
+                'minutes': round(float(seconds[index]) / 60, 3),
+                'seconds_per_card': round(float(seconds[index]) / cards, 3),
+                'first_try_accuracy': round(float(first_correct[index]) / cards * 100, 2),
+            })
+    return grid
+
+
+def validate(args, sessions: int) -> Dict[str, float]:
+    """同じモデルを MikanQueue で1件ずつ実行し、一括計算との差を確認（set_size=args.validate_set_size）"""
+    fake_anki.load_addon()
+    from mikan_mode.mikan_queue import MikanQueue
+
+    rng = np.random.default_rng(args.seed + 1)
+    set_size = args.validate_set_size
+    total_shows = 0
+    total_cards = 0
+    for _ in range(sessions):
+        for set_index in range(args.validate_sets):
+            position = np.arange(set_size) + set_index * set_size
+            p0 = first_try_probability(rng, (set_size,), position, args)
+            queue = MikanQueue(list(range(set_size)), set_size)
+            exposures = [0] * set_size
+            last_shown = [0] * set_size
+            clock = 0
+            while not queue.is_complete():
+                card = queue.get_current_card()
+                if exposures[card] == 0:
+                    p = p0[card]
+                else:
+                    gap = clock - last_shown[card] - 1
+                    p = recall_probability(p0[card], exposures[card], gap, args)
+                exposures[card] += 1
+                last_shown[card] = clock
+                clock += 1
+                if rng.random() < p or exposures[card] >= MAX_ROUNDS:
+                    queue.mark_as_known()
+                else:
+                    queue.mark_as_unknown()
+            total_shows += clock
+            total_cards += set_size
+
+    batch_args = argparse.Namespace(**{**vars(args), 'sessions': sessions})
+    batch = simulate_set_size(set_size, batch_args, np.random.default_rng(args.seed + 2))
+    batch_reps = batch['shows'][:, :args.validate_sets].sum() / (sessions * args.validate_sets * set_size)
+    return {
+        'set_size': set_size,
+        'sets': args.validate_sets,
+        'sessions': sessions,
+        'queue_reps_per_card': round(total_shows / total_cards, 4),
+        'batch_reps_per_card': round(float(batch_reps), 4),
+    }
+
+
+def print_table(grid: List[Dict], show_sets: List[int]):
+    """指定したセット数の行だけを表にして表示"""
+    print(f"{'set':>4}{'sets':>6}{'cards':>7}{'reps/card':>11}{'minutes':>10}{'sec/card':>10}{'first %':>9}")
+    for row in grid:
+        if row['num_sets'] in show_sets:
+            print(f"{row['set_size']:>4}{row['num_sets']:>6}{row['cards']:>7}{row['reps_per_card']:>11.2f}"
+                  f"{row['minutes']:>10.1f}{row['seconds_per_card']:>10.1f}{row['first_try_accuracy']:>9.1f}")
+
+
+def parse_args(argv=None) -> argparse.Namespace:
+    """コマンドライン引数（省略した値は想起モデルの既定値）"""
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--sessions', type=int, default=2000, help='設定ごとのセッション数')
+    parser.add_argument('--new-ratio', type=float, default=0.3, help='新規カードの割合')
+    parser.add_argument('--p-new', type=float, default=0.35, help='新規カードの初回正答率')
+    parser.add_argument('--p-review', type=float, default=0.85, help='復習カードの初回正答率')
+    parser.add_argument('--learn-rate', type=float, default=0.9, help='再出題ごとの学習の速さ')
+    parser.add_argument('--interference', type=float, default=0.04,
+                        help='間に挟んだカード1枚あたりの忘れやすさ')
+    parser.add_argument('--fatigue', type=float, default=0.0003,
+                        help='1枚回答するごとの初回正答率の低下（割合）')
+    parser.add_argument('--sec-first', type=float, default=8.0, help='初回の出題1回の秒数')
+    parser.add_argument('--sec-repeat', type=float, default=4.0, help='再出題1回の秒数')
+    parser.add_argument('--sec-set', type=float, default=2.0, help='セットの切り替え1回の秒数')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--show', default='1,6,10,20,50,100', help='表に表示するセット数（カンマ区切り）')
+    parser.add_argument('--output', default='simulate_output.json')
+    parser.add_argument('--validate', type=int, default=0,
+                        help='MikanQueueで1件ずつ実行して比較するセッション数（0で省略）')
+    parser.add_argument('--validate-set-size', type=int, default=5)
+    parser.add_argument('--validate-sets', type=int, default=6)
+    return parser.parse_args(argv)
+
+
+def main(argv=None) -> int:
+    args = parse_args(argv)
+
+    start = time.perf_counter()
+    grid = sweep(args)
+    elapsed = time.perf_counter() - start
+    print_table(grid, [int(value) for value in args.show.split(',') if value])
+    print(f"swept {len(grid)} configurations x {args.sessions} sessions in {elapsed:.2f}s", file=sys.stderr)
+
+    report = {
+        'meta': {'model': {key: value for key, value in vars(args).items()
+                           if key not in ('show', 'output', 'validate')},
+                 'elapsed_s': round(elapsed, 3),
+                 'timestamp': int(time.time())},
+        'grid': grid,
+    }
+    if args.validate:
+        report['validation'] = validate(args, args.validate)
+        print(f"validation: {report['validation']}", file=sys.stderr)
+
+    with open(args.output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print(f"wrote {args.output}", file=sys.stderr)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
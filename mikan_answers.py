@@ -0,0 +1,85 @@
+import time
+from typing import Callable, List, Optional, Tuple
+from aqt import mw
+from aqt.operations import CollectionOp
+from anki.collection import Collection
+
+# 進捗表示を更新する間隔（カード枚数）
+PROGRESS_INTERVAL = 20
+
+
+def apply_answers(col: Collection, answers: List[Tuple[int, int]], avg_time_per_card: float,
+                  on_progress: Optional[Callable[[int, int], None]] = None) -> int:
+    """回答 (カードID, ease) をまとめてAnkiに反映し、反映できた枚数を返す
+
+    Args:
+        col: 対象のコレクション
+        answers: (カードID, ease) のリスト
+        avg_time_per_card: 1カードあたりの回答時間（秒）
+        on_progress: (完了数, 総数) を受け取るコールバック
+    """
+    updated_count = 0
+    total = len(answers)
+    for index, (card_id, ease) in enumerate(answers):
+        try:
+            card = col.get_card(card_id)
+            # タイマーを開始（統計更新に必要）
+            card.start_timer()
+
+            # セッション平均時間を使用
+            card.timer_started = time.time() - avg_time_per_card
+
+            col.sched.answerCard(card, ease)
+            updated_count += 1
+        except Exception as e:
+            print(f"カード {card_id} の統計更新に失敗: {e}")
+
+        if on_progress and (index + 1) % PROGRESS_INTERVAL == 0:
+            on_progress(index + 1, total)
+
+    return updated_count
+
+
+class _QuietCollectionOp(CollectionOp):
+    """進捗ダイアログを出さずに実行する CollectionOp（セッション中の途中反映用）
+
+    CollectionOp は常に taskman.with_progress で実行し、モーダルの進捗ダイアログが
+    回答の入力を止めてしまう。実行部分（_run）だけを run_in_background に差し替え、
+    Undoエントリと変更の通知は CollectionOp のまま行う。
+    """
+
+    def _run(self, mw, op, on_done):
+        mw.taskman.run_in_background(op, on_done)
+
+
+def apply_answers_op(parent, answers: List[Tuple[int, int]], avg_time_per_card: float,
+                     on_done: Callable[[int], None],
+                     on_failure: Optional[Callable[[Exception], None]] = None,
+                     filter_answers: Optional[Callable[[Collection, List[Tuple[int, int]]],
+                                                       List[Tuple[int, int]]]] = None,
+                     with_progress: bool = True) -> CollectionOp:
+    """回答の反映を1つのUndoエントリにまとめたバックグラウンド操作を作成
+
+    戻り値の CollectionOp は run_in_background() で実行する。
+    on_done には反映できた枚数が渡される。
+    filter_answers を渡すと、反映直前にバックグラウンドで回答を絞り込む。
+    with_progress が False なら進捗ダイアログを出さない（セッション中の途中反映）。
+    """
+    result = {'updated': 0}
+
+    def report_progress(done: int, total: int):
+        mw.taskman.run_on_main(lambda: mw.progress.update(
+            label=f"Saving Mikan Mode results... {done}/{total}", value=done, max=total))
+
+    def op(col: Collection):
+        undo_start = col.add_custom_undo_entry("Mikan Mode")
+        targets = filter_answers(col, answers) if filter_answers else answers
+        result['updated'] = apply_answers(col, targets, avg_time_per_card,
+                                          report_progress if with_progress else None)
+        return col.merge_undo_entries(undo_start)
+
+    op_class = CollectionOp if with_progress else _QuietCollectionOp
+    collection_op = op_class(parent, op).success(lambda _: on_done(result['updated']))
+    if on_failure:
+        collection_op = collection_op.failure(on_failure)
+    return collection_op
@@ -0,0 +1,273 @@
+import heapq
+import random
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+from aqt import mw
+from anki.utils import ids2str
+from .mikan_priority import learning_cutoff, priority_order_sql, time_bucket
+
+# 期日のカードがないときに抽出する枚数（セッションの最大枚数 = 10枚 x 100セット）
+FALLBACK_SAMPLE_SIZE = 1000
+# 抽出のために読む行数の上限（抽出枚数の倍数）
+FALLBACK_SCAN_FACTOR = 20
+# 抽出でカードIDの範囲を区切る区間の数
+FALLBACK_WINDOWS = 16
+
+
+class CandidateList(NamedTuple):
+    """優先度順に並べた候補カード（IDとカードタイプを配列で保持してメモリを抑える）"""
+    card_ids: array  # 'q' カードID
+    card_types: bytes  # 0 = New, 1 = Learning, 2 = Review, 3 = Relearning
+    sampled: bool = False  # 期日のカードがなく、デッキ全体から抽出した候補かどうか
+
+    def top(self, count: int) -> List[Tuple[int, int]]:
+        """優先度の高い順に最大count枚の (id, type) を返す（新しいリスト）"""
+        return list(zip(self.card_ids[:count], self.card_types[:count]))
+
+    def __len__(self) -> int:
+        return len(self.card_ids)
+
+
+class CandidateCache:
+    """デッキとコレクションの更新時刻をキーにした候補カードのキャッシュ
+
+    キーに col.mod と sched.today を含めるので、コレクションが変更されたり
+    日付が変わったりすると自動的に無効になる（古いエントリは使われずに押し出される）。
+    当日の学習カードの並びは時刻で変わるので、時刻の刻み（time_bucket）もキーに含める。
+    """
+
+    def __init__(self, max_entries: int = 4):
+        """
+        Args:
+            max_entries: 保持するデッキの組み合わせの数
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[tuple, CandidateList]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.fallback_weight = "uniform"  # 抽出の重み（FALLBACK_WEIGHTS のキー）
+        self.hits = 0
+        self.misses = 0
+        self.samples = 0
+
+    def key(self, deck_ids: Iterable[int]) -> tuple:
+        """キャッシュのキー（選択したデッキ・コレクション更新時刻・今日の日付・時刻の刻み・抽出の重み）"""
+        return (tuple(sorted(set(deck_ids))), mw.col.mod, mw.col.sched.today, time_bucket(),
+                self.fallback_weight)
+
+    def get(self, deck_ids: Iterable[int]) -> Optional[CandidateList]:
+        """キャッシュ済みの候補を取得（なければNone）。コレクションの検索はしない"""
+        key = self.key(deck_ids)
+        with self._lock:
+            candidates = self._entries.get(key)
+            if candidates is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return candidates
+
+    def load(self, deck_ids: Iterable[int]) -> CandidateList:
+        """候補をコレクションから取得してキャッシュに入れる（抽出した候補は入れない）
+
+        バックグラウンドスレッドから呼ばれることを想定。
+        """
+        deck_ids = list(deck_ids)
+        key = self.key(deck_ids)
+        resolved = resolve_deck_ids(deck_ids)
+        rows = fetch_candidate_rows(resolved, learning_cutoff(key[-2]))
+        if not rows:
+            # 期日のカードがなければデッキ全体から一定枚数だけ抽出（全カードは読まない）。
+            # セッションごとに抽出し直すのでキャッシュには入れない
+            self.samples += 1
+            return sample_candidates(resolved, FALLBACK_SAMPLE_SIZE, key[-1])
+        candidates = build_candidates(rows)
+        self._store(key, candidates)
+        return candidates
+
+    def put(self, deck_ids: Iterable[int], candidates: CandidateList):
+        """候補を直接キャッシュに入れる（トレースの再生などで選出結果を固定する）"""
+        self._store(self.key(deck_ids), candidates)
+
+    def warm(self, deck_ids: Iterable[int]):
+        """キャッシュが古ければ候補を取得し直す（起動時・同期後の先読み用）"""
+        deck_ids = list(deck_ids)
+        with self._lock:
+            fresh = self.key(deck_ids) in self._entries
+        if not fresh:
+            self.load(deck_ids)
+
+    def _store(self, key: tuple, candidates: CandidateList):
+        """エントリを追加し、上限を超えた分は古い順に捨てる"""
+        with self._lock:
+            self._entries[key] = candidates
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        """キャッシュを空にする（プロファイルを閉じたときなど）"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """ヒット率などの統計"""
+        total = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_rate': round(self.hits / total, 3) if total else 0.0,
+            'fallback_samples': self.samples,
+            'entries': len(self._entries),
+            'cards': sum(len(candidates) for candidates in self._entries.values()),
+        }
+
+
+# プロファイル内のセッション間で共有するキャッシュ
+candidate_cache = CandidateCache()
+
+
+def resolve_deck_ids(deck_ids: Iterable[int]) -> List[int]:
+    """選択したデッキとそのサブデッキのIDを重複なく取得"""
+    resolved: Set[int] = set()
+    for deck_id in deck_ids:
+        resolved.update(mw.col.decks.deck_and_child_ids(deck_id))
+    return sorted(resolved)
+
+
+def fetch_candidate_rows(deck_ids: List[int], cutoff: Optional[int] = None) -> List[tuple]:
+    """デッキIDから is:due / is:new / is:learn に相当するカードの (id, type) を緊急度の高い順に取得
+
+    Args:
+        deck_ids: 対象デッキのID（サブデッキを含めて展開済み）
+        cutoff: 当日の学習カードを期日とみなす時刻（省略時は現在の刻みの終わり）
+    """
+    if not deck_ids:
+        return []
+    dids = ids2str(deck_ids)
+    # フィルターデッキに移動中のカードは元のデッキ（odid）で判定
+    sql = (f"select id, type from cards "
+           f"where (did in {dids} or odid in {dids})")
+    # is:new = type 0 / is:learn = queue 1,3 / is:due = 期日を過ぎた復習カード
+    # （学習中カードの期日条件は is:learn に含まれる）
+    # 並べ替えもSQL側で行う（キューごとに意味の違う due を緊急度に揃えて比較）
+    today = mw.col.sched.today
+    cutoff = learning_cutoff(time_bucket()) if cutoff is None else cutoff
+    return mw.col.db.all(
+        sql + " and (type = 0 or queue in (1, 3) or (queue = 2 and due <= ?)) "
+        + priority_order_sql(today, cutoff),
+        today)
+
+
+def build_candidates(rows: List[tuple]) -> CandidateList:
+    """緊急度順に取得した行を CandidateList にする"""
+    return CandidateList(array('q', (row[0] for row in rows)),
+                         bytes(row[1] for row in rows))
+
+
+def sample_candidates(deck_ids: List[int], count: int, weight: str = "uniform",
+                      rng: Optional[random.Random] = None) -> CandidateList:
+    """デッキから count 枚を重み付きリザーバサンプリング（A-Res）で抽出
+
+    デッキの枚数は ix_cards_sched（did が先頭）の索引だけで数える。
+    - count * FALLBACK_SCAN_FACTOR 枚以下、またはコレクション内にまばらなデッキは
+      索引から全カードを読んでリザーバに流す（正確な抽出）
+    - それより大きいデッキは、デッキのカードIDの範囲にランダムな位置の区間を
+      FALLBACK_WINDOWS 個置いて区間内を主キーの範囲で全部読む。区間は範囲の端で
+      折り返すので、どのカードも区間に入る確率は等しく、区間に入ったカードからは
+      重みに比例して選ばれる。読む行数は平均で count * FALLBACK_SCAN_FACTOR 行程度
+    フィルターデッキに移動中のカード（odid）は odid に索引がないので、
+    フィルターデッキのIDから索引で別に読む。
+
+    Args:
+        deck_ids: 対象デッキのID（サブデッキを含めて展開済み）
+        count: 抽出する枚数
+        weight: 抽出の重み（FALLBACK_WEIGHTS のキー）
+    """
+    if not deck_ids or count <= 0:
+        return CandidateList(array('q'), b'', sampled=True)
+    rng = rng or random.Random()
+    weigh = FALLBACK_WEIGHTS.get(weight, FALLBACK_WEIGHTS["uniform"])
+    dids = ids2str(deck_ids)
+    columns = "select id, type, due, ivl, lapses from cards"
+    filtered = _filtered_deck_ids()
+    moved = mw.col.db.all(f"{columns} where did in {ids2str(filtered)} and odid in {dids}") if filtered else []
+
+    total = mw.col.db.scalar(f"select count() from cards where did in {dids}") or 0
+    budget = count * FALLBACK_SCAN_FACTOR
+    # 区間で読むコレクションの行数の目安は budget / (デッキの割合)。それがデッキより多ければ全部読む
+    collection_size = mw.col.db.scalar("select count() from cards") or 0
+    if total <= budget or budget * collection_size > total * total:
+        rows = mw.col.db.all(f"{columns} where did in {dids}") + moved
+    else:
+        # デッキが密なので、主キーの順に読めば最初と最後のカードはすぐ見つかる
+        low = mw.col.db.scalar(f"select id from cards where +did in {dids} order by id limit 1")
+        high = mw.col.db.scalar(f"select id from cards where +did in {dids} order by id desc limit 1")
+        if moved:
+            low = min(low, min(row[0] for row in moved))
+            high = max(high, max(row[0] for row in moved))
+        windows = _random_windows(low, high, -(-(high - low + 1) * budget // (total * FALLBACK_WINDOWS)), rng)
+        # +did で ix_cards_sched を使わせず、主キーの範囲を読む
+        sql = f"{columns} where id >= ? and id < ? and +did in {dids}"
+        rows = []
+        seen: Set[int] = set()
+        for start, end in windows:
+            for row in mw.col.db.all(sql, start, end):
+                if row[0] not in seen:
+                    seen.add(row[0])
+                    rows.append(row)
+        # 移動中のカードも同じ区間に入ったものだけを使う（入る確率をほかのカードと揃える）
+        rows.extend(row for row in moved if any(start <= row[0] < end for start, end in windows))
+
+    today = mw.col.sched.today
+    reservoir: List[Tuple[float, int, int]] = []  # (キー, カードID, カードタイプ) の最小ヒープ
+    for card_id, card_type, due, ivl, lapses in rows:
+        # A-Res: キー u^(1/w) の大きい count 枚が重みに比例した抽出になる
+        key = rng.random() ** (1.0 / weigh(card_type, due, ivl, lapses, today))
+        if len(reservoir) < count:
+            heapq.heappush(reservoir, (key, card_id, card_type))
+        elif key > reservoir[0][0]:
+            heapq.heapreplace(reservoir, (key, card_id, card_type))
+
+    reservoir.sort(reverse=True)
+    return CandidateList(array('q', (entry[1] for entry in reservoir)),
+                         bytes(entry[2] for entry in reservoir), sampled=True)
+
+
+def _random_windows(low: int, high: int, width: int, rng: random.Random) -> List[Tuple[int, int]]:
+    """[low, high] の範囲にランダムな位置の幅 width の区間を FALLBACK_WINDOWS 個置く
+
+    high を超えた分は low から折り返すので、どのIDも1つの区間に入る確率は
+    width / (high - low + 1) で等しい。
+    """
+    width = min(width, high - low + 1)
+    windows = []
+    for _ in range(FALLBACK_WINDOWS):
+        start = rng.randint(low, high)
+        end = start + width
+        windows.append((start, min(end, high + 1)))
+        if end > high + 1:
+            windows.append((low, low + end - high - 1))
+    return windows
+
+
+def _filtered_deck_ids() -> List[int]:
+    """フィルターデッキのID"""
+    decks = mw.col.decks
+    return [deck.id for deck in decks.all_names_and_ids() if decks.is_filtered(deck.id)]
+
+
+def _review_age(card_type: int, due: int, ivl: int, lapses: int, today: int) -> float:
+    """前回の復習からの日数（復習カードは due - ivl が前回の復習日）"""
+    if card_type in (2, 3):
+        return max(1.0, float(today - (due - ivl)))
+    return 1.0
+
+
+# 抽出の重み（カードタイプ, due, ivl, lapses, today -> 正の重み）
+FALLBACK_WEIGHTS: Dict[str, Callable[[int, int, int, int, int], float]] = {
+    "uniform": lambda card_type, due, ivl, lapses, today: 1.0,
+    "lapses": lambda card_type, due, ivl, lapses, today: 1.0 + lapses,
+    "age": _review_age,
+}
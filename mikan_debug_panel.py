@@ -0,0 +1,95 @@
+import os
+from aqt.qt import *
+from aqt.utils import tooltip
+from .mikan_perf import PerfRecorder
+
+# プロファイル結果の保存先
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), "user_files", "profiles")
+
+
+class PerfPanel(QDialog):
+    """セッションの処理時間を表示するデバッグパネル（Ctrl+Shift+D）"""
+
+    def __init__(self, parent, perf: PerfRecorder, extra_stats=None):
+        """
+        Args:
+            parent: 親ウィンドウ（MikanDialog）
+            perf: 表示する計測結果
+            extra_stats: 追加で表示する統計（dictを返す関数）
+        """
+        super().__init__(parent)
+        self.perf = perf
+        self.extra_stats = extra_stats or (lambda: {})
+
+        self.setWindowTitle("Mikan Mode Performance")
+        self.resize(640, 420)
+
+        layout = QVBoxLayout()
+
+        self.text = QPlainTextEdit()
+        self.text.setReadOnly(True)
+        self.text.setFont(QFontDatabase.systemFont(QFontDatabase.SystemFont.FixedFont))
+        layout.addWidget(self.text, 1)
+
+        button_layout = QHBoxLayout()
+
+        refresh_button = QPushButton("Refresh")
+        refresh_button.clicked.connect(self.refresh)
+        button_layout.addWidget(refresh_button)
+
+        export_button = QPushButton("Export JSON...")
+        export_button.clicked.connect(self._on_export)
+        button_layout.addWidget(export_button)
+
+        self.profile_button = QPushButton()
+        self.profile_button.clicked.connect(self._on_toggle_profiler)
+        button_layout.addWidget(self.profile_button)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        button_layout.addWidget(close_button)
+
+        layout.addLayout(button_layout)
+        self.setLayout(layout)
+
+        self.refresh()
+
+    def refresh(self):
+        """表示を更新"""
+        lines = [self.perf.format_summary()]
+        extra = self.extra_stats()
+        for name, values in extra.items():
+            lines.append("")
+            lines.append(f"[{name}]")
+            lines.extend(f"  {key}: {value}" for key, value in values.items())
+        self.text.setPlainText("\n".join(lines))
+        self.profile_button.setText("Stop profiler" if self.perf.is_profiling() else "Start profiler")
+
+    def _on_export(self):
+        """計測結果をJSONファイルに書き出す"""
+        path, _ = QFileDialog.getSaveFileName(self, "Export performance data",
+                                              "mikan_perf.json", "JSON (*.json)")
+        if not path:
+            return
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.perf.to_json(**self.extra_stats()))
+        tooltip(f"Saved: {path}")
+
+    def _on_toggle_profiler(self):
+        """cProfileの計測を開始/停止"""
+        if self.perf.is_profiling():
+            path = save_profile(self.perf, "manual")
+            tooltip(f"Profile saved: {path}")
+        else:
+            self.perf.start_profiler()
+        self.refresh()
+
+
+def save_profile(perf: PerfRecorder, name: str) -> str:
+    """プロファイラを止めて .prof と上位関数の一覧を保存し、.prof のパスを返す"""
+    os.makedirs(PROFILE_DIR, exist_ok=True)
+    path = os.path.join(PROFILE_DIR, f"{name}.prof")
+    report = perf.stop_profiler(path)
+    with open(os.path.join(PROFILE_DIR, f"{name}.txt"), "w", encoding="utf-8") as f:
+        f.write(report)
+    return path
@@ -1,20 +1,121 @@
-from aqt import mw
+from aqt import gui_hooks, mw
 from aqt.qt import *
 from aqt.utils import tooltip, showInfo
+from aqt.sound import av_player
 from anki.cards import Card
+import json
+import sqlite3
 import time
+from collections import deque
+from typing import Callable, Deque, List, Tuple
 from .mikan_session import MikanSession
 from .mikan_queue import MikanQueue
+from .mikan_answers import apply_answers_op
+from .mikan_candidates import candidate_cache
+from .mikan_debug_panel import PerfPanel, save_profile
+from .mikan_history import open_history
+from .mikan_input import PAINTED_CMD, InputGuard, paint_ack_script
+from .mikan_media import MediaPrefetcher, preload_script
+from .mikan_perf import timed
+from .mikan_render_cache import RenderCache
+from .mikan_settings import settings
+from .mikan_snapshot import delete_snapshot, save_snapshot
+from .mikan_startup import startup_stats
 
 class MikanDialog(QDialog):
     """Mikan Mode用の独立したダイアログ"""
+
+    # アイドル時に先読みする枚数（現在のキュー / 次のセットそれぞれ）
+    PREFETCH_DEPTH = 3
+
+    # 常駐ページ: 1セッションに1回だけ読み込み、以降はJSでカード内容だけを差し替える
+    SHELL_HTML = """
+<style>
+:root { --mikan-font-size: %(font_size)dpx; }
+/* Mikan Mode カスタム文字サイズ */
+#mikan-card.card {
+    font-size: var(--mikan-font-size) !important;
+    line-height: 1.4 !important;
+}
+#mikan-card.card * {
+    font-size: inherit !important;
+}
+</style>
+<div id="mikan-card" class="card"></div>
+<script>
+window.mikanSwap = function (html) {
+    const el = document.getElementById("mikan-card");
+    el.innerHTML = html;
+    // innerHTMLで挿入した<script>は実行されないので作り直して実行する
+    el.querySelectorAll("script").forEach(function (old) {
+        const script = document.createElement("script");
+        for (const attr of old.attributes) {
+            script.setAttribute(attr.name, attr.value);
+        }
+        script.textContent = old.textContent;
+        old.replaceWith(script);
+    });
+    window.scrollTo(0, 0);
+};
+window.mikanSetFontSize = function (px) {
+    document.documentElement.style.setProperty("--mikan-font-size", px + "px");
+};
+// 次のカードの画像を先に読み込んでデコードしておく（直近keep枚分だけ保持）
+window.mikanPreloaded = new Map();
+window.mikanPreload = function (files, keep) {
+    files.forEach(function (name) {
+        if (mikanPreloaded.has(name)) {
+            return;
+        }
+        const img = new Image();
+        img.src = name;
+        if (img.decode) {
+            img.decode().catch(function () {});
+        }
+        mikanPreloaded.set(name, img);
+    });
+    while (mikanPreloaded.size > keep) {
+        mikanPreloaded.delete(mikanPreloaded.keys().next().value);
+    }
+};
+</script>
+"""
     
-    def __init__(self, session: MikanSession, font_size: int = 16):
+    def __init__(self, session: MikanSession, font_size: int = 16, persistent_view: bool = True,
+                 profile_session: bool = False, media_depth: int = 3, media_cache_mb: int = 32):
         super().__init__(mw)
         self.session = session
+        self.perf = session.perf  # 計測結果はセッションと共有
+        self.profile_session = profile_session  # Trueならセッション全体をcProfileで計測
         self.font_size = font_size
+        self.persistent_view = persistent_view  # Trueなら常駐ページでDOMを差し替える
+        self._shell_loaded = False
         self.current_card = None
+        self.current_render = None
         self.is_showing_answer = False
+        self._results_saving = False  # 終了時の反映を開始済みかどうか
+        # 回答の反映は1つずつ順に実行する（前の反映が終わってから次を始める）
+        self._apply_queue: Deque[Tuple[list, Callable[[int], None], bool]] = deque()
+        self._apply_running = False
+        self._apply_drained: List[Callable[[], None]] = []  # 反映待ちがなくなったら呼ぶ
+        # 描画前の回答を捨て、入力から描画までの時間を測る
+        self.input = InputGuard()
+
+        # レンダリング結果のキャッシュとアイドル時の先読みタイマー
+        self.render_cache = RenderCache()
+        self._prefetch_timer = QTimer(self)
+        self._prefetch_timer.setSingleShot(True)
+        self._prefetch_timer.setInterval(0)
+        self._prefetch_timer.timeout.connect(self._on_prefetch_timer)
+        # ノートが編集されたらレンダリング結果を作り直す
+        gui_hooks.operation_did_execute.append(self._on_operation_did_execute)
+
+        # 次のカードの画像・音声の先読み（depth枚先まで、合計media_cache_mbまで）
+        self.media = MediaPrefetcher(media_depth, media_cache_mb * 1024 * 1024)
+        self._media_targets: List[int] = []
+
+        if self.profile_session:
+            self.perf.start_profiler()
         
         self.setWindowTitle("Mikan Mode")
         self.setModal(True)
@@ -59,10 +160,26 @@ class MikanDialog(QDialog):
         self.back_button.setStyleSheet("QPushButton { font-size: 11px; padding: 2px 6px; }")
         progress_layout.addWidget(self.back_button)
 
+        # やり直しボタン（取り消した回答があるときだけ表示）
+        self.redo_button = QPushButton("Redo →")
+        self.redo_button.clicked.connect(self._on_redo)
+        self.redo_button.setMaximumWidth(80)
+        self.redo_button.setMaximumHeight(25)
+        self.redo_button.setVisible(False)
+        self.redo_button.setStyleSheet("QPushButton { font-size: 11px; padding: 2px 6px; }")
+        progress_layout.addWidget(self.redo_button)
+
         layout.addLayout(progress_layout)
+
+        # ライブ統計（回答ごとに更新。集計済みのカウンタを読むだけ）
+        self.stats_label = QLabel()
+        self.stats_label.setAlignment(Qt.AlignmentFlag.AlignCenter)
+        self.stats_label.setStyleSheet("QLabel { color: gray; font-size: 11px; }")
+        layout.addWidget(self.stats_label)
         
         # カード表示エリア
         self.web_view = mw.web.createWindow(self)
+        self.web_view.set_bridge_command(self._on_bridge_cmd, self)
         layout.addWidget(self.web_view, 1)
         
         # ボタンエリア
@@ -145,6 +262,10 @@ class MikanDialog(QDialog):
         back_shortcut = QShortcut(QKeySequence("B"), self)
         back_shortcut.activated.connect(self._on_back)
 
+        # Shift+Bで取り消した回答をやり直す
+        redo_shortcut = QShortcut(QKeySequence("Shift+B"), self)
+        redo_shortcut.activated.connect(self._on_redo)
+
         # Escキーで終了
         esc_shortcut = QShortcut(QKeySequence("Escape"), self)
         esc_shortcut.activated.connect(self._on_exit)
@@ -156,6 +277,15 @@ class MikanDialog(QDialog):
         # Ctrl-で文字サイズ縮小
         zoom_out_shortcut = QShortcut(QKeySequence("Ctrl+-"), self)
         zoom_out_shortcut.activated.connect(self._on_zoom_out)
+
+        # Ctrl+Shift+Dで処理時間のデバッグパネル
+        debug_shortcut = QShortcut(QKeySequence("Ctrl+Shift+D"), self)
+        debug_shortcut.activated.connect(self._on_debug_panel)
+
+        # 押しっぱなしによるキーリピートは無視する（解答表示の直後にGoodが入らないように）
+        for shortcut in (space_shortcut, enter_shortcut, one_shortcut, two_shortcut, three_shortcut,
+                         four_shortcut, back_shortcut, redo_shortcut, esc_shortcut):
+            shortcut.setAutoRepeat(False)
         
     def _update_progress(self):
         """進捗表示を更新"""
@@ -164,11 +294,20 @@ class MikanDialog(QDialog):
                 f"Completed: {progress['completed_cards']}/{progress['total_cards']} cards | "
                 f"Current queue: {progress['remaining_in_queue']}/{progress['set_size']} cards")
         self.progress_label.setText(text)
+        self._update_stats()
+
+    def _update_stats(self):
+        """ライブ統計を更新（正答率・ペース・新規/復習の内訳）"""
+        stats = self.session.stats
+        self.stats_label.setText(
+            f"Accuracy: {stats.accuracy():.0f}% | "
+            f"{stats.cards_per_minute(self.session.elapsed()):.1f} cards/min | "
+            f"New: {stats.new_answered} / Review: {stats.review_answered}")
 
     def _update_button_visibility(self):
-        """戻るボタンの表示・非表示を更新"""
-        can_go_back = self.session.can_go_back()
-        self.back_button.setVisible(can_go_back and not self.is_showing_answer)
+        """戻る・やり直しボタンの表示・非表示を更新"""
+        self.back_button.setVisible(self.session.can_undo() and not self.is_showing_answer)
+        self.redo_button.setVisible(self.session.can_redo() and not self.is_showing_answer)
         
     def _show_next_card(self):
         """次のカードを表示"""
@@ -176,6 +315,10 @@ class MikanDialog(QDialog):
             self._show_completion_message()
             self.accept()
             return
+
+        # セットの区切りで、終わったセットの回答を先にAnkiへ反映しておく
+        if self.session.current_queue and self.session.current_queue.is_complete():
+            self._flush_completed_sets()
             
         queue = self.session.get_current_queue()
         if not queue:
@@ -185,12 +328,12 @@ class MikanDialog(QDialog):
             
         card_id = queue.get_current_card()
         if card_id:
-            self.current_card = mw.col.get_card(card_id)
-            # カードを履歴に追加
-            self.session.add_to_history(card_id)
+            self.current_render = self.render_cache.get(card_id)
+            self.current_card = self.current_render.card
 
-            # 質問を表示
+            # 質問を表示（音声は描画より先に再生を始める）
             self.is_showing_answer = False
+            self._play_audio(show_answer=False)
             self._render_card(show_answer=False)
             
             # ボタンの表示を切り替え
@@ -202,17 +345,36 @@ class MikanDialog(QDialog):
 
             self._update_progress()
             self._update_button_visibility()
+            self._schedule_prefetch()
             
+    @timed("render_card")
     def _render_card(self, show_answer=False):
         """カードをレンダリング"""
-        if not self.current_card:
+        if not self.current_render:
             return
 
-        # Ankiの標準的なレンダリング方法を使用
+        started = time.perf_counter()
+        try:
+            self._render_html(show_answer, self.input.render_requested(show_answer))
+        finally:
+            if self.session.trace:
+                self.session.trace.record_render(self.current_render.card.id, show_answer,
+                                                 time.perf_counter() - started)
+
+    def _render_html(self, show_answer: bool, seq: int):
+        """質問または解答のHTMLを表示（描画が画面に出たら seq を通知する）"""
+        # キャッシュ済みのAnki標準レンダリング結果を使用
         if show_answer:
-            html = self.current_card.answer()
+            html = self.current_render.answer
         else:
-            html = self.current_card.question()
+            html = self.current_render.question
+
+        if self.persistent_view:
+            # 常駐ページのカード部分だけを差し替える（ページの再読み込みなし）
+            if not self._shell_loaded:
+                self._load_shell()
+            self.web_view.eval(f"mikanSwap({json.dumps(html)});{paint_ack_script(seq)}")
+            return
 
         # カスタム文字サイズ用のCSS
         custom_css = f"""
@@ -227,11 +389,93 @@ class MikanDialog(QDialog):
 """
 
         # Ankiの標準レンダリングを使用してHTMLを生成
-        self.web_view.stdHtml(html, css=[custom_css])
+        self.web_view.stdHtml(html + f"<script>{paint_ack_script(seq)}</script>", css=[custom_css])
         
+    def _load_shell(self):
+        """常駐ページを読み込む（セッション中に1回だけ）"""
+        self.web_view.stdHtml(self.SHELL_HTML % {'font_size': self.font_size})
+        self._shell_loaded = True
+
+    def _schedule_prefetch(self):
+        """現在のキューと次のセットの先頭カードをアイドル時に先読み"""
+        depth = max(self.PREFETCH_DEPTH, self.media.depth)
+        queue = self.session.current_queue
+        upcoming = queue.upcoming(depth) if queue else []
+        self.render_cache.prefetch(upcoming + self.session.peek_next_set(depth))
+        # メディアは現在のキューの次のカードと次のセットの先頭を対象にする
+        self._media_targets = (upcoming[:self.media.depth] +
+                               self.session.peek_next_set(self.media.depth))[:self.media.depth]
+        self._prefetch_timer.start()
+
+    def _on_prefetch_timer(self):
+        """先読みを1枚ずつ進める（イベントループを止めない）"""
+        if self.render_cache.prefetch_step():
+            self._prefetch_timer.start()
+            return
+        # レンダリングが済んだら、そのHTMLが参照するメディアを先読み
+        self._prefetch_media()
+
+    def _on_operation_did_execute(self, changes, handler):
+        """ノートの内容が変わったらレンダリング結果を捨てて先読みし直す"""
+        if changes.note_text:
+            self.render_cache.invalidate()
+            self._schedule_prefetch()
+
+    def _prefetch_media(self):
+        """先読み対象のカードの画像・音声をOSのキャッシュと常駐ページに読み込む"""
+        targets, self._media_targets = self._media_targets, []
+        if not targets or self.media.depth <= 0:
+            return
+        files: List[str] = []
+        images: List[str] = []
+        for card_id in targets:
+            rendered = self.render_cache.peek(card_id)
+            if rendered is None:
+                continue
+            try:
+                files.extend(self.media.media_files(rendered))
+                images.extend(self.media.image_files(rendered))
+            except Exception as e:
+                print(f"カード {card_id} のメディアを取得できません: {e}")
+        self.media.warm(files)
+        if images and self.persistent_view and self._shell_loaded:
+            self.web_view.eval(preload_script(images, keep=self.media.depth * 4))
+
+    def _play_audio(self, show_answer: bool):
+        """カードの音声を再生キューに入れる（自動再生が有効なデッキのみ）
+
+        av_player には次の音声を先に読み込んでおく仕組みがないので、音声の切れ目を
+        なくす（ギャップレス再生）ことはできない。ファイルを先読みでOSのキャッシュに
+        載せておき、カードの描画を待たずに再生を始めるところまでにしている。
+        """
+        av_player.stop_and_clear_queue()
+        card = self.current_card
+        if card is None or not card.autoplay():
+            return
+        tags = card.answer_av_tags() if show_answer else card.question_av_tags()
+        if tags:
+            av_player.play_tags(tags)
+
+    def _on_bridge_cmd(self, cmd: str):
+        """描画完了の通知と、カード内の再生ボタン（play:q:0 など）の処理"""
+        if cmd.startswith(PAINTED_CMD):
+            latency = self.input.painted(int(cmd[len(PAINTED_CMD):]))
+            if latency is not None:
+                self.perf.record("input_to_paint", latency)
+            return
+        if not cmd.startswith("play:") or self.current_card is None:
+            return
+        _, side, index = cmd.split(":")
+        tags = self.current_card.question_av_tags() if side == "q" else self.current_card.answer_av_tags()
+        index = int(index)
+        if 0 <= index < len(tags):
+            av_player.play_tags([tags[index]])
+
     def _on_show_answer(self):
         """解答を表示"""
+        self.input.key_pressed()
         self.is_showing_answer = True
+        self._play_audio(show_answer=True)
         self._render_card(show_answer=True)
         
         # ボタンの表示を切り替え
@@ -246,32 +490,34 @@ class MikanDialog(QDialog):
         
     def _on_answer(self, ease):
         """回答ボタンの処理"""
-        queue = self.session.get_current_queue()
-        if queue:
-            card_id = queue.get_current_card()
-            if card_id:
-                # 初回回答結果を記録
-                self.session.record_first_answer(card_id, ease)
-
-                if ease == 1:  # Again（もう一度）
-                    queue.mark_as_unknown()
-                else:  # Hard/Good/Easy（すべてわかった扱い）
-                    queue.mark_as_known()
-                    self.session.mark_card_complete(card_id)
+        # 解答がまだ画面に出ていなければ、先打ちされた入力として捨てる（時間も計測しない）
+        if not self.input.can_answer():
+            return
+        self.input.key_pressed()
+        with self.perf.probe("answer"):
+            queue = self.session.get_current_queue()
+            if queue:
+                card_id = queue.get_current_card()
+                if card_id:
+                    # 初回回答結果とキューの移動を記録（戻る・やり直し用のログにも）
+                    self.session.answer_card(card_id, ease)
 
-        self._show_next_card()
+            self._show_next_card()
 
     def _on_back(self):
-        """戻るボタンの処理"""
-        if self.session.can_go_back():
+        """戻るボタンの処理（直前の回答を取り消す）"""
+        if self.session.can_undo():
+            self.input.key_pressed()
             # 前のカードに戻る
-            previous_card_id = self.session.go_back()
+            previous_card_id = self.session.undo()
             if previous_card_id:
                 # カードを再表示
-                self.current_card = mw.col.get_card(previous_card_id)
+                self.current_render = self.render_cache.get(previous_card_id)
+                self.current_card = self.current_render.card
 
                 # 質問を表示
                 self.is_showing_answer = False
+                self._play_audio(show_answer=False)
                 self._render_card(show_answer=False)
 
                 # ボタンの表示を切り替え
@@ -285,6 +531,14 @@ class MikanDialog(QDialog):
                 self._update_progress()
                 self._update_button_visibility()
 
+    def _on_redo(self):
+        """やり直しボタンの処理（取り消した回答をもう一度適用）"""
+        if self.is_showing_answer:
+            return
+        if self.session.redo():
+            self.input.key_pressed()
+            self._show_next_card()
+
     def _on_exit(self):
         """終了ボタンの処理"""
         reply = QMessageBox.question(
@@ -297,16 +551,121 @@ class MikanDialog(QDialog):
         
         if reply == QMessageBox.StandardButton.Yes:
             # 統計を一括更新
-            updated_count = self.session.apply_final_answers()
-            if updated_count > 0:
-                showInfo(f"Learning results saved to Anki\nUpdated cards: {updated_count}")
+            self._save_results(self._show_saved_message)
             self.reject()
+
+    def _flush_completed_sets(self):
+        """終わったセットの未反映の回答をバックグラウンドで反映"""
+        # 直前のセットは戻る操作で開き直せるように、1セット遅れで反映する
+        answers = self.session.unapplied_answers(completed_only=True,
+                                                 before_set=self.session.current_set_index)
+        if answers:
+            self._apply_answers_in_background(answers, lambda updated_count: None, with_progress=False)
+
+    def _save_results(self, on_done):
+        """セッション終了時に残りの回答をバックグラウンドで反映（1回だけ）
+
+        途中のセットの反映が残っていれば、それが全部終わってから残りを反映し、
+        反映枚数の確定・ジャーナルのクローズ・スナップショットの保存を行う。
+        """
+        if self._results_saving:
+            return
+        self._results_saving = True
+
+        # セッション終了時刻を記録
+        if not self.session.session_end_time:
+            self.session.session_end_time = time.time()
+
+        def on_saved(updated_count):
+            # すべて反映できたらジャーナルは不要
+            self.session.close_journal(completed=not self.session.unapplied_answers())
+            # 途中終了ならあとで再開できるように状態を保存
+            self._save_snapshot()
+            self._record_history()
+            on_done(updated_count)
+
+        def save_remaining():
+            # 途中の反映が失敗していれば、その回答もここで反映し直す
+            answers = self.session.unapplied_answers()
+            if not answers:
+                on_saved(0)
+                return
+            self._apply_answers_in_background(answers, on_saved)
+
+        self._when_applies_drained(save_remaining)
+
+    def _record_history(self):
+        """セッションの結果を履歴に追加（失敗しても学習結果には影響しない）"""
+        try:
+            store = open_history()
+            try:
+                store.record_session(self.session)
+            finally:
+                store.close()
+        except (sqlite3.Error, OSError) as e:
+            print(f"Mikan Modeの履歴を保存できません: {e}")
+
+    def _apply_answers_in_background(self, answers, on_done, with_progress: bool = True):
+        """回答を1つのUndoエントリにまとめてバックグラウンドで反映（前の反映の後に順に実行）"""
+        self.session.mark_applied(answers)
+        self._apply_queue.append((answers, on_done, with_progress))
+        if not self._apply_running:
+            self._run_next_apply()
+
+    def _when_applies_drained(self, callback: Callable[[], None]):
+        """反映待ちがなくなったら callback を呼ぶ（なければすぐに呼ぶ）"""
+        if self._apply_running:
+            self._apply_drained.append(callback)
+        else:
+            callback()
+
+    def _run_next_apply(self):
+        """反映待ちの先頭を実行（なくなれば待っている処理を呼ぶ）"""
+        if not self._apply_queue:
+            self._apply_running = False
+            drained, self._apply_drained = self._apply_drained, []
+            for callback in drained:
+                callback()
+            return
+        self._apply_running = True
+        answers, on_done, with_progress = self._apply_queue.popleft()
+        started = time.perf_counter()
+
+        def on_success(updated_count):
+            self.perf.record("apply_answers_background", time.perf_counter() - started)
+            self.session.confirm_applied(answers, updated_count)
+            on_done(updated_count)
+            self._run_next_apply()
+
+        def on_failure(e):
+            self.session.unmark_applied(answers)
+            showInfo(f"Failed to save learning results: {str(e)}")
+            self._run_next_apply()
+
+        apply_answers_op(mw, answers, self.session.average_time_per_card(),
+                         on_success, on_failure, with_progress=with_progress).run_in_background()
+
+    def _save_snapshot(self):
+        """途中終了時はスナップショットを保存、完了時は削除"""
+        try:
+            if self.session.is_complete():
+                delete_snapshot()
+            else:
+                save_snapshot(self.session)
+        except Exception as e:
+            print(f"Mikan Modeのスナップショットを保存できません: {e}")
+
+    def _show_saved_message(self, updated_count):
+        """途中終了時の保存結果を表示"""
+        if self.session.applied_count > 0:
+            showInfo(f"Learning results saved to Anki\nUpdated cards: {self.session.applied_count}")
             
     def _show_completion_message(self):
-        """完了メッセージを表示"""
-        # 統計を一括更新
-        updated_count = self.session.apply_final_answers()
+        """完了メッセージを表示（残りの回答を反映してから）"""
+        self._save_results(self._show_completion_summary)
 
+    def _show_completion_summary(self, updated_count):
+        """完了時の集計を表示"""
         progress = self.session.get_progress()
         stats = self.session.get_statistics()
 
@@ -319,7 +678,7 @@ class MikanDialog(QDialog):
         showInfo(f"Mikan Mode Complete!\n\n"
                 f"Cards studied: {progress['completed_cards']}\n"
                 f"Session time: {duration_text}\n"
-                f"Results saved to Anki: {updated_count}\n\n"
+                f"Results saved to Anki: {self.session.applied_count}\n\n"
                 f"--- Performance ---\n"
                 f"New cards: {stats['new_correct']}/{stats['new_total']} ({stats['new_percentage']:.0f}%)\n"
                 f"All cards: {stats['all_correct']}/{stats['all_total']} ({stats['all_percentage']:.0f}%)\n\n"
@@ -354,14 +713,34 @@ class MikanDialog(QDialog):
         if self.is_showing_answer:
             self._on_answer(4)  # 簡単
             
+    def done(self, result):
+        """ダイアログが閉じられる時の処理"""
+        self._prefetch_timer.stop()
+        gui_hooks.operation_did_execute.remove(self._on_operation_did_execute)
+        av_player.stop_and_clear_queue()
+        self.session.close_trace()
+        if self.profile_session and self.perf.is_profiling():
+            save_profile(self.perf, f"session-{self.session.session_id}")
+        super().done(result)
+
+    def _on_debug_panel(self):
+        """処理時間のデバッグパネルを表示"""
+        PerfPanel(self, self.perf, self._debug_stats).exec()
+
+    def _debug_stats(self) -> dict:
+        """デバッグパネルに追加で表示する統計"""
+        return {'render_cache': self.render_cache.stats(),
+                'candidate_cache': candidate_cache.stats(),
+                'media_prefetch': self.media.stats(),
+                'startup': startup_stats(),
+                'settings': settings.stats(),
+                'input': self.input.stats()}
+
     def closeEvent(self, event):
         """ダイアログが閉じられる時の処理（途中終了時に結果を送信）"""
         # 統計を一括更新
         if hasattr(self, 'session') and self.session:
-            updated_count = self.session.apply_final_answers()
-            if updated_count > 0:
-                from aqt.utils import showInfo
-                showInfo(f"Learning results saved to Anki\nUpdated cards: {updated_count}")
+            self._save_results(self._show_saved_message)
         
         super().closeEvent(event)
 
@@ -379,15 +758,16 @@ class MikanDialog(QDialog):
 
     def _update_font_size(self):
         """文字サイズ変更を適用"""
-        # 現在のカードを再レンダリング
-        if self.current_card:
+        if self.persistent_view:
+            # CSS変数を書き換えるだけ（再レンダリングなし）
+            if self._shell_loaded:
+                self.web_view.eval(f"mikanSetFontSize({self.font_size});")
+        elif self.current_card:
+            # 現在のカードを再レンダリング
             self._render_card(self.is_showing_answer)
 
-        # 設定を保存（アドオン設定に保存）
-        from aqt import mw
-        config = mw.addonManager.getConfig(__name__.split('.')[0]) or {}
-        config["font_size"] = self.font_size
-        mw.addonManager.writeConfig(__name__.split('.')[0], config)
+        # 設定を保存（メモリ上のみ。ディスクへはセッション終了時に書き込む）
+        settings.save_preset(self.session.deck_ids, {"font_size": self.font_size})
 
         # フィードバック表示
         tooltip(f"Font size: {self.font_size}px", 1000)
\ No newline at end of file
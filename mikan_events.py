@@ -0,0 +1,98 @@
+from array import array
+from typing import Iterator, NamedTuple, Optional
+
+# 種別コード = ease(下位3ビット) | フラグ
+KNOWN = 0x10  # わかった（キューから外して完了）。なければもう一度（キューの最後へ）
+FIRST = 0x20  # この回答を初回回答として記録した
+
+
+class SessionEvent(NamedTuple):
+    """回答イベント1件"""
+    card_id: int
+    ease: int
+    known: bool
+    first: bool
+    set_no: int  # 回答したときのセット番号（current_set_index）
+
+
+class EventLog:
+    """セッションの回答イベントを固定長レコードで記録するログ（undo/redo用）
+
+    1イベント = カードID(i64) + 種別コード(u8) + セット番号(u16) の11バイト。
+    cursor より後ろは取り消したイベント（やり直し用）で、新しい回答を
+    記録すると捨てられる。undo/redo は cursor を動かすだけなので O(1)。
+    """
+
+    __slots__ = ('card_ids', 'codes', 'set_numbers', 'cursor')
+
+    def __init__(self):
+        self.card_ids = array('q')
+        self.codes = bytearray()
+        self.set_numbers = array('H')
+        self.cursor = 0  # 適用済みのイベント数
+
+    def append(self, card_id: int, ease: int, known: bool, first: bool, set_no: int):
+        """回答イベントを追加（やり直し用のイベントは破棄）"""
+        if self.cursor < len(self.card_ids):
+            del self.card_ids[self.cursor:]
+            del self.codes[self.cursor:]
+            del self.set_numbers[self.cursor:]
+        self.card_ids.append(card_id)
+        self.codes.append(ease | (KNOWN if known else 0) | (FIRST if first else 0))
+        self.set_numbers.append(set_no)
+        self.cursor += 1
+
+    def peek_undo(self) -> Optional[SessionEvent]:
+        """次に取り消すイベント（なければNone）"""
+        return self._event(self.cursor - 1) if self.cursor > 0 else None
+
+    def peek_redo(self) -> Optional[SessionEvent]:
+        """次にやり直すイベント（なければNone）"""
+        return self._event(self.cursor) if self.cursor < len(self.card_ids) else None
+
+    def undo(self) -> Optional[SessionEvent]:
+        """cursorを1つ戻し、取り消すイベントを返す"""
+        event = self.peek_undo()
+        if event is not None:
+            self.cursor -= 1
+        return event
+
+    def redo(self) -> Optional[SessionEvent]:
+        """cursorを1つ進め、やり直すイベントを返す"""
+        event = self.peek_redo()
+        if event is not None:
+            self.cursor += 1
+        return event
+
+    def applied(self) -> Iterator[SessionEvent]:
+        """適用済みのイベントを古い順に返す（状態の再構築用）"""
+        return (self._event(index) for index in range(self.cursor))
+
+    def to_state(self) -> dict:
+        """ログをJSON化できる形で取得"""
+        return {
+            'card_ids': self.card_ids.tolist(),
+            'codes': list(self.codes),
+            'set_numbers': self.set_numbers.tolist(),
+            'cursor': self.cursor,
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> "EventLog":
+        """to_state() の結果からログを復元"""
+        log = cls()
+        log.card_ids.extend(state['card_ids'])
+        log.codes.extend(state['codes'])
+        log.set_numbers.extend(state['set_numbers'])
+        log.cursor = state['cursor']
+        return log
+
+    def _event(self, index: int) -> SessionEvent:
+        """index番目のイベント"""
+        code = self.codes[index]
+        return SessionEvent(self.card_ids[index], code & 0x07, bool(code & KNOWN),
+                            bool(code & FIRST), self.set_numbers[index])
+
+    def __len__(self) -> int:
+        """記録されているイベント数（やり直し用も含む）"""
+        return len(self.card_ids)
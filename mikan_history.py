@@ -0,0 +1,141 @@
+import json
+import os
+import sqlite3
+import time
+from collections import Counter
+from typing import Dict, List, Optional, Tuple
+from .mikan_journal import profile_key
+
+# 履歴の保存先（アドオン更新時も保持される user_files 配下）
+HISTORY_DIR = os.path.join(os.path.dirname(__file__), "user_files", "history")
+
+SCHEMA = """
+create table if not exists sessions (
+    id integer primary key,        -- 最初に開始した時刻（ミリ秒）。中断して再開しても同じ
+    ended integer not null,        -- 終了時刻（秒）
+    duration real not null,        -- 学習時間（秒）
+    set_size integer not null,
+    planned integer not null,      -- 選出したカード数
+    answered integer not null,     -- 初回回答したカード数
+    correct integer not null,      -- 初回でAgain以外だったカード数
+    new_answered integer not null,
+    new_correct integer not null,
+    reps integer not null,         -- 回答した回数（もう一度を含む）
+    completed integer not null,
+    deck_ids text not null,
+    requeue text not null
+);
+create table if not exists set_stats (
+    session_id integer not null,
+    set_no integer not null,
+    cards integer not null,        -- このセットで回答したカード数
+    reps integer not null,         -- このセットでの回答回数
+    primary key (session_id, set_no)
+) without rowid;
+-- セット番号ごとの集計を、表を並べ替えずにこの索引だけで済ませる
+create index if not exists set_stats_by_set on set_stats (set_no, session_id, cards, reps);
+create table if not exists answers (
+    session_id integer not null,
+    seq integer not null,          -- セッション内での回答の順番
+    card_id integer not null,
+    set_no integer not null,
+    ease integer not null,
+    first integer not null,        -- 初回回答なら1
+    primary key (session_id, seq)
+) without rowid;
+"""
+
+# 集計の単位 -> strftime の書式
+PERIODS = {
+    "week": "%Y-W%W",
+    "month": "%Y-%m",
+    "year": "%Y",
+}
+
+
+class HistoryStore:
+    """セッションの履歴を保存するSQLiteファイル
+
+    1セッション1行（sessions）、セットごとの集計（set_stats）、回答1件1行（answers）。
+    レポートは集計済みの sessions / set_stats だけをSQLで集計し、回答の行は読まない。
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: SQLiteファイルのパス
+        """
+        self.path = path
+        self._conn = sqlite3.connect(path)
+        self._conn.executescript(SCHEMA)
+
+    def record_session(self, session):
+        """セッションの結果を保存（再開したセッションは同じ行を置き換える）"""
+        events = list(session.events.applied())
+        if not events:
+            return
+        history_id = session.history_id or session.session_id
+        end_time = session.session_end_time or time.time()
+        stats = session.stats
+        cards: Dict[int, set] = {}
+        reps: Counter = Counter()
+        for event in events:
+            cards.setdefault(event.set_no, set()).add(event.card_id)
+            reps[event.set_no] += 1
+
+        with self._conn:
+            self._conn.execute("delete from answers where session_id = ?", (history_id,))
+            self._conn.execute("delete from set_stats where session_id = ?", (history_id,))
+            self._conn.execute(
+                "insert or replace into sessions values (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (history_id, int(end_time), session.elapsed(), session.set_size, session.planned_total,
+                 stats.answered, stats.correct, stats.new_answered, stats.new_correct, len(events),
+                 int(session.is_complete()), json.dumps(session.deck_ids),
+                 json.dumps(session.requeue.to_config() if session.requeue else {})))
+            self._conn.executemany(
+                "insert into set_stats values (?, ?, ?, ?)",
+                ((history_id, set_no, len(set_cards), reps[set_no]) for set_no, set_cards in cards.items()))
+            self._conn.executemany(
+                "insert into answers values (?, ?, ?, ?, ?, ?)",
+                ((history_id, seq, event.card_id, event.set_no, event.ease, int(event.first))
+                 for seq, event in enumerate(events)))
+
+    def trends(self, period: str = "month", since: Optional[float] = None) -> List[dict]:
+        """期間ごとのセッション数・学習時間・回答ペース・初回正答率・1枚あたりの回答回数
+
+        Args:
+            period: PERIODS のキー
+            since: この時刻（秒）以降に始めたセッションだけを集計
+        """
+        rows = self._conn.execute(
+            f"select strftime('{PERIODS[period]}', id / 1000, 'unixepoch', 'localtime') as period, "
+            f"count(), sum(duration), sum(answered), sum(correct), sum(new_answered), sum(new_correct), "
+            f"sum(reps) from sessions where id >= ? group by period order by period",
+            (int((since or 0) * 1000),)).fetchall()
+        return [{
+            'period': period_name,
+            'sessions': sessions,
+            'minutes': duration / 60,
+            'cards': answered,
+            'cards_per_minute': answered / duration * 60 if duration > 0 else 0.0,
+            'accuracy': correct / answered * 100 if answered else 0.0,
+            'new_accuracy': new_correct / new_answered * 100 if new_answered else 0.0,
+            'reps_per_card': total_reps / answered if answered else 0.0,
+        } for period_name, sessions, duration, answered, correct, new_answered, new_correct, total_reps in rows]
+
+    def set_repetitions(self, since: Optional[float] = None) -> List[Tuple[int, float]]:
+        """セット番号ごとの1枚あたりの回答回数（後半のセットほど疲れていないかの確認用）"""
+        return self._conn.execute(
+            "select set_no, sum(reps) * 1.0 / sum(cards) from set_stats where session_id >= ? "
+            "group by set_no order by set_no",
+            (int((since or 0) * 1000),)).fetchall()
+
+    def close(self):
+        """ファイルを閉じる"""
+        self._conn.close()
+
+
+def open_history() -> HistoryStore:
+    """現在のプロファイルの履歴を開く"""
+    os.makedirs(HISTORY_DIR, exist_ok=True)
+    return HistoryStore(os.path.join(HISTORY_DIR, f"history-{profile_key()}.sqlite3"))
@@ -0,0 +1,93 @@
+import time
+from aqt.qt import *
+from .mikan_history import HistoryStore
+
+# 表の列（見出し, trends() のキー, 書式）
+COLUMNS = [
+    ("Period", 'period', "{}"),
+    ("Sessions", 'sessions', "{}"),
+    ("Cards", 'cards', "{}"),
+    ("Minutes", 'minutes', "{:.0f}"),
+    ("Cards/min", 'cards_per_minute', "{:.1f}"),
+    ("First try %", 'accuracy', "{:.0f}"),
+    ("New first try %", 'new_accuracy', "{:.0f}"),
+    ("Reps/card", 'reps_per_card', "{:.2f}"),
+]
+
+
+class HistoryPanel(QDialog):
+    """セッション履歴の推移を表示するレポート（Tools → Mikan Mode history）"""
+
+    def __init__(self, parent, store: HistoryStore):
+        """
+        Args:
+            parent: 親ウィンドウ
+            store: 表示する履歴
+        """
+        super().__init__(parent)
+        self.store = store
+
+        self.setWindowTitle("Mikan Mode History")
+        self.resize(720, 520)
+
+        layout = QVBoxLayout()
+
+        period_layout = QHBoxLayout()
+        period_layout.addWidget(QLabel("Group by:"))
+        self.period_combo = QComboBox()
+        for label, period in (("Week", "week"), ("Month", "month"), ("Year", "year")):
+            self.period_combo.addItem(label, period)
+        self.period_combo.setCurrentIndex(1)
+        self.period_combo.currentIndexChanged.connect(self.refresh)
+        period_layout.addWidget(self.period_combo)
+        period_layout.addStretch(1)
+        self.timing_label = QLabel()
+        self.timing_label.setStyleSheet("color: gray; font-style: italic;")
+        period_layout.addWidget(self.timing_label)
+        layout.addLayout(period_layout)
+
+        self.table = QTableWidget(0, len(COLUMNS))
+        self.table.setHorizontalHeaderLabels([title for title, _, _ in COLUMNS])
+        self.table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.table.verticalHeader().setVisible(False)
+        layout.addWidget(self.table, 3)
+
+        layout.addWidget(QLabel("Repetitions per card by set number:"))
+        self.sets_table = QTableWidget(0, 2)
+        self.sets_table.setHorizontalHeaderLabels(["Set", "Reps/card"])
+        self.sets_table.setEditTriggers(QAbstractItemView.EditTrigger.NoEditTriggers)
+        self.sets_table.verticalHeader().setVisible(False)
+        layout.addWidget(self.sets_table, 2)
+
+        close_button = QPushButton("Close")
+        close_button.clicked.connect(self.accept)
+        layout.addWidget(close_button)
+
+        self.setLayout(layout)
+        self.refresh()
+
+    def refresh(self):
+        """集計し直して表示"""
+        started = time.perf_counter()
+        trends = self.store.trends(self.period_combo.currentData())
+        repetitions = self.store.set_repetitions()
+        elapsed_ms = (time.perf_counter() - started) * 1000
+
+        self.table.setRowCount(len(trends))
+        # 新しい期間を上に表示
+        for row, values in enumerate(reversed(trends)):
+            for column, (_, key, fmt) in enumerate(COLUMNS):
+                self.table.setItem(row, column, QTableWidgetItem(fmt.format(values[key])))
+
+        self.sets_table.setRowCount(len(repetitions))
+        for row, (set_no, reps_per_card) in enumerate(repetitions):
+            self.sets_table.setItem(row, 0, QTableWidgetItem(str(set_no)))
+            self.sets_table.setItem(row, 1, QTableWidgetItem(f"{reps_per_card:.2f}"))
+
+        self.timing_label.setText(f"{sum(values['sessions'] for values in trends)} sessions, "
+                                  f"computed in {elapsed_ms:.1f} ms")
+
+    def done(self, result):
+        """閉じるときに履歴ファイルも閉じる"""
+        self.store.close()
+        super().done(result)
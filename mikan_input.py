@@ -0,0 +1,127 @@
+import bisect
+import time
+from typing import List, Optional
+
+# 描画完了の通知（pycmd）のプレフィックス。続けて描画の通し番号
+PAINTED_CMD = "mikan:painted:"
+
+# 描画完了の通知が来なくても、この時間が過ぎたら回答を受け付ける（通知が失われても操作不能にしない）
+PAINT_TIMEOUT = 1.0
+
+# 入力から描画までの時間のヒストグラムの区切り（ミリ秒）。最後の区間はそれ以上
+LATENCY_BUCKETS_MS = [8, 16, 33, 50, 100, 200, 500, 1000]
+
+
+def paint_ack_script(seq: int) -> str:
+    """描画が画面に反映されたら Python 側に通知するJS
+
+    requestAnimationFrame を2回待つと、1回目のコールバックの後のフレームが
+    実際に描かれた後になる。
+    """
+    return ("requestAnimationFrame(function () { requestAnimationFrame(function () { "
+            f"pycmd({PAINTED_CMD + str(seq)!r}); }}); }});")
+
+
+class LatencyHistogram:
+    """ミリ秒単位の固定区間ヒストグラム（メモリは一定）"""
+
+    def __init__(self, bounds_ms: List[float] = LATENCY_BUCKETS_MS):
+        """
+        Args:
+            bounds_ms: 区間の上限（昇順）
+        """
+        self.bounds_ms = list(bounds_ms)
+        self.counts = [0] * (len(self.bounds_ms) + 1)
+        self.total = 0
+        self.max_ms = 0.0
+
+    def record(self, seconds: float):
+        """計測結果を1件追加"""
+        ms = seconds * 1000
+        self.counts[bisect.bisect_left(self.bounds_ms, ms)] += 1
+        self.total += 1
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        """区間の上限で近似したパーセンタイル（ミリ秒、件数0ならNone）"""
+        if not self.total:
+            return None
+        rank = self.total * percent / 100
+        seen = 0
+        for bound, count in zip(self.bounds_ms, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def buckets(self) -> dict:
+        """区間ごとの件数（"<=16ms" のようなラベル -> 件数）"""
+        labels = [f"<={bound:g}ms" for bound in self.bounds_ms] + [f">{self.bounds_ms[-1]:g}ms"]
+        return dict(zip(labels, self.counts))
+
+
+class InputGuard:
+    """回答キーの受け付けを描画の状態に合わせて制御するクラス
+
+    - 描画ごとに通し番号を振り、常駐ページ（またはstdHtmlのページ）が
+      描画を終えたら pycmd で番号が返ってくる
+    - 解答がまだ画面に出ていない間の回答は捨てる（先打ちしたキーで
+      見ていないカードに回答しない）
+    - キー入力から、それによる描画が画面に出るまでの時間を記録する
+    """
+
+    def __init__(self):
+        self.seq = 0                # 最後に依頼した描画の通し番号
+        self.painted_seq = 0        # 描画完了が通知された通し番号
+        self._requested_at = 0.0    # 最後の描画を依頼した時刻
+        self._input_at: Optional[float] = None  # 描画待ちの入力の時刻
+        self._input_side = False    # 描画待ちの入力が解答側を出すものか
+        self.histograms = {False: LatencyHistogram(), True: LatencyHistogram()}
+        self.dropped_early = 0      # 描画前に捨てた回答の数
+        self.paint_timeouts = 0     # 通知を待たずに受け付けた回答の数
+
+    def key_pressed(self):
+        """入力を受け付けた時刻を記録（この後の描画までの時間を測る）"""
+        self._input_at = time.perf_counter()
+
+    def render_requested(self, show_answer: bool) -> int:
+        """描画を依頼する直前に呼び、ページに渡す通し番号を返す"""
+        self.seq += 1
+        self._requested_at = time.perf_counter()
+        self._input_side = show_answer
+        return self.seq
+
+    def painted(self, seq: int) -> Optional[float]:
+        """描画完了の通知を処理し、入力から描画までの秒数を返す（古い通知や入力なしはNone）"""
+        if seq != self.seq:
+            return None
+        self.painted_seq = seq
+        if self._input_at is None:
+            return None
+        latency = time.perf_counter() - self._input_at
+        self._input_at = None
+        self.histograms[self._input_side].record(latency)
+        return latency
+
+    def can_answer(self) -> bool:
+        """最後に依頼した描画が画面に出ていれば回答を受け付ける"""
+        if self.painted_seq == self.seq:
+            return True
+        if time.perf_counter() - self._requested_at >= PAINT_TIMEOUT:
+            self.paint_timeouts += 1
+            return True
+        self.dropped_early += 1
+        return False
+
+    def stats(self) -> dict:
+        """デバッグパネル用の統計"""
+        result = {'dropped_early_answers': self.dropped_early, 'paint_timeouts': self.paint_timeouts}
+        for show_answer, name in ((False, 'question'), (True, 'answer')):
+            histogram = self.histograms[show_answer]
+            result[f'{name}_flips'] = histogram.total
+            if histogram.total:
+                result[f'{name}_p50_ms'] = round(histogram.percentile(50), 1)
+                result[f'{name}_p95_ms'] = round(histogram.percentile(95), 1)
+                result[f'{name}_max_ms'] = round(histogram.max_ms, 1)
+                result[f'{name}_histogram'] = histogram.buckets()
+        return result
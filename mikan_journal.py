@@ -0,0 +1,210 @@
+import os
+import struct
+import time
+from typing import Dict, List, Set, Tuple
+from aqt import mw
+from anki.utils import ids2str
+
+# ジャーナルの保存先（アドオン更新時も保持される user_files 配下）
+JOURNAL_DIR = os.path.join(os.path.dirname(__file__), "user_files", "journal")
+
+# レコード種別
+SESSION = 1   # セッション開始（card_id欄にセッションID）
+ANSWER = 2    # 初回回答の記録
+UNDO = 3      # 初回回答の取り消し
+FLUSHED = 4   # Ankiへの反映完了
+CLOSED = 5    # セッションの正常終了（これ以降の再生は不要）
+
+# 1レコード = 種別(u8) + ease(u8) + 経過秒(u16) + カードID(i64) = 12バイト
+RECORD = struct.Struct("<BBHq")
+
+
+class AnswerJournal:
+    """回答を追記していくジャーナル（Ankiがクラッシュした時の復元用）
+
+    書き込みは1回答ごとにOSのバッファへ渡すだけで fsync はしない。
+    プロセスが落ちても書き込み済みのレコードは残る。
+    """
+
+    def __init__(self, path: str, session_id: int):
+        """
+        Args:
+            path: ジャーナルファイルのパス
+            session_id: セッションID（セッション開始時刻のミリ秒）
+        """
+        self.path = path
+        self.session_id = session_id
+        self._started = session_id / 1000
+        self._file = open(path, "ab")
+        self._write(SESSION, 0, session_id)
+
+    @classmethod
+    def create(cls, session_id: int) -> "AnswerJournal":
+        """現在のプロファイル用に新しいジャーナルを作成"""
+        os.makedirs(JOURNAL_DIR, exist_ok=True)
+        return cls(_journal_path(session_id), session_id)
+
+    def record_answer(self, card_id: int, ease: int):
+        """初回回答を記録"""
+        self._write(ANSWER, ease, card_id)
+
+    def record_undo(self, card_id: int):
+        """初回回答の取り消しを記録"""
+        self._write(UNDO, 0, card_id)
+
+    def record_flushed(self, card_ids: List[int]):
+        """Ankiへの反映が完了したカードを記録"""
+        for card_id in card_ids:
+            self._write(FLUSHED, 0, card_id)
+        self.checkpoint()
+
+    def checkpoint(self):
+        """ディスクへ確実に書き出す（セットの区切りなどで呼ぶ）"""
+        if self._file.closed:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def close(self, completed: bool):
+        """ジャーナルを閉じる
+
+        Args:
+            completed: すべての回答を反映済みならTrue（ファイルを削除する）
+        """
+        if self._file.closed:
+            return
+        if completed:
+            self._write(CLOSED, 0, self.session_id)
+        self._file.close()
+        if completed:
+            _remove(self.path)
+
+    def _write(self, kind: int, ease: int, card_id: int):
+        """1レコードを追記"""
+        if self._file.closed:
+            return
+        elapsed = min(int(time.time() - self._started), 0xFFFF)
+        self._file.write(RECORD.pack(kind, ease, max(elapsed, 0), card_id))
+        self._file.flush()
+
+
+class JournalState:
+    """ジャーナルを読み込んだ結果"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self.session_id = 0
+        self.answers: Dict[int, int] = {}  # カードID -> 初回回答
+        self.flushed: Set[int] = set()
+        self.closed = False
+        self.last_elapsed = 0
+
+    def pending_answers(self) -> List[Tuple[int, int]]:
+        """まだ反映されていない回答 (カードID, ease)"""
+        if self.closed:
+            return []
+        return [(card_id, ease) for card_id, ease in self.answers.items()
+                if card_id not in self.flushed]
+
+    def average_time_per_card(self) -> float:
+        """記録された経過時間から1カードあたりの平均時間を計算（最小1秒、最大60秒）"""
+        if not self.answers:
+            return 5.0
+        return max(1.0, min(self.last_elapsed / len(self.answers), 60.0))
+
+
+def read_journal(path: str) -> JournalState:
+    """ジャーナルを読み込む（途中で途切れた末尾のレコードは無視）"""
+    state = JournalState(path)
+    with open(path, "rb") as f:
+        data = f.read()
+    usable = len(data) - len(data) % RECORD.size
+    for kind, ease, elapsed, card_id in RECORD.iter_unpack(data[:usable]):
+        if kind == SESSION:
+            state.session_id = card_id
+        elif kind == ANSWER:
+            state.answers.setdefault(card_id, ease)
+            state.last_elapsed = elapsed
+        elif kind == UNDO:
+            state.answers.pop(card_id, None)
+        elif kind == FLUSHED:
+            state.flushed.add(card_id)
+        elif kind == CLOSED:
+            state.closed = True
+    return state
+
+
+def pending_journal_paths() -> List[str]:
+    """現在のプロファイルの再生待ちジャーナルを古い順に返す"""
+    if not os.path.isdir(JOURNAL_DIR):
+        return []
+    prefix = f"{profile_key()}-"
+    names = sorted(name for name in os.listdir(JOURNAL_DIR)
+                   if name.startswith(prefix) and name.endswith(".bin"))
+    return [os.path.join(JOURNAL_DIR, name) for name in names]
+
+
+def filter_already_answered(col, state: JournalState,
+                            answers: List[Tuple[int, int]]) -> List[Tuple[int, int]]:
+    """セッション開始後にすでに復習ログがあるカードを除外（二重反映の防止）"""
+    if not answers:
+        return []
+    answered = set(col.db.list(
+        f"select distinct cid from revlog where id >= ? and cid in {ids2str(c for c, _ in answers)}",
+        state.session_id))
+    return [(card_id, ease) for card_id, ease in answers if card_id not in answered]
+
+
+def read_pending_journals() -> List[JournalState]:
+    """再生待ちのジャーナルを読み込む（反映する回答がなければ削除）
+
+    ファイルを読むだけなので、起動時にバックグラウンドスレッドから呼ぶ。
+    """
+    states = []
+    for path in pending_journal_paths():
+        try:
+            state = read_journal(path)
+        except OSError as e:
+            print(f"ジャーナル {path} の読み込みに失敗: {e}")
+            continue
+        if not state.pending_answers():
+            _remove(path)
+            continue
+        states.append(state)
+    return states
+
+
+def replay_journals(states: List[JournalState]):
+    """中断されたセッションの未反映の回答を1回だけAnkiに反映（メインスレッドから呼ぶ）"""
+    from aqt.utils import tooltip
+    from .mikan_answers import apply_answers_op
+
+    for state in states:
+        def on_done(updated_count, state=state):
+            _remove(state.path)
+            if updated_count > 0:
+                tooltip(f"Mikan Mode: restored {updated_count} answers from an interrupted session")
+
+        apply_answers_op(
+            mw, state.pending_answers(), state.average_time_per_card(), on_done,
+            filter_answers=lambda col, answers, state=state: filter_already_answered(col, state, answers),
+        ).run_in_background()
+
+
+def _journal_path(session_id: int) -> str:
+    """セッションIDからジャーナルのパスを作成"""
+    return os.path.join(JOURNAL_DIR, f"{profile_key()}-{session_id}.bin")
+
+
+def profile_key() -> str:
+    """ファイル名に使えるプロファイル名"""
+    name = mw.pm.name or "default"
+    return "".join(ch if ch.isalnum() else "_" for ch in name)
+
+
+def _remove(path: str):
+    """ファイルを削除（なければ無視）"""
+    try:
+        os.remove(path)
+    except OSError:
+        pass
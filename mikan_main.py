@@ -0,0 +1,253 @@
+import time
+from typing import List, Optional
+from aqt import mw
+from aqt.qt import (QDialog, QVBoxLayout, QHBoxLayout, QPushButton, QSpinBox, QLabel, QSlider, Qt,
+                    QListWidget, QListWidgetItem, QComboBox)
+from aqt.utils import tooltip, showInfo
+from aqt.operations import QueryOp
+from .mikan_candidates import candidate_cache
+from .mikan_requeue import STRATEGIES, make_strategy
+from .mikan_session import MikanSession
+from .mikan_dialog import MikanDialog
+from .mikan_journal import AnswerJournal
+from .mikan_history import open_history
+from .mikan_history_panel import HistoryPanel
+from .mikan_settings import settings
+from .mikan_trace import TraceRecorder
+from .mikan_snapshot import delete_snapshot, load_snapshot, restore_session, validate_snapshot
+
+
+def show_mikan_dialog():
+    """Mikan Mode開始ダイアログを表示"""
+    dialog = QDialog(mw)
+    dialog.setWindowTitle("Mikan Mode Settings")
+    dialog.setModal(True)
+
+    layout = QVBoxLayout()
+
+    # 設定を読み込み（読み込み済みならディスクにはアクセスしない）
+    config = settings.values()
+
+    # Deck selection（チェックしたデッキとそのサブデッキをまとめて学習）
+    layout.addWidget(QLabel("Decks (subdecks included):"))
+
+    deck_list = QListWidget()
+    deck_list.setMaximumHeight(140)
+    all_decks = {deck.id: deck.name for deck in mw.col.decks.all_names_and_ids()}
+    checked_ids = set(deck_id for deck_id in config.get("deck_ids", []) if deck_id in all_decks)
+    if not checked_ids:
+        checked_ids = {mw.col.decks.selected()}
+    preset = settings.preset(checked_ids)
+    for deck_id, name in sorted(all_decks.items(), key=lambda item: item[1].lower()):
+        item = QListWidgetItem(name)
+        item.setData(Qt.ItemDataRole.UserRole, deck_id)
+        item.setFlags(item.flags() | Qt.ItemFlag.ItemIsUserCheckable)
+        item.setCheckState(Qt.CheckState.Checked if deck_id in checked_ids else Qt.CheckState.Unchecked)
+        deck_list.addItem(item)
+    layout.addWidget(deck_list)
+
+    def checked_deck_ids():
+        return [deck_list.item(row).data(Qt.ItemDataRole.UserRole)
+                for row in range(deck_list.count())
+                if deck_list.item(row).checkState() == Qt.CheckState.Checked]
+
+    # Set size setting
+    set_size_layout = QHBoxLayout()
+    set_size_layout.addWidget(QLabel("Cards per set:"))
+
+    set_size_spinbox = QSpinBox()
+    set_size_spinbox.setMinimum(3)
+    set_size_spinbox.setMaximum(10)
+    set_size_spinbox.setValue(preset["set_size"])
+    set_size_spinbox.setSuffix(" cards")
+    set_size_layout.addWidget(set_size_spinbox)
+
+    layout.addLayout(set_size_layout)
+
+    # Number of sets setting
+    num_sets_layout = QHBoxLayout()
+    num_sets_layout.addWidget(QLabel("Number of sets:"))
+
+    num_sets_spinbox = QSpinBox()
+    num_sets_spinbox.setMinimum(1)
+    num_sets_spinbox.setMaximum(100)
+    num_sets_spinbox.setValue(preset["num_sets"])
+    num_sets_spinbox.setSuffix(" sets")
+    num_sets_layout.addWidget(num_sets_spinbox)
+
+    layout.addLayout(num_sets_layout)
+
+    # Font size setting
+    font_size_layout = QHBoxLayout()
+    font_size_layout.addWidget(QLabel("Font size:"))
+
+    font_size_slider = QSlider(Qt.Orientation.Horizontal)
+    font_size_slider.setMinimum(12)
+    font_size_slider.setMaximum(32)
+    font_size_slider.setValue(preset["font_size"])
+    font_size_slider.setTickPosition(QSlider.TickPosition.TicksBelow)
+    font_size_slider.setTickInterval(4)
+
+    font_size_label = QLabel(f"{preset['font_size']}px")
+    font_size_label.setMinimumWidth(40)
+
+    def update_font_size_label():
+        font_size_label.setText(f"{font_size_slider.value()}px")
+
+    font_size_slider.valueChanged.connect(update_font_size_label)
+
+    font_size_layout.addWidget(font_size_slider)
+    font_size_layout.addWidget(font_size_label)
+
+    layout.addLayout(font_size_layout)
+
+    # Requeue strategy（わからなかったカードをキューのどこに戻すか）
+    requeue_layout = QHBoxLayout()
+    requeue_layout.addWidget(QLabel("Missed cards return:"))
+
+    requeue_combo = QComboBox()
+    for name, label in STRATEGIES.items():
+        requeue_combo.addItem(label, name)
+    requeue_combo.setCurrentIndex(max(0, requeue_combo.findData(config.get("requeue_strategy", "fifo"))))
+    requeue_layout.addWidget(requeue_combo)
+
+    layout.addLayout(requeue_layout)
+
+    # Total cards display
+    total_layout = QHBoxLayout()
+    total_label = QLabel("Total cards: 30")
+    total_label.setStyleSheet("color: gray; font-style: italic;")
+    total_layout.addWidget(total_label)
+    layout.addLayout(total_layout)
+
+    # Update total when values change
+    def update_total():
+        total = set_size_spinbox.value() * num_sets_spinbox.value()
+        total_label.setText(f"Total cards: {total}")
+
+    set_size_spinbox.valueChanged.connect(update_total)
+    num_sets_spinbox.valueChanged.connect(update_total)
+    update_total()
+
+    # デッキの選択を変えたら、その組み合わせで前回使った設定に切り替える
+    def apply_preset(_item):
+        preset = settings.preset(checked_deck_ids() or [mw.col.decks.selected()])
+        set_size_spinbox.setValue(preset["set_size"])
+        num_sets_spinbox.setValue(preset["num_sets"])
+        font_size_slider.setValue(preset["font_size"])
+
+    deck_list.itemChanged.connect(apply_preset)
+
+    # Buttons
+    button_layout = QHBoxLayout()
+
+    start_button = QPushButton("Start")
+    start_button.clicked.connect(lambda: start_mikan_mode(
+        set_size_spinbox.value(), num_sets_spinbox.value(), font_size_slider.value(), dialog,
+        checked_deck_ids(), requeue_combo.currentData()))
+    button_layout.addWidget(start_button)
+
+    cancel_button = QPushButton("Cancel")
+    cancel_button.clicked.connect(dialog.reject)
+    button_layout.addWidget(cancel_button)
+
+    layout.addLayout(button_layout)
+
+    dialog.setLayout(layout)
+    dialog.exec()
+
+def start_mikan_mode(set_size: int, num_sets: int, font_size: int, dialog: QDialog,
+                     deck_ids: Optional[List[int]] = None, requeue_strategy: str = "fifo"):
+    """Mikan Modeを開始"""
+    clicked_at = time.perf_counter()
+
+    # デッキが選ばれていなければ現在のデッキ
+    deck_ids = deck_ids or [mw.col.decks.selected()]
+
+    # 設定を保存（デッキの組み合わせごとのプリセットにも記録。書き込みはセッション終了時）
+    settings.save_preset(deck_ids, {"set_size": set_size, "num_sets": num_sets, "font_size": font_size})
+    settings.update({"deck_ids": deck_ids, "requeue_strategy": requeue_strategy})
+    config = settings.values()
+    candidate_cache.fallback_weight = config.get("fallback_weight", "uniform")
+
+    dialog.accept()
+
+    # セッションを作成（総カード数とセットサイズを渡す）
+    # カードの準備はUIスレッドを止めないようにバックグラウンドで行う
+    session_size = set_size * num_sets
+    session = MikanSession(session_size=session_size, set_size=set_size, prepare=False,
+                           deck_ids=deck_ids, requeue=make_strategy(config))
+
+    # 残りのセットは学習中に必要になったときに作成される
+    QueryOp(
+        parent=mw,
+        op=lambda col: session.prepare_first_set(),
+        success=lambda _: run_session(session, config, clicked_at),
+    ).failure(show_error).with_progress("Preparing Mikan Mode...").run_in_background()
+
+def resume_last_session():
+    """前回中断したセッションを再開（コレクションの検索はしない）"""
+    clicked_at = time.perf_counter()
+    data = load_snapshot()
+    if data is None:
+        tooltip("No Mikan Mode session to resume")
+        return
+
+    # カードが削除・変更されていたら再開しない
+    if not validate_snapshot(data):
+        delete_snapshot()
+        showInfo("The cards of the last Mikan Mode session have changed since it was saved.\n"
+                 "Please start a new session.")
+        return
+
+    try:
+        session = restore_session(data)
+    except Exception as e:
+        show_error(e)
+        return
+    run_session(session, settings.values(), clicked_at)
+
+def run_session(session: MikanSession, config: dict, clicked_at: float):
+    """準備済みのセッションでMikan Modeダイアログを表示"""
+    # 回答をクラッシュに備えてジャーナルにも記録する
+    try:
+        session.journal = AnswerJournal.create(session.session_id)
+    except OSError as e:
+        print(f"Mikan Modeのジャーナルを作成できません: {e}")
+
+    # 有効なら操作をトレースに記録（プロファイリングでの再生用）
+    if config.get("trace_sessions", False):
+        try:
+            session.trace = TraceRecorder.create(session)
+        except OSError as e:
+            print(f"Mikan Modeのトレースを作成できません: {e}")
+
+    # 文字サイズの変更などはセッションが終わるまでメモリに留める
+    settings.begin_session()
+    try:
+        # Mikan Modeダイアログを表示（文字サイズはデッキのプリセットから）
+        mikan_dialog = MikanDialog(session, settings.preset(session.deck_ids)["font_size"],
+                                   persistent_view=config.get("persistent_view", True),
+                                   profile_session=config.get("profile_session", False),
+                                   media_depth=config.get("media_prefetch_depth", 3),
+                                   media_cache_mb=config.get("media_prefetch_mb", 32))
+        # Startを押してから最初のカードを表示するまでの時間
+        session.perf.record("start_to_first_card", time.perf_counter() - clicked_at)
+        mikan_dialog.exec()
+    except Exception as e:
+        show_error(e)
+    finally:
+        settings.end_session()
+
+def show_history():
+    """セッション履歴のレポートを表示"""
+    try:
+        store = open_history()
+    except Exception as e:
+        show_error(e)
+        return
+    HistoryPanel(mw, store).exec()
+
+def show_error(e: Exception):
+    """エラーを表示"""
+    showInfo(f"An error occurred: {str(e)}")
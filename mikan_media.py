@@ -0,0 +1,122 @@
+import json
+import os
+import re
+import threading
+from collections import OrderedDict
+from typing import Iterable, List
+from urllib.parse import unquote
+from aqt import mw
+
+# 質問/解答HTML中の画像参照
+IMG_RE = re.compile(r"""<img[^>]*?\ssrc\s*=\s*["']?([^"'\s>]+)""", re.IGNORECASE)
+
+# OSのキャッシュに載せるときの読み込み単位
+READ_CHUNK = 1024 * 1024
+
+
+class MediaPrefetcher:
+    """次に表示するカードの画像・音声を先読みするクラス
+
+    ファイルはバックグラウンドで読み捨ててOSのページキャッシュに載せ、
+    画像は常駐ページ側でもデコードしておく（mikanPreload）。
+    先読みの合計サイズは max_bytes まで。
+    統計のカウンタはバックグラウンドスレッドからも更新するので _lock の中で増やす。
+    """
+
+    def __init__(self, depth: int = 3, max_bytes: int = 32 * 1024 * 1024):
+        """
+        Args:
+            depth: 何枚先のカードまで先読みするか（0で無効）
+            max_bytes: 先読み済みとして保持するファイルの合計サイズの上限
+        """
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._warmed: "OrderedDict[str, int]" = OrderedDict()  # ファイル名 -> サイズ
+        self._warmed_bytes = 0
+        self._lock = threading.Lock()
+        self.files_warmed = 0
+        self.bytes_warmed = 0
+        self.skipped = 0
+
+    def media_files(self, rendered) -> List[str]:
+        """レンダリング済みカードが参照する画像・音声のファイル名"""
+        files = []
+        for html in (rendered.question, rendered.answer):
+            files.extend(name for name in IMG_RE.findall(html) if not _is_remote(name))
+        files.extend(audio_files(rendered.card))
+        return list(dict.fromkeys(files))
+
+    def image_files(self, rendered) -> List[str]:
+        """常駐ページで先にデコードしておく画像のファイル名"""
+        return list(dict.fromkeys(name for name in IMG_RE.findall(rendered.question + rendered.answer)
+                                  if not _is_remote(name)))
+
+    def warm(self, files: Iterable[str]):
+        """まだ先読みしていないファイルをバックグラウンドで読み込む"""
+        with self._lock:
+            todo = [name for name in files if name not in self._warmed]
+        if todo and self.depth > 0:
+            media_dir = mw.col.media.dir()
+            mw.taskman.run_in_background(lambda: self._read_files(media_dir, todo))
+
+    def stats(self) -> dict:
+        """先読みの統計"""
+        with self._lock:
+            return {
+                'files': self.files_warmed,
+                'bytes': self.bytes_warmed,
+                'cached_bytes': self._warmed_bytes,
+                'skipped': self.skipped,
+            }
+
+    def _read_files(self, media_dir: str, files: List[str]):
+        """ファイルを読み捨ててOSのキャッシュに載せる（バックグラウンドスレッド）"""
+        for name in files:
+            path = os.path.join(media_dir, unquote(name))
+            try:
+                size = os.path.getsize(path)
+            except OSError:
+                continue
+            if size > self.max_bytes:
+                # 上限より大きいファイル（動画など）は先読みしない
+                with self._lock:
+                    self.skipped += 1
+                continue
+            try:
+                with open(path, "rb") as f:
+                    while f.read(READ_CHUNK):
+                        pass
+            except OSError:
+                continue
+            self._remember(name, size)
+
+    def _remember(self, name: str, size: int):
+        """先読み済みとして記録し、上限を超えた分は古い順に忘れる"""
+        with self._lock:
+            if name in self._warmed:
+                return
+            self._warmed[name] = size
+            self._warmed_bytes += size
+            while self._warmed_bytes > self.max_bytes and self._warmed:
+                _, old_size = self._warmed.popitem(last=False)
+                self._warmed_bytes -= old_size
+            self.files_warmed += 1
+            self.bytes_warmed += size
+
+
+def audio_files(card) -> List[str]:
+    """カードの質問・解答で再生する音声のファイル名"""
+    files = []
+    for tags in (card.question_av_tags(), card.answer_av_tags()):
+        files.extend(tag.filename for tag in tags if hasattr(tag, "filename"))
+    return files
+
+
+def preload_script(files: List[str], keep: int) -> str:
+    """常駐ページで画像を先にデコードさせるJavaScript"""
+    return f"mikanPreload({json.dumps(files)}, {int(keep)});"
+
+
+def _is_remote(name: str) -> bool:
+    """外部URLやdata URIかどうか（先読み対象外）"""
+    return "://" in name or name.startswith(("data:", "//"))
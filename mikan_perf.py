@@ -0,0 +1,131 @@
+import cProfile
+import functools
+import io
+import json
+import math
+import pstats
+import time
+from collections import deque
+from contextlib import contextmanager
+from typing import Deque, Dict, Optional
+
+
+class PerfRecorder:
+    """処理フェーズごとの所要時間を記録する軽量プローブ
+
+    フェーズごとに直近 max_samples 件だけを保持する（メモリは一定）。
+    キャッシュのヒットなど時間のない出来事は count() で回数だけを数える。
+    """
+
+    def __init__(self, max_samples: int = 2000):
+        """
+        Args:
+            max_samples: フェーズごとに保持する計測数
+        """
+        self.max_samples = max_samples
+        self._samples: Dict[str, Deque[float]] = {}
+        self._counts: Dict[str, int] = {}
+        self._events: Dict[str, int] = {}  # 出来事ごとの回数（時間は記録しない）
+        self._profiler: Optional[cProfile.Profile] = None
+
+    def record(self, phase: str, seconds: float):
+        """計測結果を1件追加"""
+        samples = self._samples.get(phase)
+        if samples is None:
+            samples = self._samples[phase] = deque(maxlen=self.max_samples)
+            self._counts[phase] = 0
+        samples.append(seconds)
+        self._counts[phase] += 1
+
+    def count(self, event: str):
+        """出来事の回数を1つ増やす（キャッシュのヒット・ミスなど）"""
+        self._events[event] = self._events.get(event, 0) + 1
+
+    def events(self) -> Dict[str, int]:
+        """出来事ごとの回数"""
+        return dict(self._events)
+
+    @contextmanager
+    def probe(self, phase: str):
+        """with文で囲んだ区間の時間を計測"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(phase, time.perf_counter() - start)
+
+    def summary(self) -> Dict[str, dict]:
+        """フェーズごとの p50 / p95 / max（ミリ秒）を取得"""
+        result = {}
+        for phase, samples in self._samples.items():
+            values = sorted(samples)
+            if not values:
+                continue
+            result[phase] = {
+                'count': self._counts[phase],
+                'p50_ms': round(_percentile(values, 50) * 1000, 3),
+                'p95_ms': round(_percentile(values, 95) * 1000, 3),
+                'max_ms': round(values[-1] * 1000, 3),
+                'total_ms': round(sum(values) * 1000, 3),
+            }
+        return result
+
+    def format_summary(self) -> str:
+        """summary() を表形式の文字列にする"""
+        lines = [f"{'phase':<24}{'count':>7}{'p50 ms':>10}{'p95 ms':>10}{'max ms':>10}"]
+        for phase, row in sorted(self.summary().items()):
+            lines.append(f"{phase:<24}{row['count']:>7}{row['p50_ms']:>10.2f}"
+                         f"{row['p95_ms']:>10.2f}{row['max_ms']:>10.2f}")
+        if self._events:
+            lines.append("")
+            lines.append(f"{'event':<24}{'count':>7}")
+            for event, count in sorted(self._events.items()):
+                lines.append(f"{event:<24}{count:>7}")
+        return "\n".join(lines)
+
+    def to_json(self, **extra) -> str:
+        """summary() をJSONで出力（extraは追加情報）"""
+        return json.dumps({'phases': self.summary(), 'events': self.events(), **extra}, indent=1, ensure_ascii=False)
+
+    def is_profiling(self) -> bool:
+        """プロファイラが動作中かどうか"""
+        return self._profiler is not None
+
+    def start_profiler(self):
+        """cProfileによる計測を開始"""
+        if self._profiler is None:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+
+    def stop_profiler(self, path: Optional[str] = None, limit: int = 40) -> str:
+        """cProfileを止めて上位の関数を文字列で返す（pathがあれば .prof も保存）"""
+        profiler = self._profiler
+        if profiler is None:
+            return ""
+        profiler.disable()
+        self._profiler = None
+        if path:
+            profiler.dump_stats(path)
+        out = io.StringIO()
+        pstats.Stats(profiler, stream=out).sort_stats("cumulative").print_stats(limit)
+        return out.getvalue()
+
+
+def timed(phase: str):
+    """メソッドの所要時間を self.perf に記録するデコレータ"""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(self, *args, **kwargs):
+            perf = getattr(self, 'perf', None)
+            if perf is None:
+                return fn(self, *args, **kwargs)
+            with perf.probe(phase):
+                return fn(self, *args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def _percentile(sorted_values, percent: float) -> float:
+    """ソート済みの値から百分位数を取得（最近傍法）"""
+    rank = math.ceil(percent / 100 * len(sorted_values))
+    return sorted_values[max(0, min(len(sorted_values), rank) - 1)]
@@ -0,0 +1,60 @@
+import time
+from typing import Optional
+
+# 期日を過ぎた当日の学習カードと、期日ちょうどの日単位の学習カードの緊急度
+# （期日を間隔1回分過ぎた復習カードと同じ）
+LEARNING_BASE = 1.0
+# まだ期日前の当日の学習カードの緊急度（期日になった復習カードより後、新規より前）
+LEARNING_WAITING = -0.5
+# 新規カードの緊急度（期日になった復習カードより後）
+NEW_URGENCY = -1.0
+SECONDS_PER_DAY = 86400
+# 当日の学習カードの期日を判定する時刻の刻み（秒）。同じ刻みの間は並びも変わらない
+TIME_BUCKET_SECONDS = 300
+
+
+def time_bucket(now: Optional[float] = None) -> int:
+    """現在時刻の刻みの番号（CandidateCache のキーに含める）"""
+    return int((time.time() if now is None else now) // TIME_BUCKET_SECONDS)
+
+
+def learning_cutoff(bucket: int) -> int:
+    """刻みの終わりの時刻（秒）。当日の学習カードはこの時刻までに期日になれば期日とみなす"""
+    return (bucket + 1) * TIME_BUCKET_SECONDS
+
+
+def urgency_sql(today: int, cutoff: int) -> str:
+    """cards の行の緊急度（大きいほど先に出す）を計算するSQL式
+
+    due の意味はキューごとに違う（復習は日番号、当日の学習は秒、新規は作成順）ので、
+    どのキューも「間隔に対してどれだけ期日を過ぎたか」の尺度に揃える。
+
+    - 復習（queue 2）: 超過日数 / 間隔。期日当日で 0、間隔と同じ日数の超過で 1
+    - 日単位の学習・再学習（queue 3）: 1 + 超過日数 / 間隔
+    - 当日の学習・再学習（queue 1）: 期日が cutoff までなら 1 + 超過秒数 / 1日、
+      まだ期日前なら -0.5（期日の復習より後、新規より前）
+    - 新規（type 0）: -1
+
+    超過秒数は現在時刻ではなく cutoff から数えるので、並び順は cutoff の刻み
+    （time_bucket）とコレクションが変わらない限り同じ。
+    フィルターデッキ内の復習カードは元の期日（odue）で判定する。
+    """
+    due = "(case when odid != 0 and odue != 0 then odue else due end)"
+    overdue = f"(({int(today)} - {due}) * 1.0 / max(ivl, 1))"
+    cutoff = int(cutoff)
+    return (f"(case when type = 0 then {NEW_URGENCY} "
+            f"when queue = 1 and due <= {cutoff} "
+            f"then {LEARNING_BASE} + ({cutoff} - due) * 1.0 / {SECONDS_PER_DAY} "
+            f"when queue = 1 then {LEARNING_WAITING} "
+            f"when queue = 3 then {LEARNING_BASE} + {overdue} "
+            f"else {overdue} end)")
+
+
+def priority_order_sql(today: int, cutoff: int) -> str:
+    """緊急度の高い順に並べる ORDER BY 句
+
+    同じ緊急度の中では、新規は作成順、期日前の当日の学習は期日順、最後にID順。
+    """
+    return (f"order by {urgency_sql(today, cutoff)} desc, "
+            f"(case when type = 0 then due else 0 end), "
+            f"(case when queue = 1 then due else 0 end), id")
@@ -1,8 +1,15 @@
 from collections import deque
-from typing import List, Optional, Any
+from itertools import islice
+from typing import Any, Dict, List, Optional
 
 class MikanQueue:
-    """指定枚数1セットのカードキューを管理するクラス"""
+    """指定枚数1セットのカードキューを管理するクラス
+
+    すべての操作は定数時間。完了済みカードは挿入順を保つ dict で管理し、
+    戻る操作（push_front）での削除も O(1) で行う。
+    """
+
+    __slots__ = ('set_size', 'queue', 'completed')
 
     def __init__(self, cards: List[Any], set_size: int = 5):
         """
@@ -11,50 +18,60 @@ class MikanQueue:
             set_size: セットのサイズ（デフォルト5枚）
         """
         self.set_size = set_size
-        self.queue = deque(cards[:set_size])  # 指定枚数まで
-        self.completed = []  # このセットで完了したカード
-        
+        self.queue = deque(islice(cards, set_size))  # 指定枚数まで
+        self.completed: Dict[Any, None] = {}  # このセットで完了したカード（挿入順）
+
     def get_current_card(self) -> Optional[Any]:
         """キューの先頭のカードを返す（削除しない）"""
         if self.queue:
             return self.queue[0]
         return None
-    
+
     def mark_as_known(self) -> Optional[Any]:
         """現在のカードを完了としてキューから削除"""
         if self.queue:
             card = self.queue.popleft()
-            self.completed.append(card)
+            self.completed[card] = None
             return card
         return None
-    
+
     def mark_as_unknown(self) -> Optional[Any]:
         """現在のカードをキューの最後に移動"""
         if self.queue:
-            card = self.queue.popleft()
-            self.queue.append(card)
+            card = self.queue[0]
+            self.queue.rotate(-1)
             return card
         return None
-    
+
+    def unmark_unknown(self) -> Optional[Any]:
+        """mark_as_unknown を取り消す（最後尾のカードを先頭に戻す）"""
+        if self.queue:
+            self.queue.rotate(1)
+            return self.queue[0]
+        return None
+
+    def upcoming(self, count: int) -> List[Any]:
+        """現在のカードの次から最大count枚を返す（削除しない）"""
+        return list(islice(self.queue, 1, count + 1))
+
     def is_complete(self) -> bool:
         """キューが空かどうか"""
-        return len(self.queue) == 0
-    
+        return not self.queue
+
     def remaining_count(self) -> int:
         """残りのカード数"""
         return len(self.queue)
-    
+
     def completed_count(self) -> int:
         """完了したカード数"""
         return len(self.completed)
-    
+
     def push_front(self, card: Any):
         """カードをキューの先頭に追加"""
         self.queue.appendleft(card)
         # completedからも除去（戻る操作の場合）
-        if card in self.completed:
-            self.completed.remove(card)
+        self.completed.pop(card, None)
 
     def __len__(self) -> int:
         """キュー内のカード数"""
-        return len(self.queue)
\ No newline at end of file
+        return len(self.queue)
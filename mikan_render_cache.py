@@ -0,0 +1,107 @@
+from collections import OrderedDict, deque
+from typing import Deque, Iterable, NamedTuple, Optional
+from aqt import mw
+from anki.cards import Card
+
+
+class RenderedCard(NamedTuple):
+    """レンダリング済みのカード"""
+    card: Card
+    question: str
+    answer: str
+
+
+class RenderCache:
+    """セッション内で質問/解答HTMLを保持するLRUキャッシュ
+
+    キーはカードID。ノートが編集されたら invalidate で捨てて再レンダリングする
+    （ダイアログが operation_did_execute で呼ぶ。取り出すたびに notes を検索しない）。
+    """
+
+    def __init__(self, max_entries: int = 64):
+        """
+        Args:
+            max_entries: 保持する最大カード数（超えた分は古い順に破棄）
+        """
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[int, RenderedCard]" = OrderedDict()
+        self._pending: Deque[int] = deque()  # 先読み待ちのカードID
+        self.hits = 0
+        self.misses = 0
+        self.prefetched = 0
+
+    def get(self, card_id: int) -> RenderedCard:
+        """カードのレンダリング結果を取得（なければその場でレンダリング）"""
+        entry = self._lookup(card_id)
+        if entry is not None:
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        return self._render(card_id)
+
+    def peek(self, card_id: int) -> Optional[RenderedCard]:
+        """キャッシュ済みの結果を取得（レンダリング・統計の更新はしない）"""
+        return self._entries.get(card_id)
+
+    def prefetch(self, card_ids: Iterable[int]):
+        """先読みするカードを登録（実際のレンダリングは prefetch_step で1枚ずつ）"""
+        for card_id in card_ids:
+            if card_id not in self._entries and card_id not in self._pending:
+                self._pending.append(card_id)
+
+    def prefetch_step(self) -> bool:
+        """先読み待ちのカードを1枚だけレンダリング（アイドル時に呼ぶ）"""
+        if not self._pending:
+            return False
+        card_id = self._pending.popleft()
+        if card_id not in self._entries:
+            try:
+                self._render(card_id)
+                self.prefetched += 1
+            except Exception as e:
+                print(f"カード {card_id} の先読みに失敗: {e}")
+        return bool(self._pending)
+
+    def invalidate(self):
+        """レンダリング結果だけを捨てる（ノートが編集されたとき。統計は残す）"""
+        self._entries.clear()
+
+    def clear(self):
+        """キャッシュを空にする"""
+        self._entries.clear()
+        self._pending.clear()
+
+    def stats(self) -> dict:
+        """ヒット/ミスの統計を取得"""
+        lookups = self.hits + self.misses
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'prefetched': self.prefetched,
+            'hit_rate': (self.hits / lookups * 100) if lookups > 0 else 0,
+            'entries': len(self._entries),
+        }
+
+    def _lookup(self, card_id: int) -> Optional[RenderedCard]:
+        """キャッシュを検索（見つかれば最近使ったものにする）"""
+        entry = self._entries.get(card_id)
+        if entry is None:
+            return None
+        self._entries.move_to_end(card_id)
+        return entry
+
+    def _render(self, card_id: int) -> RenderedCard:
+        """カードをレンダリングしてキャッシュに格納"""
+        card = mw.col.get_card(card_id)
+        entry = RenderedCard(
+            card=card,
+            # [anki:play:...] を再生ボタンに置き換え、メディアのファイル名をエスケープ
+            question=mw.prepare_card_text_for_display(card.question()),
+            answer=mw.prepare_card_text_for_display(card.answer()),
+        )
+        self._entries[card_id] = entry
+        self._entries.move_to_end(card_id)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
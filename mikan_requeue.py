@@ -0,0 +1,223 @@
+import heapq
+import itertools
+import time
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Tuple
+from .mikan_queue import MikanQueue
+
+# 設定で選べる並べ方（名前 -> 設定画面の表示名）
+STRATEGIES = {
+    "fifo": "Back of the queue (default)",
+    "k_later": "A few cards later",
+    "min_elapsed": "After a minimum time",
+    "weakest_first": "Weakest first",
+}
+
+
+class RequeueStrategy(ABC):
+    """わからなかったカードをキューのどこに戻すかを決める並べ方
+
+    キーが小さいカードほど先に表示される。clock は回答したカードのキー + 1
+    （回答したカードのすぐ後ろの位置）。キーが同じなら先にキューに入ったカードが先なので、
+    clock + n - 1 で n 枚後に表示される。
+    """
+
+    name = ""
+
+    def initial_key(self, index: int) -> float:
+        """セット作成時の index 番目のカードのキー"""
+        return index
+
+    @abstractmethod
+    def requeue_key(self, clock: float, misses: int) -> float:
+        """わからなかったカードを戻すときのキー（misses はこのセットでの失敗回数）"""
+
+    def to_config(self) -> dict:
+        """make_strategy で同じ並べ方を作り直せる設定"""
+        return {"requeue_strategy": self.name}
+
+
+class KLaterStrategy(RequeueStrategy):
+    """k枚回答した後にもう一度表示する"""
+
+    name = "k_later"
+
+    def __init__(self, k: int = 3):
+        self.k = max(1, k)
+
+    def requeue_key(self, clock: float, misses: int) -> float:
+        return clock + self.k - 1
+
+    def to_config(self) -> dict:
+        return {"requeue_strategy": self.name, "requeue_k": self.k}
+
+
+class MinElapsedStrategy(RequeueStrategy):
+    """前回の表示から指定秒数が経つまで再表示しない（ほかにカードがなければ早めに表示）"""
+
+    name = "min_elapsed"
+
+    def __init__(self, seconds: float = 30.0):
+        self.seconds = seconds
+
+    def initial_key(self, index: int) -> float:
+        # まだ表示していないカードは時刻より前（順番どおり）
+        return -1e12 + index
+
+    def requeue_key(self, clock: float, misses: int) -> float:
+        return time.monotonic() + self.seconds
+
+    def to_config(self) -> dict:
+        return {"requeue_strategy": self.name, "requeue_seconds": self.seconds}
+
+
+class WeakestFirstStrategy(RequeueStrategy):
+    """失敗した回数が多いカードほど早く再表示する（1回目は k 枚後、以降は k/失敗回数 枚後）"""
+
+    name = "weakest_first"
+
+    def __init__(self, k: int = 3):
+        self.k = max(1, k)
+
+    def requeue_key(self, clock: float, misses: int) -> float:
+        return clock + max(1.0, self.k / misses) - 1
+
+    def to_config(self) -> dict:
+        return {"requeue_strategy": self.name, "requeue_k": self.k}
+
+
+class PriorityMikanQueue(MikanQueue):
+    """並べ方を差し替えられるヒープ実装の MikanQueue
+
+    カードごとの最新エントリを辞書で引けるインデックス付きヒープで、
+    古いエントリは取り出すときに読み飛ばす。各操作は O(log n)。
+    """
+
+    __slots__ = ('strategy', '_heap', '_entries', '_seq', '_front_seq', '_uid', '_misses', '_history')
+
+    def __init__(self, cards: List[Any], set_size: int = 5, strategy: Optional[RequeueStrategy] = None):
+        """
+        Args:
+            cards: 指定枚数までのカードリスト
+            set_size: セットのサイズ（デフォルト5枚）
+            strategy: わからなかったカードの戻し方
+        """
+        super().__init__([], set_size)
+        self.strategy = strategy or KLaterStrategy()
+        self._heap: List[list] = []
+        self._entries: Dict[Any, list] = {}   # カード -> ヒープ内の有効なエントリ [キー, 順番, 通し番号, カード]
+        self._seq = itertools.count()
+        self._front_seq = itertools.count(-1, -1)
+        self._uid = itertools.count()          # 同じキーと順番で戻したエントリの区別用
+        self._misses: Dict[Any, int] = {}      # カード -> このセットでの失敗回数
+        self._history: List[Tuple[Any, Tuple[float, int]]] = []  # 取り消し用の (カード, 回答前のキー)
+        for index, card in enumerate(cards[:set_size]):
+            self._push(card, self.strategy.initial_key(index), next(self._seq))
+
+    def get_current_card(self) -> Optional[Any]:
+        """キーが最小のカードを返す（削除しない）"""
+        entry = self._top()
+        return entry[3] if entry else None
+
+    def mark_as_known(self) -> Optional[Any]:
+        """現在のカードを完了としてキューから削除"""
+        entry = self._top()
+        if entry is None:
+            return None
+        card = entry[3]
+        self._remove(card)
+        self._history.append((card, (entry[0], entry[1])))
+        self.completed[card] = None
+        return card
+
+    def mark_as_unknown(self) -> Optional[Any]:
+        """現在のカードを並べ方に従ってキューに戻す"""
+        entry = self._top()
+        if entry is None:
+            return None
+        card = entry[3]
+        self._history.append((card, (entry[0], entry[1])))
+        misses = self._misses[card] = self._misses.get(card, 0) + 1
+        # 回答数ではなく回答したカードの位置から数える（戻したカードの再表示で位置がずれないように）
+        self._push(card, self.strategy.requeue_key(entry[0] + 1, misses), next(self._seq))
+        return card
+
+    def unmark_unknown(self) -> Optional[Any]:
+        """mark_as_unknown を取り消す（カードを回答前の位置に戻す）"""
+        if not self._history:
+            return None
+        card, (key, seq) = self._history.pop()
+        self._misses[card] -= 1
+        self._push(card, key, seq)
+        return card
+
+    def push_front(self, card: Any):
+        """カードをキューの先頭に追加（直前の回答の取り消しなら回答前の位置に戻す）"""
+        if self._history and self._history[-1][0] == card:
+            _, (key, seq) = self._history.pop()
+        else:
+            top = self._top()
+            key, seq = (top[0] if top else 0), next(self._front_seq)
+        self._push(card, key, seq)
+        self.completed.pop(card, None)
+
+    def upcoming(self, count: int) -> List[Any]:
+        """現在のカードの次から最大count枚を返す（削除しない）"""
+        live = heapq.nsmallest(count + 1, self._entries.values())
+        return [entry[3] for entry in live[1:]]
+
+    def is_complete(self) -> bool:
+        """キューが空かどうか"""
+        return not self._entries
+
+    def remaining_count(self) -> int:
+        """残りのカード数"""
+        return len(self._entries)
+
+    def __len__(self) -> int:
+        """キュー内のカード数"""
+        return len(self._entries)
+
+    def _push(self, card: Any, key: float, seq: int):
+        """カードのエントリを追加（古いエントリは無効にする）"""
+        self._remove(card)
+        entry = [key, seq, next(self._uid), card]
+        self._entries[card] = entry
+        heapq.heappush(self._heap, entry)
+
+    def _remove(self, card: Any):
+        """カードのエントリを無効にする（ヒープからは取り出すときに捨てる）"""
+        entry = self._entries.pop(card, None)
+        if entry is not None:
+            entry[3] = _REMOVED
+
+    def _top(self) -> Optional[list]:
+        """有効なエントリのうちキーが最小のもの"""
+        heap = self._heap
+        while heap and heap[0][3] is _REMOVED:
+            heapq.heappop(heap)
+        return heap[0] if heap else None
+
+
+# 無効になったエントリの印
+_REMOVED = object()
+
+
+def make_strategy(config: Optional[dict] = None) -> Optional[RequeueStrategy]:
+    """設定の requeue_strategy から並べ方を作成（"fifo" はNone = 従来の MikanQueue）"""
+    config = config or {}
+    name = config.get("requeue_strategy", "fifo")
+    if name == "k_later":
+        return KLaterStrategy(config.get("requeue_k", 3))
+    if name == "min_elapsed":
+        return MinElapsedStrategy(config.get("requeue_seconds", 30))
+    if name == "weakest_first":
+        return WeakestFirstStrategy(config.get("requeue_k", 3))
+    return None
+
+
+def make_queue(cards: List[Any], set_size: int, strategy: Optional[RequeueStrategy] = None) -> MikanQueue:
+    """並べ方に合ったキューを作成（並べ方がなければ従来のFIFO）"""
+    if strategy is None:
+        return MikanQueue(cards, set_size)
+    return PriorityMikanQueue(cards, set_size, strategy)
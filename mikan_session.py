@@ -1,98 +1,166 @@
 import random
-from typing import List, Optional, Set
+import time
+from array import array
+from typing import List, Optional, Set, Tuple
 from aqt import mw
+from .mikan_answers import apply_answers
+from .mikan_candidates import candidate_cache
+from .mikan_journal import AnswerJournal
+from .mikan_perf import PerfRecorder, timed
+from .mikan_events import EventLog
 from .mikan_queue import MikanQueue
+from .mikan_requeue import RequeueStrategy, make_queue, make_strategy
+from .mikan_stats import SessionStats
+from .mikan_trace import TraceRecorder
 
 class MikanSession:
     """Mikan Modeのセッション管理クラス"""
-    
-    def __init__(self, deck_id: int = None, session_size: int = 100, set_size: int = 5):
+
+    def __init__(self, deck_id: int = None, session_size: int = 100, set_size: int = 5,
+                 prepare: bool = True, deck_ids: Optional[List[int]] = None,
+                 requeue: Optional[RequeueStrategy] = None, seed: Optional[int] = None):
         """
         Args:
             deck_id: 対象デッキのID（Noneの場合は現在のデッキ）
             session_size: 1セッションのカード数
             set_size: 1セットのカード数（デフォルト5枚）
+            prepare: Trueならここでカードを準備する（Falseの場合は
+                prepare_first_set をバックグラウンドで呼ぶ）
+            deck_ids: 複数デッキにまたがるセッションの対象デッキ（指定時はdeck_idより優先、
+                サブデッキも含む）
+            requeue: わからなかったカードの戻し方（Noneなら従来どおりキューの最後）
+            seed: シャッフルの乱数シード（Noneならランダム。トレースの再生で同じ順番を作る）
         """
-        self.deck_id = deck_id or mw.col.decks.selected()
+        self.deck_ids: List[int] = list(deck_ids) if deck_ids else [deck_id or mw.col.decks.selected()]
+        self.deck_id = self.deck_ids[0]
         self.session_size = session_size
         self.set_size = set_size
+        self.requeue = requeue
+        self.seed = seed if seed is not None else random.getrandbits(63)
         self.all_cards: List[int] = []  # カードIDのリスト
         self.completed_cards: Set[int] = set()  # 完了したカードのIDセット
         self.current_set_index = 0  # 現在のセット番号（0-based）
         self.current_queue: Optional[MikanQueue] = None
+        self._finished_queues: List[Tuple[int, MikanQueue]] = []  # 終わったセットの (セット番号, キュー)
         self.first_answers: dict[int, int] = {}  # カードID -> 初回回答結果 (1=Again, 2=Hard, 3=Good, 4=Easy)
-        self.card_types: dict[int, str] = {}  # カードID -> カードタイプ ("new" or "review")
+        self.card_types: dict[int, str] = {}  # カードID -> カードタイプ（作成済みのセットのみ）
+        self.card_sets: dict[int, int] = {}   # カードID -> セット番号（1-based、作成済みのセットのみ）
         self.session_start_time: float = 0  # セッション開始時刻
         self.session_end_time: float = 0    # セッション終了時刻
-        self.card_history: List[int] = []   # カード表示履歴（戻る機能用）
-        
-        # セッション用のカードを準備
-        self._prepare_cards()
+        self.events = EventLog()            # 回答イベントのログ（undo/redo・再構築用）
+        self.applied_cards: Set[int] = set()  # Ankiに反映済み（または反映中）のカードID
+        self.applied_count = 0              # Ankiに反映できた枚数
+        self.session_id = 0                 # セッションID（開始時刻のミリ秒）
+        self.history_id = 0                 # 履歴の行のID（最初に開始したときのsession_id。再開しても同じ）
+        self.journal: Optional[AnswerJournal] = None  # クラッシュ復元用の回答ジャーナル
+        self.trace: Optional[TraceRecorder] = None    # プロファイリング用のトレース（有効時のみ）
+        self.planned_total = 0              # 選出済みの総カード数（未作成のセットも含む）
+        self.planned_new = 0                # 選出済みの新規カード数
+        self.stats = SessionStats()         # 初回回答の集計（回答ごとに更新）
+        self._pending_ids = array('q')      # まだall_cardsに公開していない選出済みカード
+        self._pending_types = b""           # 同じ並びのカードタイプ
+        self._pending_index = 0
+        self.perf = PerfRecorder()  # フェーズ別の処理時間
+
+        if prepare:
+            # セッション用のカードを準備
+            self._prepare_cards()
 
-        # セッション開始時刻を記録
-        import time
-        self.session_start_time = time.time()
-        
     def _prepare_cards(self):
-        """復習日時の古い順にカードを選出してシャッフル"""
+        """カードを同期的に準備"""
+        self.prepare_first_set()
+
+    def prepare_first_set(self):
+        """カードを選出・シャッフルし、最初のセットだけを作成
+
+        バックグラウンドスレッドから呼ばれることを想定。残りのセットは
+        next_set で必要になったときに1セットずつ作成する。
+        """
         try:
-            # デッキ名を取得
-            deck_name = mw.col.decks.name(self.deck_id)
+            selected = self._select_cards()
 
-            # 復習対象のカードを取得
-            due_cards = list(mw.col.find_cards(f'deck:"{deck_name}" is:due'))
+            # シャッフル（シードが同じなら同じ順番になる）
+            random.Random(self.seed).shuffle(selected)
 
-            # 新規カードを取得
-            new_cards = list(mw.col.find_cards(f'deck:"{deck_name}" is:new'))
+            # 未作成のセットはIDとタイプの配列だけで持つ（メモリはカードあたり9バイト）
+            self._pending_ids = array('q', (card_id for card_id, _ in selected))
+            self._pending_types = bytes(card_type for _, card_type in selected)
+            self._pending_index = 0
+            self.planned_total = len(selected)
+            self.planned_new = self._pending_types.count(0)
+            self._materialize_set()
 
-            # 学習中のカードも含める
-            learning_cards = list(mw.col.find_cards(f'deck:"{deck_name}" is:learn'))
+        except Exception as e:
+            # エラーが発生した場合は空のリストを設定
+            self.all_cards = []
+            raise e
 
-            # すべてのカードを結合
-            all_card_ids = due_cards + new_cards + learning_cards
+        # セッション開始時刻を記録
+        self.session_start_time = time.time()
+        self.session_id = int(self.session_start_time * 1000)
+        self.history_id = self.session_id
 
-            # 重複を除去
-            all_card_ids = list(set(all_card_ids))
+    def _materialize_set(self) -> bool:
+        """次の1セット分のカードをall_cardsに追加（追加できなければFalse）"""
+        start = self._pending_index
+        end = min(start + self.set_size, len(self._pending_ids))
+        if start >= end:
+            return False
+        card_ids = self._pending_ids[start:end]
+        set_no = len(self.all_cards) // self.set_size + 1
+        for card_id, card_type in zip(card_ids, self._pending_types[start:end]):
+            # カードタイプはセットを作る直前に記録
+            # 0 = New, 1 = Learning, 2 = Review, 3 = Relearning
+            self.card_types[card_id] = "new" if card_type == 0 else "review"
+            self.card_sets[card_id] = set_no
+        self._pending_index = end
+        self.all_cards.extend(card_ids)
+        return True
 
-            # カードが見つからない場合はすべてのカードから取得
-            if not all_card_ids:
-                all_card_ids = list(mw.col.find_cards(f'deck:"{deck_name}"'))
+    def _ensure_materialized(self, set_index: int):
+        """set_index番目（0-based）のセットまでall_cardsに作成しておく"""
+        while len(self.all_cards) < (set_index + 1) * self.set_size and self._materialize_set():
+            pass
 
-            # 期日でソート（復習カード優先、古い順）
-            def get_priority_due_date(card_id):
-                card = mw.col.get_card(card_id)
-                if card.type == 0:  # New cards
-                    # 新規カードは復習カードより後に配置（大きな値 + 作成順）
-                    return 999999 + card.due
-                else:  # Review/Learning cards (type 1,2,3)
-                    # 復習カードは実際の期日（期日超過ほど小さい値）
-                    return card.due
+    def planned_cards(self) -> List[int]:
+        """未作成のセットも含めたセッションの全カードID"""
+        return self.all_cards + self._pending_ids[self._pending_index:].tolist()
 
-            all_card_ids.sort(key=get_priority_due_date)
+    def planned_types(self) -> bytes:
+        """planned_cards() と同じ並びのカードタイプ（作成済みのセットは新規 = 0、それ以外 = 2）"""
+        created = bytes(0 if self.card_types.get(card_id) == "new" else 2 for card_id in self.all_cards)
+        return created + self._pending_types[self._pending_index:]
+
+    @timed("prepare_cards")
+    def _select_cards(self) -> List[tuple]:
+        """復習日時の古い順にカードを選出（シャッフル前）"""
+        started = time.perf_counter()
+
+        # コレクションが前回から変わっていなければキャッシュを使う（検索しない）
+        candidates = candidate_cache.get(self.deck_ids)
+        self.perf.count("candidate_cache_hit" if candidates is not None else "candidate_cache_miss")
+        if candidates is None:
+            with self.perf.probe("candidate_search"):
+                # 選択したデッキ（サブデッキを含む）の復習対象・新規・学習中のカードを
+                # 1クエリで一括取得し、期日順に並べてキャッシュする
+                candidates = candidate_cache.load(self.deck_ids)
+        if candidates.sampled:
+            # 期日のカードがなく、デッキ全体から抽出した
+            self.perf.count("candidate_fallback_sample")
+
+        with self.perf.probe("candidate_sort"):
+            # 優先度順に並んでいるので先頭からsession_size枚を選出
+            selected = candidates.top(self.session_size)
+
+        # カードが1枚もない場合のエラーハンドリング
+        if not selected:
+            deck_names = ", ".join(mw.col.decks.name(deck_id) for deck_id in self.deck_ids)
+            raise ValueError(f"デッキ '{deck_names}' にカードが見つかりません。")
+
+        # デッキ数ごとの準備時間も記録
+        self.perf.record(f"prepare_cards_{len(self.deck_ids)}_decks", time.perf_counter() - started)
+        return selected
 
-            # session_sizeまでに制限（古い順から）
-            self.all_cards = all_card_ids[:self.session_size]
-            
-            # カードが1枚もない場合のエラーハンドリング
-            if not self.all_cards:
-                raise ValueError(f"デッキ '{deck_name}' にカードが見つかりません。")
-            
-            # カードタイプを記録
-            for card_id in self.all_cards:
-                card = mw.col.get_card(card_id)
-                if card.type == 0:  # 0 = New
-                    self.card_types[card_id] = "new"
-                else:  # 1 = Learning, 2 = Review, 3 = Relearning
-                    self.card_types[card_id] = "review"
-            
-            # シャッフル
-            random.shuffle(self.all_cards)
-            
-        except Exception as e:
-            # エラーが発生した場合は空のリストを設定
-            self.all_cards = []
-            raise e
-        
     def get_current_queue(self) -> Optional[MikanQueue]:
         """現在のキューを取得（なければ次のセットを作成）"""
         if self.current_queue and not self.current_queue.is_complete():
@@ -101,9 +169,11 @@ class MikanSession:
         # 新しいセットを作成
         return self.next_set()
         
+    @timed("next_set")
     def next_set(self) -> Optional[MikanQueue]:
         """次のセットを作成"""
         start_idx = self.current_set_index * self.set_size
+        self._ensure_materialized(self.current_set_index)
 
         # 残りのカードから指定された数を取得
         remaining_cards = []
@@ -115,10 +185,22 @@ class MikanSession:
             # もうカードがない
             return None
 
-        self.current_queue = MikanQueue(remaining_cards, self.set_size)
+        if self.current_queue is not None:
+            # 戻る操作でセットを開き直せるように、終わったキューを残しておく
+            self._finished_queues.append((self.current_set_index, self.current_queue))
+        self.current_queue = make_queue(remaining_cards, self.set_size, self.requeue)
         self.current_set_index += 1
+        if self.trace:
+            self.trace.record_set(self.current_set_index)
         return self.current_queue
         
+    def peek_next_set(self, count: int) -> List[int]:
+        """次のセットの先頭から最大count枚を返す（セットは作成しない）"""
+        start_idx = self.current_set_index * self.set_size
+        self._ensure_materialized(self.current_set_index)
+        cards = self.all_cards[start_idx:start_idx + min(count, self.set_size)]
+        return [card_id for card_id in cards if card_id not in self.completed_cards]
+
     def mark_card_complete(self, card_id: int):
         """カードを完了済みとしてマーク"""
         self.completed_cards.add(card_id)
@@ -127,96 +209,257 @@ class MikanSession:
         """初回回答結果を記録"""
         if card_id not in self.first_answers:
             self.first_answers[card_id] = ease
+            self.stats.add(self.card_types.get(card_id) == "new", ease)
+            if self.journal:
+                self.journal.record_answer(card_id, ease)
 
-    def add_to_history(self, card_id: int):
-        """カードを履歴に追加"""
-        self.card_history.append(card_id)
+    def answer_card(self, card_id: int, ease: int):
+        """現在のキューの先頭のカードに回答し、イベントログに記録"""
+        first = self._apply_answer(card_id, ease)
+        self.events.append(card_id, ease, ease != 1, first, self.current_set_index)
+        if self.trace:
+            self.trace.record_answer(card_id, ease)
 
-    def can_go_back(self) -> bool:
-        """前のカードに戻れるかどうか"""
-        return len(self.card_history) > 1
+    def _apply_answer(self, card_id: int, ease: int) -> bool:
+        """回答をキューと集計に反映（初回回答として記録したらTrue）"""
+        first = card_id not in self.first_answers
+        self.record_first_answer(card_id, ease)
+        if ease == 1:  # Again（もう一度）
+            self.current_queue.mark_as_unknown()
+        else:  # Hard/Good/Easy（すべてわかった扱い）
+            self.current_queue.mark_as_known()
+            self.mark_card_complete(card_id)
+        return first
 
-    def go_back(self) -> Optional[int]:
-        """前のカードに戻る"""
-        if self.can_go_back():
-            # 現在のカードを履歴から削除
-            self.card_history.pop()
-            # 前のカードIDを取得
-            previous_card_id = self.card_history[-1]
+    def can_undo(self) -> bool:
+        """直前の回答を取り消せるかどうか"""
+        event = self.events.peek_undo()
+        # 反映済みのカードの回答は取り消せない
+        return event is not None and event.card_id not in self.applied_cards
 
-            # 前のカードを現在のキューの先頭に戻す
-            if self.current_queue:
-                self.current_queue.push_front(previous_card_id)
+    def can_redo(self) -> bool:
+        """取り消した回答をやり直せるかどうか"""
+        return self.events.peek_redo() is not None
 
-            # 完了状態と回答を取り消し
-            if previous_card_id in self.completed_cards:
-                self.completed_cards.discard(previous_card_id)
-            if previous_card_id in self.first_answers:
-                del self.first_answers[previous_card_id]
+    def undo(self) -> Optional[int]:
+        """直前の回答を取り消し、そのカードIDを返す（セットをまたいでも戻れる）"""
+        if not self.can_undo():
+            return None
+        event = self.events.undo()
 
-            return previous_card_id
-        return None
+        # 回答後に次のセットへ進んでいたら、回答したセットを開き直す
+        if self.current_set_index != event.set_no or self.current_queue is None:
+            self._reopen_set(event.set_no)
 
-            
-    def apply_final_answers(self):
-        """セッション終了時に初回回答結果をAnkiに反映"""
-        from aqt.utils import showInfo
-        import time
+        if event.known:
+            # キューの先頭に戻して完了を取り消し
+            self.current_queue.push_front(event.card_id)
+            self.completed_cards.discard(event.card_id)
+        else:
+            # キューの最後に回したカードを先頭に戻す
+            self.current_queue.unmark_unknown()
+
+        if event.first:
+            ease = self.first_answers.pop(event.card_id)
+            self.stats.remove(self.card_types.get(event.card_id) == "new", ease)
+            if self.journal:
+                self.journal.record_undo(event.card_id)
+        if self.trace:
+            self.trace.record_back(event.card_id)
+        return event.card_id
+
+    def redo(self) -> Optional[int]:
+        """取り消した回答をやり直し、そのカードIDを返す"""
+        event = self.events.peek_redo()
+        if event is None:
+            return None
+        queue = self.get_current_queue()
+        if queue is None or queue.get_current_card() != event.card_id:
+            return None
+        self.events.redo()
+        self._apply_answer(event.card_id, event.ease)
+        if self.trace:
+            self.trace.record_redo(event.card_id)
+        return event.card_id
+
+    def _reopen_set(self, set_no: int):
+        """完了したセット（1-based）を開き直す"""
+        while self._finished_queues:
+            finished_no, queue = self._finished_queues.pop()
+            if finished_no == set_no:
+                # 回答の履歴を持ったキューをそのまま使う
+                self.current_queue = queue
+                self.current_set_index = set_no
+                return
+            if finished_no < set_no:
+                break
 
+        # 残っていなければキューが空の状態で作り直す
+        index = set_no - 1
+        self._ensure_materialized(index)
+        cards = self.all_cards[index * self.set_size:(index + 1) * self.set_size]
+        queue = make_queue([], self.set_size, self.requeue)
+        queue.completed = dict.fromkeys(card_id for card_id in cards if card_id in self.completed_cards)
+        self.current_queue = queue
+        self.current_set_index = set_no
+
+    def rebuild_from_events(self):
+        """イベントログを最初から再生してキュー・完了状態・初回回答を組み立て直す"""
+        journal, self.journal = self.journal, None
+        trace, self.trace = self.trace, None
+        self.current_set_index = 0
+        self.current_queue = None
+        self._finished_queues = []
+        self.completed_cards = set()
+        self.first_answers = {}
+        self.stats = SessionStats()
+        for event in self.events.applied():
+            self.get_current_queue()
+            self._apply_answer(event.card_id, event.ease)
+        self.journal = journal
+        self.trace = trace
+
+    @timed("apply_final_answers")
+    def apply_final_answers(self):
+        """セッション終了時に未反映の初回回答結果をAnkiに反映（同期版）"""
         # セッション終了時刻を記録
         self.session_end_time = time.time()
 
-        # セッション全体の学習時間を計算
-        total_session_time = self.session_end_time - self.session_start_time
+        answers = self.unapplied_answers()
+        self.mark_applied(answers)
+        updated_count = apply_answers(mw.col, answers, self.average_time_per_card())
+        self.confirm_applied(answers, updated_count)
+        self.close_journal(completed=True)
+        return updated_count
+
+    def unapplied_answers(self, completed_only: bool = False,
+                          before_set: Optional[int] = None) -> List[Tuple[int, int]]:
+        """まだAnkiに反映していない初回回答 (カードID, ease) のリスト
+
+        Args:
+            completed_only: Trueなら完了済みのカード（終わったセット）の回答だけを返す
+            before_set: 指定するとこのセット番号より前のセットの回答だけを返す
+        """
+        return [(card_id, ease) for card_id, ease in self.first_answers.items()
+                if card_id not in self.applied_cards
+                and (not completed_only or card_id in self.completed_cards)
+                and (before_set is None or self.card_sets.get(card_id, 0) < before_set)]
+
+    def mark_applied(self, answers: List[Tuple[int, int]]):
+        """回答を反映済み（または反映中）としてマーク"""
+        self.applied_cards.update(card_id for card_id, _ in answers)
+
+    def confirm_applied(self, answers: List[Tuple[int, int]], updated_count: int):
+        """反映が完了した回答を集計し、ジャーナルにも記録"""
+        self.applied_count += updated_count
+        if self.journal:
+            self.journal.record_flushed([card_id for card_id, _ in answers])
+
+    def close_trace(self):
+        """トレースを閉じる（全カードを終えたかどうかも記録）"""
+        if self.trace:
+            self.trace.close(self.is_complete())
+
+    def close_journal(self, completed: bool):
+        """ジャーナルを閉じる（すべて反映済みなら削除）"""
+        if self.journal:
+            self.journal.close(completed)
+
+    def unmark_applied(self, answers: List[Tuple[int, int]]):
+        """反映に失敗した回答を未反映に戻す"""
+        self.applied_cards.difference_update(card_id for card_id, _ in answers)
+
+    def average_time_per_card(self) -> float:
+        """これまでの学習時間から1カードあたりの平均時間を計算（最小1秒、最大60秒）"""
+        end_time = self.session_end_time or time.time()
+        total_session_time = end_time - self.session_start_time
         completed_cards_count = len(self.first_answers)
 
-        # 1カードあたりの平均時間を計算（最小1秒、最大60秒）
         if completed_cards_count > 0:
             avg_time_per_card = total_session_time / completed_cards_count
-            avg_time_per_card = max(1.0, min(avg_time_per_card, 60.0))
-        else:
-            avg_time_per_card = 5.0  # デフォルト
+            return max(1.0, min(avg_time_per_card, 60.0))
+        return 5.0  # デフォルト
+        
+    def to_snapshot(self) -> dict:
+        """中断したセッションを再開するための状態を取得"""
+        now = time.time()
+        # 未作成のセットも含めて保存し、再開時は全セットを作成済みとして扱う
+        new_cards = [card_id for card_id, card_type in self.card_types.items() if card_type == "new"]
+        new_cards.extend(card_id for card_id, card_type in zip(self._pending_ids[self._pending_index:],
+                                                               self._pending_types[self._pending_index:])
+                         if card_type == 0)
+        return {
+            'deck_id': self.deck_id,
+            'deck_ids': self.deck_ids,
+            'session_size': self.session_size,
+            'set_size': self.set_size,
+            'requeue': self.requeue.to_config() if self.requeue else None,
+            'all_cards': self.planned_cards(),
+            'card_types': new_cards,
+            'events': self.events.to_state(),
+            'applied_cards': sorted(self.applied_cards),
+            'applied_count': self.applied_count,
+            'history_id': self.history_id or self.session_id,
+            'elapsed': (self.session_end_time or now) - self.session_start_time,
+        }
 
-        updated_count = 0
-        for card_id, ease in self.first_answers.items():
-            try:
-                card = mw.col.get_card(card_id)
-                # タイマーを開始（統計更新に必要）
-                card.start_timer()
+    @classmethod
+    def from_snapshot(cls, data: dict) -> "MikanSession":
+        """to_snapshot() の結果からセッションを復元（コレクションの検索はしない）"""
+        session = cls(data['deck_id'], data['session_size'], data['set_size'], prepare=False,
+                      deck_ids=data.get('deck_ids'), requeue=make_strategy(data.get('requeue')))
+        session.all_cards = list(data['all_cards'])
+        session.planned_total = len(session.all_cards)
+        new_cards = set(data['card_types'])
+        session.card_types = {card_id: "new" if card_id in new_cards else "review"
+                              for card_id in session.all_cards}
+        session.card_sets = {card_id: index // session.set_size + 1
+                             for index, card_id in enumerate(session.all_cards)}
+        session.planned_new = len(new_cards)
 
-                # セッション平均時間を使用
-                card.timer_started = time.time() - avg_time_per_card
+        # キュー・完了状態・初回回答はイベントログを再生して組み立てる
+        session.events = EventLog.from_state(data['events'])
+        session.rebuild_from_events()
+        session.applied_cards = set(data['applied_cards'])
+        session.applied_count = data['applied_count']
 
-                mw.col.sched.answerCard(card, ease)
-                updated_count += 1
-            except Exception as e:
-                print(f"カード {card_id} の統計更新に失敗: {e}")
+        # 中断前の学習時間を引き継いで再開
+        session.session_start_time = time.time() - data['elapsed']
+        session.session_id = int(time.time() * 1000)
+        session.history_id = data.get('history_id') or session.session_id
+        return session
 
-        return updated_count
-        
     def is_complete(self) -> bool:
         """セッションが完了したかどうか"""
-        return len(self.completed_cards) >= len(self.all_cards)
+        return len(self.completed_cards) >= self.planned_total
         
+    def elapsed(self) -> float:
+        """セッション開始からの経過秒数"""
+        if not self.session_start_time:
+            return 0.0
+        return (self.session_end_time or time.time()) - self.session_start_time
+
     def get_progress(self) -> dict:
         """進捗情報を取得"""
+        # 未作成のセットも含めた選出済みの総数を使う
+        total_cards = self.planned_total
         return {
-            'total_cards': len(self.all_cards),
+            'total_cards': total_cards,
             'completed_cards': len(self.completed_cards),
             'current_set': self.current_set_index,
-            'total_sets': (len(self.all_cards) + self.set_size - 1) // self.set_size,  # 切り上げ
+            'total_sets': (total_cards + self.set_size - 1) // self.set_size,  # 切り上げ
             'remaining_in_queue': self.current_queue.remaining_count() if self.current_queue else 0,
             'set_size': self.set_size
         }
         
     def get_statistics(self) -> dict:
         """学習統計を取得"""
-        new_total = sum(1 for card_id in self.all_cards if self.card_types.get(card_id) == "new")
-        new_correct = sum(1 for card_id, answer in self.first_answers.items() 
-                         if self.card_types.get(card_id) == "new" and answer != 1)
-        
-        all_total = len(self.all_cards)
-        all_correct = sum(1 for answer in self.first_answers.values() if answer != 1)
+        # 集計は回答ごとに更新済みのカウンタを使う（走査しない）
+        new_total = self.planned_new
+        new_correct = self.stats.new_correct
+
+        all_total = self.planned_total
+        all_correct = self.stats.correct
         
         return {
             'new_total': new_total,
@@ -0,0 +1,134 @@
+from typing import Dict, Iterable, Optional
+from aqt import mw
+from aqt.qt import QTimer
+
+# アドオン設定の名前（パッケージ名）
+ADDON_NAME = __name__.split(".")[0]
+
+# config.json がないときの既定値
+DEFAULTS = {
+    "set_size": 5,
+    "num_sets": 6,
+    "font_size": 16,
+    "persistent_view": True,
+    "profile_session": False,
+    "media_prefetch_depth": 3,
+    "media_prefetch_mb": 32,
+    "fallback_weight": "uniform",  # 期日のカードがないときの抽出の重み（uniform / lapses / age）
+    "trace_sessions": False,  # セッションの操作をトレースに記録（bench/replay.py で再生）
+}
+
+# デッキごとに覚えておく設定
+PRESET_KEYS = ("set_size", "num_sets", "font_size")
+
+# 最後の変更からディスクに書き込むまでの待ち時間（ミリ秒）
+FLUSH_DELAY_MS = 2000
+
+
+class Settings:
+    """アドオン設定をメモリに保持し、書き込みをまとめて行うサービス
+
+    読み込みは初回の1回だけで、変更は FLUSH_DELAY_MS の間まとめてから書き込む。
+    セッション中（begin_session 〜 end_session）は書き込まず、終了時に1回だけ書き込む。
+    """
+
+    def __init__(self):
+        self._config: Optional[dict] = None
+        self._dirty = False
+        self._in_session = False
+        self._timer: Optional[QTimer] = None
+        self.reads = 0
+        self.writes = 0
+
+    def get(self, key: str, default=None):
+        """設定値を取得"""
+        return self._values().get(key, default)
+
+    def values(self) -> dict:
+        """全設定のコピー"""
+        return dict(self._values())
+
+    def update(self, values: dict):
+        """設定を変更（書き込みは後でまとめて行う）"""
+        config = self._values()
+        changed = {key: value for key, value in values.items() if config.get(key) != value}
+        if changed:
+            config.update(changed)
+            self._mark_dirty()
+
+    def preset(self, deck_ids: Iterable[int]) -> Dict[str, int]:
+        """デッキの組み合わせに保存したセットサイズ・セット数・文字サイズ（なければ全体の設定）"""
+        config = self._values()
+        values = {key: config.get(key, DEFAULTS[key]) for key in PRESET_KEYS}
+        values.update(config.get("deck_presets", {}).get(_preset_key(deck_ids), {}))
+        return values
+
+    def save_preset(self, deck_ids: Iterable[int], values: dict):
+        """デッキの組み合わせの設定を保存し、全体の設定にも反映"""
+        values = {key: value for key, value in values.items() if key in PRESET_KEYS}
+        presets = self._values().setdefault("deck_presets", {})
+        key = _preset_key(deck_ids)
+        current = presets.get(key, {})
+        merged = {**current, **values}
+        if merged != current:
+            presets[key] = merged
+            self._mark_dirty()
+        self.update(values)
+
+    def begin_session(self):
+        """セッションが終わるまで書き込みを止める"""
+        self._in_session = True
+        if self._timer is not None:
+            self._timer.stop()
+
+    def end_session(self):
+        """セッション終了時に変更をまとめて書き込む"""
+        self._in_session = False
+        self.flush()
+
+    def flush(self):
+        """未保存の変更があれば書き込む"""
+        if self._timer is not None:
+            self._timer.stop()
+        if not self._dirty or self._config is None:
+            return
+        mw.addonManager.writeConfig(ADDON_NAME, self._config)
+        self._dirty = False
+        self.writes += 1
+
+    def stats(self) -> dict:
+        """ディスクの読み書き回数（デバッグ用）"""
+        return {'reads': self.reads, 'writes': self.writes, 'dirty': self._dirty}
+
+    def _values(self) -> dict:
+        """設定を初回だけ読み込む"""
+        if self._config is None:
+            self._config = {**DEFAULTS, **(mw.addonManager.getConfig(ADDON_NAME) or {})}
+            self.reads += 1
+            # アドオン設定画面で編集されたら読み込み直す
+            mw.addonManager.setConfigUpdatedAction(ADDON_NAME, self._on_config_updated)
+        return self._config
+
+    def _mark_dirty(self):
+        """変更ありにして、セッション外なら書き込みを予約"""
+        self._dirty = True
+        if self._in_session:
+            return
+        if self._timer is None:
+            self._timer = QTimer(mw)
+            self._timer.setSingleShot(True)
+            self._timer.timeout.connect(self.flush)
+        self._timer.start(FLUSH_DELAY_MS)
+
+    def _on_config_updated(self, config: dict):
+        """アドオン設定画面で保存された設定を反映（書き込み済みなので変更なし扱い）"""
+        self._config = {**DEFAULTS, **(config or {})}
+        self._dirty = False
+
+
+def _preset_key(deck_ids: Iterable[int]) -> str:
+    """デッキの組み合わせのキー（JSONのキーにするため文字列）"""
+    return ",".join(str(deck_id) for deck_id in sorted(set(deck_ids)))
+
+
+settings = Settings()
@@ -0,0 +1,76 @@
+import json
+import os
+from typing import Dict, Optional
+from aqt import mw
+from anki.utils import ids2str
+from .mikan_journal import profile_key
+from .mikan_session import MikanSession
+
+# スナップショットの保存先（アドオン更新時も保持される user_files 配下）
+SNAPSHOT_DIR = os.path.join(os.path.dirname(__file__), "user_files")
+SNAPSHOT_VERSION = 2
+
+
+def save_snapshot(session: MikanSession):
+    """中断したセッションをスナップショットとして保存
+
+    まだ完了していないカードの更新時刻も記録し、再開時に変更の有無を確認する。
+    """
+    data = session.to_snapshot()
+    data['version'] = SNAPSHOT_VERSION
+    data['card_mods'] = _card_mods(_unfinished_cards(session.planned_cards(), session.completed_cards))
+    os.makedirs(SNAPSHOT_DIR, exist_ok=True)
+    path = _snapshot_path()
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(data, f, separators=(",", ":"))
+    os.replace(path + ".tmp", path)
+
+
+def load_snapshot() -> Optional[dict]:
+    """保存されたスナップショットを読み込む（なければNone）"""
+    try:
+        with open(_snapshot_path(), encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if data.get('version') != SNAPSHOT_VERSION:
+        return None
+    return data
+
+
+def delete_snapshot():
+    """スナップショットを削除"""
+    try:
+        os.remove(_snapshot_path())
+    except OSError:
+        pass
+
+
+def validate_snapshot(data: dict) -> bool:
+    """未完了のカードがすべて存在し、保存時から変更されていないか確認（1クエリ）"""
+    expected = {int(card_id): mod for card_id, mod in data['card_mods'].items()}
+    if not expected:
+        return False
+    return _card_mods(list(expected)) == expected
+
+
+def restore_session(data: dict) -> MikanSession:
+    """スナップショットからセッションを復元"""
+    return MikanSession.from_snapshot(data)
+
+
+def _unfinished_cards(all_cards, completed_cards):
+    """まだ完了していないカード"""
+    return [card_id for card_id in all_cards if card_id not in completed_cards]
+
+
+def _card_mods(card_ids) -> Dict[int, int]:
+    """カードID -> 更新時刻"""
+    if not card_ids:
+        return {}
+    return dict(mw.col.db.all(f"select id, mod from cards where id in {ids2str(card_ids)}"))
+
+
+def _snapshot_path() -> str:
+    """現在のプロファイルのスナップショットのパス"""
+    return os.path.join(SNAPSHOT_DIR, f"snapshot-{profile_key()}.json")
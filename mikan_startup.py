@@ -0,0 +1,22 @@
+import time
+
+# アドオンが起動時に使った時間（ミリ秒）。Qt・セッション関連は import しない軽量モジュール
+STARTUP_TIMINGS = {
+    'import_ms': 0.0,        # __init__.py の読み込み
+    'profile_open_ms': 0.0,  # profile_did_open でメニューを登録した時間（プロフィールを開く時間に加算される）
+    'deferred_ms': 0.0,      # 起動後に遅らせてメインスレッドで実行した処理（先読みするデッキの取得など）
+    'deferred_background_ms': 0.0,  # バックグラウンドで実行した処理（ジャーナルの読み込み・候補の先読み）
+    'first_use_ms': 0.0,     # 初めてメニューを開いたときの mikan_main の読み込み
+}
+
+
+def record(name: str, start: float):
+    """start（perf_counter）からの経過時間をミリ秒で記録"""
+    STARTUP_TIMINGS[name] = round((time.perf_counter() - start) * 1000, 3)
+
+
+def startup_stats() -> dict:
+    """起動時間の内訳と、プロフィールを開く時間に加わった合計"""
+    stats = dict(STARTUP_TIMINGS)
+    stats['added_to_profile_open_ms'] = round(stats['import_ms'] + stats['profile_open_ms'], 3)
+    return stats
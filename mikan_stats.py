@@ -0,0 +1,44 @@
+class SessionStats:
+    """初回回答の集計を回答ごとに O(1) で更新するカウンタ
+
+    記録・取り消しのたびに増減させるので、統計の表示でカードを走査しない。
+    """
+
+    __slots__ = ('answered', 'correct', 'new_answered', 'new_correct')
+
+    def __init__(self):
+        self.answered = 0      # 初回回答したカード数
+        self.correct = 0       # 初回でAgain以外だったカード数
+        self.new_answered = 0  # そのうち新規カード
+        self.new_correct = 0
+
+    def add(self, is_new: bool, ease: int):
+        """初回回答を1件加える"""
+        correct = ease != 1
+        self.answered += 1
+        self.correct += correct
+        if is_new:
+            self.new_answered += 1
+            self.new_correct += correct
+
+    def remove(self, is_new: bool, ease: int):
+        """戻る操作で取り消した初回回答を1件減らす"""
+        correct = ease != 1
+        self.answered -= 1
+        self.correct -= correct
+        if is_new:
+            self.new_answered -= 1
+            self.new_correct -= correct
+
+    @property
+    def review_answered(self) -> int:
+        """初回回答した復習カード数"""
+        return self.answered - self.new_answered
+
+    def accuracy(self) -> float:
+        """初回正答率（%）"""
+        return self.correct / self.answered * 100 if self.answered else 0.0
+
+    def cards_per_minute(self, elapsed: float) -> float:
+        """経過秒数あたりの回答ペース（枚/分）"""
+        return self.answered / elapsed * 60 if elapsed > 0 else 0.0
@@ -0,0 +1,169 @@
+import json
+import os
+import struct
+import time
+from array import array
+from typing import List, NamedTuple, Optional
+
+# トレースの保存先（アドオン更新時も保持される user_files 配下）
+TRACE_DIR = os.path.join(os.path.dirname(__file__), "user_files", "traces")
+# 残しておくトレースの数（古いものから削除）
+MAX_TRACES = 20
+
+MAGIC = b"MKTR"
+VERSION = 1
+
+# レコード種別
+SET = 1      # セットの開始（value にセット番号）
+ANSWER = 2   # 回答（value に ease）
+BACK = 3     # 戻る（回答の取り消し）
+REDO = 4     # やり直し
+RENDER = 5   # カードの描画（value に所要マイクロ秒、解答側なら最上位ビットを立てる）
+END = 6      # セッションの終了（value は全カード完了なら1）
+
+# value の最上位ビット: 解答側の描画
+ANSWER_SIDE = 0x80000000
+
+# ヘッダー = マジック + バージョン(u8) + シード(u64) + セッションの枚数(u32) + セットサイズ(u16)
+#          + カード数(u32) + 並べ方の設定JSONの長さ(u16)
+HEADER = struct.Struct("<4sBQIHIH")
+# 1レコード = 種別(u8) + 経過ミリ秒(u32) + カードID(i64) + 値(u32) = 17バイト
+RECORD = struct.Struct("<BIqI")
+
+
+class TraceEvent(NamedTuple):
+    """トレースのレコード1件"""
+    kind: int
+    elapsed_ms: int
+    card_id: int
+    value: int
+
+
+class SessionTrace:
+    """読み込んだトレース"""
+
+    def __init__(self, seed: int, session_size: int, set_size: int, requeue: dict,
+                 card_ids: array, card_types: bytes, events: List[TraceEvent]):
+        self.seed = seed
+        self.session_size = session_size
+        self.set_size = set_size
+        self.requeue = requeue          # make_strategy に渡す設定
+        self.card_ids = card_ids        # シャッフル後の出題順
+        self.card_types = card_types
+        self.events = events
+
+    def render_times(self, show_answer: Optional[bool] = None) -> List[float]:
+        """記録された描画時間（ミリ秒）"""
+        return [(event.value & ~ANSWER_SIDE) / 1000 for event in self.events
+                if event.kind == RENDER
+                and (show_answer is None or bool(event.value & ANSWER_SIDE) == show_answer)]
+
+
+class TraceRecorder:
+    """セッションの操作をバイナリで記録するレコーダー（プロファイリングでの再生用）
+
+    書き込みはバッファに溜め、セットの区切りと終了時にだけディスクへ渡す。
+    """
+
+    def __init__(self, path: str, session):
+        """
+        Args:
+            path: トレースファイルのパス
+            session: 記録するセッション（カードの選出・シャッフル済み）
+        """
+        self.path = path
+        self._started = time.perf_counter()
+        self._file = open(path, "wb")
+        planned = array('q', session.planned_cards())
+        types = session.planned_types()
+        requeue = json.dumps(session.requeue.to_config() if session.requeue else {}).encode("utf-8")
+        self._file.write(HEADER.pack(MAGIC, VERSION, session.seed, session.session_size,
+                                     session.set_size, len(planned), len(requeue)))
+        self._file.write(requeue)
+        self._file.write(planned.tobytes())
+        self._file.write(types)
+        # 再開したセッションは、それまでの回答を先頭に記録しておく
+        for event in session.events.applied():
+            self.record_answer(event.card_id, event.ease)
+
+    @classmethod
+    def create(cls, session) -> "TraceRecorder":
+        """現在のプロファイル用に新しいトレースを作成（古いトレースは削除）"""
+        os.makedirs(TRACE_DIR, exist_ok=True)
+        _prune(MAX_TRACES - 1)
+        return cls(os.path.join(TRACE_DIR, f"{session.session_id}.mktr"), session)
+
+    def record_set(self, set_no: int):
+        """セットの開始を記録"""
+        self._write(SET, 0, set_no)
+        if not self._file.closed:
+            self._file.flush()
+
+    def record_answer(self, card_id: int, ease: int):
+        """回答を記録"""
+        self._write(ANSWER, card_id, ease)
+
+    def record_back(self, card_id: int):
+        """戻るを記録"""
+        self._write(BACK, card_id, 0)
+
+    def record_redo(self, card_id: int):
+        """やり直しを記録"""
+        self._write(REDO, card_id, 0)
+
+    def record_render(self, card_id: int, show_answer: bool, seconds: float):
+        """カードの描画時間を記録"""
+        micros = min(int(seconds * 1_000_000), ANSWER_SIDE - 1)
+        self._write(RENDER, card_id, micros | (ANSWER_SIDE if show_answer else 0))
+
+    def close(self, completed: bool):
+        """終了を記録してファイルを閉じる"""
+        if self._file.closed:
+            return
+        self._write(END, 0, 1 if completed else 0)
+        self._file.close()
+
+    def _write(self, kind: int, card_id: int, value: int):
+        """1レコードを追記"""
+        if self._file.closed:
+            return
+        elapsed = min(int((time.perf_counter() - self._started) * 1000), 0xFFFFFFFF)
+        self._file.write(RECORD.pack(kind, elapsed, card_id, value))
+
+
+def read_trace(path: str) -> SessionTrace:
+    """トレースを読み込む（途中で途切れた末尾のレコードは無視）"""
+    with open(path, "rb") as f:
+        data = f.read()
+    if len(data) < HEADER.size:
+        raise ValueError(f"{path} is not a Mikan Mode trace")
+    magic, version, seed, session_size, set_size, count, requeue_len = HEADER.unpack_from(data)
+    if magic != MAGIC or version != VERSION:
+        raise ValueError(f"{path} is not a Mikan Mode trace (version {version})")
+    offset = HEADER.size
+    requeue = json.loads(data[offset:offset + requeue_len].decode("utf-8") or "{}")
+    offset += requeue_len
+    card_ids = array('q')
+    card_ids.frombytes(data[offset:offset + count * card_ids.itemsize])
+    offset += count * card_ids.itemsize
+    card_types = data[offset:offset + count]
+    offset += count
+
+    events = []
+    end = offset + (len(data) - offset) // RECORD.size * RECORD.size
+    for kind, elapsed, card_id, value in RECORD.iter_unpack(data[offset:end]):
+        events.append(TraceEvent(kind, elapsed, card_id, value))
+    return SessionTrace(seed, session_size, set_size, requeue, card_ids, card_types, events)
+
+
+def _prune(keep: int):
+    """新しい順に keep 個を残してトレースを削除"""
+    try:
+        names = sorted(name for name in os.listdir(TRACE_DIR) if name.endswith(".mktr"))
+    except OSError:
+        return
+    for name in names[:max(len(names) - keep, 0)]:
+        try:
+            os.remove(os.path.join(TRACE_DIR, name))
+        except OSError:
+            pass
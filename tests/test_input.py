@@ -0,0 +1,68 @@
+"""回答キーの受け付け（mikan_input）のテスト
+
+描画完了の通知を待つ間の回答を捨て、通知が来なくても PAINT_TIMEOUT 後には受け付けることを確認する。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+fake_anki.load_addon()
+
+from mikan_mode import mikan_input  # noqa: E402
+from mikan_mode.mikan_input import PAINT_TIMEOUT, InputGuard, LatencyHistogram  # noqa: E402
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """time.perf_counter の代わりに進める時計"""
+    now = [100.0]
+    monkeypatch.setattr(mikan_input.time, "perf_counter", lambda: now[0])
+    return now
+
+
+def test_answers_before_paint_are_dropped_until_timeout(clock):
+    guard = InputGuard()
+    guard.render_requested(show_answer=True)
+
+    assert not guard.can_answer()
+    clock[0] += PAINT_TIMEOUT / 2
+    assert not guard.can_answer()
+    # 通知が失われても操作不能にはしない
+    clock[0] += PAINT_TIMEOUT / 2
+    assert guard.can_answer()
+    assert guard.stats()['dropped_early_answers'] == 2
+    assert guard.stats()['paint_timeouts'] == 1
+
+
+def test_paint_ack_enables_answers_and_measures_latency(clock):
+    guard = InputGuard()
+    old = guard.render_requested(show_answer=False)
+    guard.key_pressed()
+    seq = guard.render_requested(show_answer=True)
+    clock[0] += 0.02
+
+    # 前の描画の通知は無視する
+    assert guard.painted(old) is None
+    assert not guard.can_answer()
+    assert guard.painted(seq) == pytest.approx(0.02)
+    assert guard.can_answer()
+    assert guard.stats()['paint_timeouts'] == 0
+    # 入力のない描画（最初のカードなど）は計測しない
+    assert guard.painted(seq) is None
+    assert guard.stats()['answer_flips'] == 1
+
+
+def test_histogram_percentiles_use_bucket_bounds():
+    histogram = LatencyHistogram([10, 20, 50])
+    for ms in (5, 12, 15, 18, 70):
+        histogram.record(ms / 1000)
+
+    assert histogram.percentile(20) == 10
+    assert histogram.percentile(80) == 20
+    assert histogram.percentile(100) == pytest.approx(70)
+    assert histogram.buckets() == {"<=10ms": 1, "<=20ms": 3, "<=50ms": 0, ">50ms": 1}
+    assert LatencyHistogram().percentile(50) is None
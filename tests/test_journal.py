@@ -0,0 +1,76 @@
+"""回答ジャーナル（mikan_journal）のテスト
+
+ジャーナルに記録した回答のうち、再生で反映する分だけが残ることを確認する。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+SESSION_ID = 1_700_000_000_000
+
+
+@pytest.fixture
+def col():
+    return fake_anki.setup(0)
+
+
+def write_journal(path, *steps):
+    """ジャーナルに ("answer", カードID, ease) / ("undo", カードID) / ("flushed", [カードID]) を順に記録"""
+    from mikan_mode.mikan_journal import AnswerJournal
+
+    journal = AnswerJournal(str(path), SESSION_ID)
+    for step in steps:
+        getattr(journal, f"record_{step[0]}")(*step[1:])
+    return journal
+
+
+def test_pending_answers_skip_undone_and_flushed(col, tmp_path):
+    from mikan_mode.mikan_journal import read_journal
+
+    path = tmp_path / "journal.bin"
+    journal = write_journal(path, ("answer", 1, 3), ("answer", 2, 1), ("answer", 3, 3),
+                            ("undo", 2), ("answer", 2, 4), ("flushed", [1]), ("answer", 1, 1))
+    journal.close(completed=False)
+
+    state = read_journal(str(path))
+
+    assert state.session_id == SESSION_ID
+    # 初回回答だけを使う（取り消したあとの回答は新しい初回回答）
+    assert sorted(state.pending_answers()) == [(2, 4), (3, 3)]
+
+
+def test_truncated_record_and_closed_journal(col, tmp_path):
+    from mikan_mode.mikan_journal import CLOSED, RECORD, read_journal
+
+    path = tmp_path / "journal.bin"
+    write_journal(path, ("answer", 1, 3), ("answer", 2, 3)).close(completed=False)
+    # 書き込み途中で落ちた末尾のレコードは無視する
+    with open(path, "r+b") as f:
+        f.truncate(os.path.getsize(path) - RECORD.size // 2)
+    assert read_journal(str(path)).pending_answers() == [(1, 3)]
+
+    closed = tmp_path / "closed.bin"
+    journal = write_journal(closed, ("answer", 1, 3))
+    journal._write(CLOSED, 0, SESSION_ID)  # 正常終了を書いたがファイルを消す前に落ちた場合
+    journal.close(completed=False)
+    assert read_journal(str(closed)).pending_answers() == []
+
+
+def test_filter_already_answered_skips_cards_reviewed_after_session_start(col, tmp_path):
+    from mikan_mode.mikan_journal import filter_already_answered, read_journal
+
+    path = tmp_path / "journal.bin"
+    write_journal(path, ("answer", 1, 3), ("answer", 2, 3), ("answer", 3, 1)).close(completed=False)
+    state = read_journal(str(path))
+    # カード1はセッション前、カード2はセッション開始後に復習済み
+    col.db.conn.execute("insert into revlog (id, cid, ease, ivl, time, type) values (?, 1, 3, 1, 0, 1)",
+                        (SESSION_ID - 1,))
+    col.db.conn.execute("insert into revlog (id, cid, ease, ivl, time, type) values (?, 2, 3, 1, 0, 1)",
+                        (SESSION_ID + 5000,))
+
+    assert filter_already_answered(col, state, state.pending_answers()) == [(1, 3), (3, 1)]
+    assert filter_already_answered(col, state, []) == []
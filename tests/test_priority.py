@@ -0,0 +1,105 @@
+"""緊急度順の並び（mikan_priority）のテスト
+
+bench/fake_anki.py の代替コレクションにキューごとのカードを1枚ずつ入れ、
+fetch_candidate_rows が返す順番を確認する。
+"""
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+TODAY = fake_anki.TODAY
+DECK_ID = 1
+FILTERED_DECK_ID = 50
+OTHER_DECK_ID = 60
+
+
+def add_card(col, card_id, card_type, queue, due, ivl=0, did=DECK_ID, odid=0, odue=0):
+    """カードを1枚追加"""
+    col.db.conn.execute(
+        f"insert into cards values ({', '.join('?' * 15)})",
+        (card_id, card_id, did, 0, 0, card_type, queue, due, ivl, 2500, 0, 0, 0, odue, odid))
+
+
+@pytest.fixture
+def col():
+    collection = fake_anki.setup(0)
+    now = int(time.time())
+    add_card(collection, 101, 0, 0, due=5)                            # 新規（作成順5）
+    add_card(collection, 102, 0, 0, due=2)                            # 新規（作成順2）
+    add_card(collection, 103, 1, 1, due=now - 3600)                   # 当日の学習（期日を過ぎた）
+    add_card(collection, 104, 1, 1, due=now + 3600)                   # 当日の学習（期日前）
+    add_card(collection, 105, 3, 3, due=TODAY - 2, ivl=4)             # 日単位の再学習: 1 + 2/4
+    add_card(collection, 106, 2, 2, due=TODAY - 10, ivl=5)            # 復習: 10/5
+    add_card(collection, 107, 2, 2, due=TODAY - 5, ivl=10)            # 復習: 5/10
+    add_card(collection, 108, 2, 2, due=TODAY, ivl=3)                 # 復習: 期日当日
+    add_card(collection, 109, 2, 2, due=-100000, ivl=10,              # フィルターデッキ内の復習: 30/10
+             did=FILTERED_DECK_ID, odid=DECK_ID, odue=TODAY - 30)
+    add_card(collection, 110, 2, 2, due=TODAY + 5, ivl=10)            # 期日前の復習（対象外）
+    add_card(collection, 111, 2, 2, due=TODAY - 50, ivl=1, did=OTHER_DECK_ID)  # 別のデッキ（対象外）
+    return collection
+
+
+def test_candidates_are_ordered_by_urgency(col):
+    from mikan_mode.mikan_candidates import fetch_candidate_rows
+
+    rows = fetch_candidate_rows([DECK_ID])
+
+    # 期日前の当日の学習（104）は期日の復習より後、新規より前
+    assert [card_id for card_id, _ in rows] == [109, 106, 105, 103, 107, 108, 104, 102, 101]
+
+
+def test_learning_card_moves_up_once_its_due_time_is_reached(col):
+    from mikan_mode.mikan_candidates import fetch_candidate_rows
+
+    later = int(time.time()) + 2 * 3600
+    rows = fetch_candidate_rows([DECK_ID], cutoff=later)
+
+    # cutoff から見て 104 は1時間、103 は3時間の超過。どちらも日単位の再学習（1.5）より後
+    assert [card_id for card_id, _ in rows] == [109, 106, 105, 103, 104, 107, 108, 102, 101]
+
+
+def test_cache_key_changes_with_time_bucket(col, monkeypatch):
+    from mikan_mode import mikan_priority
+    from mikan_mode.mikan_candidates import CandidateCache
+
+    cache = CandidateCache()
+    now = [1_700_000_000.0]
+    monkeypatch.setattr(mikan_priority.time, "time", lambda: now[0])
+    first = cache.key([DECK_ID])
+    now[0] += mikan_priority.TIME_BUCKET_SECONDS
+
+    assert cache.key([DECK_ID]) != first
+    assert cache.key([DECK_ID])[-1] == cache.fallback_weight
+
+
+def test_same_urgency_uses_a_tie_break_per_queue(col):
+    from mikan_mode.mikan_candidates import fetch_candidate_rows
+
+    now = int(time.time())
+    add_card(col, 90, 0, 0, due=9)                 # 新規（作成順9、IDは小さい）
+    add_card(col, 112, 1, 1, due=now + 7200)       # 期日前の当日の学習（104より後）
+    add_card(col, 95, 2, 2, due=TODAY, ivl=3)      # 108 と同じ緊急度の復習（ID順で先）
+    rows = [card_id for card_id, _ in fetch_candidate_rows([DECK_ID])]
+
+    assert rows[-3:] == [102, 101, 90]
+    assert rows.index(104) + 1 == rows.index(112)
+    assert rows.index(95) + 1 == rows.index(108)
+
+
+def test_new_cards_come_after_reviews_due_today(col):
+    from mikan_mode.mikan_priority import LEARNING_WAITING, NEW_URGENCY, urgency_sql
+
+    now = int(time.time())
+    urgencies = dict(col.db.all(f"select id, {urgency_sql(TODAY, now)} from cards"))
+
+    assert urgencies[101] == urgencies[102] == NEW_URGENCY
+    assert urgencies[104] == LEARNING_WAITING
+    assert urgencies[103] == pytest.approx(1 + 3600 / 86400)
+    assert urgencies[108] == 0
+    assert urgencies[105] == pytest.approx(1.5)
+    assert urgencies[109] == pytest.approx(3.0)
@@ -0,0 +1,81 @@
+"""わからなかったカードの戻し方（mikan_requeue）のテスト
+
+1枚のカードだけを決まった回数「わからない」にして、出題順を確認する。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+fake_anki.load_addon()
+
+from mikan_mode import mikan_requeue  # noqa: E402
+from mikan_mode.mikan_queue import MikanQueue  # noqa: E402
+from mikan_mode.mikan_requeue import (KLaterStrategy, MinElapsedStrategy, PriorityMikanQueue,  # noqa: E402
+                                      RequeueStrategy, WeakestFirstStrategy, make_queue, make_strategy)
+
+
+def play(queue, missed="A", misses=2) -> str:
+    """missed のカードだけ misses 回わからないにして、表示した順を返す"""
+    shown = []
+    while not queue.is_complete():
+        card = queue.get_current_card()
+        shown.append(card)
+        if card == missed and shown.count(card) <= misses:
+            queue.mark_as_unknown()
+        else:
+            queue.mark_as_known()
+    return "".join(shown)
+
+
+@pytest.mark.parametrize("k, expected", [
+    (1, "ABACADEFGH"),
+    (3, "ABCDAEFGAH"),
+    (5, "ABCDEFAGHA"),
+])
+def test_k_later_shows_card_after_exactly_k_others(k, expected):
+    queue = PriorityMikanQueue(list("ABCDEFGH"), 8, KLaterStrategy(k))
+
+    assert play(queue) == expected
+
+
+def test_weakest_first_brings_repeated_misses_back_sooner():
+    queue = PriorityMikanQueue(list("ABCDEFGH"), 8, WeakestFirstStrategy(4))
+
+    # 1回目は4枚後、2回目は 4/2 = 2枚後、3回目は 4/3 -> 1枚後
+    assert play(queue, misses=3) == "ABCDEAFGAHA"
+
+
+def test_min_elapsed_waits_unless_nothing_else_is_left(monkeypatch):
+    now = [100.0]
+    monkeypatch.setattr(mikan_requeue.time, "monotonic", lambda: now[0])
+    queue = PriorityMikanQueue(list("ABC"), 3, MinElapsedStrategy(30))
+
+    assert play(queue, misses=1) == "ABCA"
+
+
+def test_undo_puts_card_back_where_it_was():
+    queue = PriorityMikanQueue(list("ABCDE"), 5, KLaterStrategy(3))
+    queue.mark_as_unknown()
+    queue.mark_as_known()
+
+    queue.push_front("B")
+    assert queue.get_current_card() == "B"
+    assert queue.unmark_unknown() == "A"
+    assert queue.get_current_card() == "A"
+    assert play(queue, misses=0) == "ABCDE"
+
+
+def test_fifo_uses_the_deque_queue():
+    assert make_strategy({"requeue_strategy": "fifo"}) is None
+    assert type(make_queue(list("AB"), 2)) is MikanQueue
+    assert isinstance(make_queue(list("AB"), 2, make_strategy({"requeue_strategy": "k_later"})),
+                      PriorityMikanQueue)
+
+
+def test_strategy_must_define_requeue_key():
+    with pytest.raises(TypeError):
+        RequeueStrategy()
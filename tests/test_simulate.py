@@ -0,0 +1,43 @@
+"""学習シミュレーター（bench/simulate.py）のテスト
+
+一括計算が MikanQueue を1件ずつ動かした結果と合うことと、極端な想起モデルでの値を確認する。
+"""
+import os
+import sys
+
+import pytest
+
+pytest.importorskip("numpy")
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import simulate  # noqa: E402
+
+
+def test_batch_matches_queue_simulation():
+    args = simulate.parse_args(["--seed", "1"])
+
+    result = simulate.validate(args, sessions=300)
+
+    assert result['batch_reps_per_card'] == pytest.approx(result['queue_reps_per_card'], rel=0.05)
+
+
+def test_cards_that_are_always_known_are_shown_once():
+    args = simulate.parse_args(["--sessions", "50", "--p-new", "1", "--p-review", "1", "--fatigue", "0"])
+
+    grid = simulate.sweep(args)
+
+    assert len(grid) == len(simulate.SET_SIZES) * simulate.MAX_SETS
+    # 正答率は 0.99 で頭打ちなので、出し直しは1%程度だけ
+    assert all(row['reps_per_card'] < 1.05 for row in grid)
+    assert all(row['first_try_accuracy'] > 95 for row in grid)
+
+
+def test_totals_grow_with_the_number_of_sets():
+    args = simulate.parse_args(["--sessions", "50"])
+
+    grid = simulate.sweep(args)
+
+    for set_size in simulate.SET_SIZES:
+        minutes = [row['minutes'] for row in grid if row['set_size'] == set_size]
+        assert minutes == sorted(minutes)
+        # 最初のセットでも1回ずつは出題する
+        assert minutes[0] * 60 >= set_size * args.sec_first
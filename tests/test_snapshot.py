@@ -0,0 +1,82 @@
+"""中断したセッションのスナップショット（mikan_snapshot）のテスト
+
+保存したスナップショットが、未完了のカードが変わっていないときだけ使えることを確認する。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+
+@pytest.fixture
+def session(tmp_path, monkeypatch):
+    """3枚に回答したセッション（1枚目だけわからない）を作り、スナップショットの保存先を一時ディレクトリにする"""
+    fake_anki.setup(100)
+    from mikan_mode import mikan_snapshot
+    from mikan_mode.mikan_session import MikanSession
+
+    monkeypatch.setattr(mikan_snapshot, "SNAPSHOT_DIR", str(tmp_path))
+    session = MikanSession(session_size=20, set_size=5, seed=1)
+    for ease in (1, 3, 3):
+        session.answer_card(session.get_current_queue().get_current_card(), ease)
+    return session
+
+
+def card_mod(card_id, mod):
+    """カードの更新時刻を変える（Ankiでカードを編集したのと同じ）"""
+    from aqt import mw
+
+    mw.col.db.conn.execute("update cards set mod = ? where id = ?", (mod, card_id))
+
+
+def test_saved_snapshot_is_valid_and_restores_the_session(session):
+    from mikan_mode.mikan_snapshot import load_snapshot, restore_session, save_snapshot, validate_snapshot
+
+    save_snapshot(session)
+    data = load_snapshot()
+
+    assert validate_snapshot(data)
+    restored = restore_session(data)
+    assert restored.planned_cards() == session.planned_cards()
+    assert restored.completed_cards == session.completed_cards
+    assert restored.first_answers == session.first_answers
+
+
+def test_snapshot_is_invalid_when_an_unfinished_card_changed_or_was_deleted(session):
+    from aqt import mw
+    from mikan_mode.mikan_snapshot import load_snapshot, save_snapshot, validate_snapshot
+
+    save_snapshot(session)
+    data = load_snapshot()
+    unfinished = [card_id for card_id in session.planned_cards() if card_id not in session.completed_cards]
+    completed = next(iter(session.completed_cards))
+
+    # 完了済みのカードが変わっても再開できる
+    card_mod(completed, 123)
+    assert validate_snapshot(data)
+
+    original = data['card_mods'][str(unfinished[-1])]
+    card_mod(unfinished[-1], original + 1)
+    assert not validate_snapshot(data)
+
+    card_mod(unfinished[-1], original)
+    assert validate_snapshot(data)
+    mw.col.db.conn.execute("delete from cards where id = ?", (unfinished[0],))
+    assert not validate_snapshot(data)
+
+
+def test_snapshot_from_another_version_is_ignored(session):
+    from mikan_mode import mikan_snapshot
+
+    mikan_snapshot.save_snapshot(session)
+    path = mikan_snapshot._snapshot_path()
+    with open(path, encoding="utf-8") as f:
+        text = f.read()
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(text.replace(f'"version":{mikan_snapshot.SNAPSHOT_VERSION}', '"version":1'))
+
+    assert mikan_snapshot.load_snapshot() is None
+    assert not mikan_snapshot.validate_snapshot({'card_mods': {}})
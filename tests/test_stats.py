@@ -0,0 +1,98 @@
+"""回答イベントのログ（mikan_events）と集計カウンタ（mikan_stats）のテスト
+
+戻る・やり直しを繰り返しても、カウンタが初回回答から数え直した値と一致することを確認する。
+"""
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "bench"))
+import fake_anki  # noqa: E402
+
+# 回答の順番（Again を混ぜて、セットの区切りもまたぐ）
+EASES = [1, 3, 3, 1, 4, 3, 2, 3, 1, 3, 3, 3, 3, 3]
+
+
+@pytest.fixture
+def session():
+    col = fake_anki.setup(60)
+    # 期日の復習カード10枚と新規カードが半々のセッションにする
+    col.db.conn.execute("update cards set type = 0, queue = 0, due = rowid where rowid % 2 = 1")
+    col.db.conn.execute("update cards set type = 2, queue = 2, due = case when rowid % 6 = 0 "
+                        "then ? else ? end where rowid % 2 = 0", (fake_anki.TODAY, fake_anki.TODAY + 10))
+    from mikan_mode.mikan_session import MikanSession
+
+    return MikanSession(session_size=20, set_size=5, seed=3)
+
+
+def recount(session) -> tuple:
+    """初回回答から数え直した (回答数, 正答数, 新規の回答数, 新規の正答数)"""
+    answers = session.first_answers
+    new = [card_id for card_id in answers if session.card_types.get(card_id) == "new"]
+    return (len(answers), sum(ease != 1 for ease in answers.values()),
+            len(new), sum(answers[card_id] != 1 for card_id in new))
+
+
+def counters(session) -> tuple:
+    stats = session.stats
+    return stats.answered, stats.correct, stats.new_answered, stats.new_correct
+
+
+def answer_all(session):
+    """EASES の順に回答し、回答したカードIDを返す"""
+    answered = []
+    for ease in EASES:
+        card_id = session.get_current_queue().get_current_card()
+        session.answer_card(card_id, ease)
+        answered.append(card_id)
+        assert counters(session) == recount(session)
+    return answered
+
+
+def test_counters_follow_undo_and_redo_across_sets(session):
+    answered = answer_all(session)
+    assert session.current_set_index > 1
+    full = counters(session)
+
+    # 最初まで戻る（セットを開き直しながら、新しい順に取り消す）
+    for card_id in reversed(answered):
+        assert session.undo() == card_id
+        assert counters(session) == recount(session)
+    assert counters(session) == (0, 0, 0, 0)
+    assert session.undo() is None
+
+    # 全部やり直すと元の集計に戻る
+    for card_id in answered:
+        assert session.redo() == card_id
+        assert counters(session) == recount(session)
+    assert counters(session) == full
+    assert session.redo() is None
+
+
+def test_new_answer_after_undo_discards_redo(session):
+    answer_all(session)
+    session.undo()
+    session.undo()
+    card_id = session.get_current_queue().get_current_card()
+
+    session.answer_card(card_id, 1)
+
+    assert not session.can_redo()
+    assert counters(session) == recount(session)
+
+
+def test_event_log_round_trip():
+    from mikan_mode.mikan_events import EventLog
+
+    log = EventLog()
+    log.append(10, 1, False, True, 1)
+    log.append(10, 3, True, False, 1)
+    log.append(11, 4, True, True, 2)
+    assert log.undo().card_id == 11
+
+    restored = EventLog.from_state(log.to_state())
+
+    assert [event.card_id for event in restored.applied()] == [10, 10]
+    assert restored.peek_redo() == (11, 4, True, True, 2)
+    assert restored.undo() == (10, 3, True, False, 1)